@@ -1,6 +1,8 @@
 from urllib import request
 import os
 import sys
+import time
+from datetime import date, timedelta
 # from werkzeug.utils import secure_filename
 # from azure.storage.blob import BlobServiceClient
 # from dotenv import load_dotenv
@@ -10,7 +12,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'site_packages'))
  
 from dotenv import load_dotenv
  
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from dbconnect import *
 from aiconnect import *
@@ -19,6 +21,20 @@ from tickets import *
 from leave_management import *
 from timesheets import *
 from courses import *
+from dbpool import getPoolStats, PoolTimeout, POOL_RETRY_AFTER
+from cache import getCacheStats
+from model import dumpList, FieldSelectionError
+from org_stats import getHeadcount, getHeadcountBy, getOrgStatistics, DIMENSIONS
+from pagination import parseLimit, PaginationError
+from streaming import streamFormat, streamList
+from sla import slaTracker
+from search import ticketSearchIndex, highlight
+from ticket_metrics import ticketMetrics
+from similarity import ticketSimilarityIndex, SIMILAR_TICKET_MIN_SCORE
+from leave_ledger import reconcileLeaveLedger
+from team_calendar import getTeamCalendar, CALENDAR_STATUSES, TEAM_CALENDAR_DEFAULT_DAYS, TEAM_CALENDAR_MAX_DAYS
+from ticket_archive import getArchivedTicketById, ticketArchiver, TICKET_ARCHIVE_AFTER_DAYS
+from events import eventLog, TOPICS
 
 
 # Load environment variables from .env file
@@ -26,6 +42,30 @@ load_dotenv()
  
 app = Flask(__name__)
 CORS(app)
+
+@app.errorhandler(PaginationError)
+@app.errorhandler(FieldSelectionError)
+def bad_list_parameters(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(PoolTimeout)
+def pool_exhausted(e):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT: overloaded, not broken
+    print("Database connection pool exhausted: ", e)
+    return jsonify({'error': 'Database is busy, try again shortly'}), 503, {'Retry-After': str(POOL_RETRY_AFTER)}
+
+def requestedFields(model):
+    """Output keys from the request's `fields=` parameter, or None for all of them"""
+    return model.parseFields(request.args.get('fields'))
+
+def listPage(key, model, getPage):
+    """Serve a filtered/paginated list request as {key: [...], 'nextCursor': ...}"""
+    fields = requestedFields(model)
+    page = getPage(request.args)
+    if page is None:
+        return jsonify({'error': f'Failed to fetch {key}'}), 500
+    items, nextCursor = page
+    return jsonify({key: [item.project(fields) for item in items], 'nextCursor': nextCursor}), 200
  
 # ... (All other routes like /api/login, /api/employees, etc. remain unchanged) ...
  
@@ -71,6 +111,8 @@ def login():
             else:
                 print("Authentication failed - invalid credentials")
                 return jsonify({'message': 'Invalid email or password'}), 401
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Login error: {str(e)}")
             return jsonify({'message': 'Internal server error'}), 500
@@ -82,24 +124,66 @@ def test_cors():
     print("CORS test endpoint was reached successfully!")
     return jsonify({"message": "Success! CORS is configured correctly."})
  
+@app.route('/api/db/pool-stats', methods=['GET'])
+def pool_stats():
+    return jsonify(getPoolStats()), 200
+ 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(getCacheStats()), 200
+ 
+@app.route('/api/events', methods=['GET'])
+def events():
+    # Server-Sent Events feed of ticket and leave request changes made through this worker
+    topics = request.args.get('topics')
+    topics = tuple(topic.strip() for topic in topics.split(',') if topic.strip()) if topics else TOPICS
+    unknown = [topic for topic in topics if topic not in TOPICS]
+    if unknown:
+        return jsonify({'error': f"Unknown topics: {', '.join(unknown)}", 'topics': list(TOPICS)}), 400
+    # EventSource sends Last-Event-ID itself when reconnecting; the query parameter covers a fresh page load
+    lastEventId = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    return Response(stream_with_context(eventLog.stream(lastEventId, topics)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+ 
 @app.route('/api/employees', methods = ['GET'])
 def employees():
-    employees = parseDB()
-    emps = [employee.toDict() for employee in employees]
-    return jsonify({ 'employees' : emps })
+    if streamFormat():
+        return streamList('employees', employeeListing)
+    if employeeListing.isRequested(request.args):
+        return listPage('employees', Employee, getEmployeesPage)
+    # Cached employees are frozen, so their JSON is encoded once and reused across requests
+    employees = getDirectory()
+    return Response('{"employees":' + dumpList(employees) + '}', mimetype='application/json')
  
 @app.route('/api/employees/<int:id>', methods=['GET'])
 def get_employee(id):
-    employee = getEmployeeByID(id)
+    fields = requestedFields(Employee)
+    employee = getCachedEmployeeByID(id)
+    if employee and fields:
+        return jsonify(employee.project(fields))
     if employee:
-        return jsonify(employee.toDict())
+        return Response(employee.toJSON(), mimetype='application/json')
     return jsonify({'message': 'Employee not found'}), 404
  
 @app.route('/api/employees/count', methods=['GET'])
 def get_employee_count():
-    employees = parseDB()
-    count = len(employees) if employees else 0
-    return jsonify({'count': count})
+    count = getHeadcount()
+    return jsonify({'count': count or 0})
+ 
+@app.route('/api/employees/stats', methods=['GET'])
+def get_employee_stats():
+    dimension = request.args.get('by')
+    if dimension:
+        if dimension not in DIMENSIONS:
+            return jsonify({'error': f"'by' must be one of: {', '.join(DIMENSIONS)}"}), 400
+        counts = getHeadcountBy(dimension)
+        if counts is None:
+            return jsonify({'error': 'Failed to compute employee statistics'}), 500
+        return jsonify({dimension: counts}), 200
+    stats = getOrgStatistics()
+    if any(value is None for value in stats.values()):
+        return jsonify({'error': 'Failed to compute employee statistics'}), 500
+    return jsonify(stats), 200
  
 @app.route('/api/update-bio', methods=['POST'])
 def update_bio():
@@ -119,7 +203,25 @@ def get_subordinates(id):
     subordinates = getSubordinates(id)
     if not subordinates:
         return jsonify({'message': 'No subordinates found.'}), 404
-    return jsonify({[emp.toDict() for emp in subordinates]}), 200
+    return jsonify([emp.toDict() for emp in subordinates]), 200
+ 
+@app.route('/api/employees/<int:id>/subtree', methods=['GET'])
+def get_reporting_subtree(id):
+    try:
+        depth = request.args.get('depth', type=int)
+        page = getSubtreePage(id,
+                              maxDepth=depth,
+                              view=request.args.get('view', 'full'),
+                              limit=parseLimit(request.args.get('limit')),
+                              after=request.args.get('after'))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except DB_ERRORS as e:
+        return jsonify({'error': 'Failed to fetch reporting subtree'}), 500
+    if page is None:
+        return jsonify({'message': 'Employee not found'}), 404
+    items, nextCursor = page
+    return jsonify({'employees': items, 'nextCursor': nextCursor}), 200
  
 @app.route('/api/get-manager/<int:id>', methods=['GET'])
 def get_manager(id):
@@ -127,15 +229,46 @@ def get_manager(id):
     if not manager:
         return jsonify({'message': 'No manager found.'}), 404
     print(f"Manager found: {manager.toString()}")
-    return jsonify({manager.toDict()}), 200
+    return jsonify(manager.toDict()), 200
+ 
+@app.route('/api/employees/<int:id>/managers', methods=['GET'])
+def get_reporting_chain(id):
+    managers = getManagers(id)
+    if managers is None:
+        return jsonify({'managers': []}), 200
+    return jsonify({'managers': [manager.toDict() for manager in managers]}), 200
+ 
+@app.route('/api/employees/<int:id>/common-manager/<int:otherId>', methods=['GET'])
+def get_common_manager(id, otherId):
+    manager = getCommonManager(id, otherId)
+    if not manager:
+        return jsonify({'message': 'No common manager found.'}), 404
+    return jsonify(manager.toDict()), 200
+ 
+@app.route('/api/employees/<int:id>/manager', methods=['PUT'])
+def update_manager(id):
+    data = request.json or {}
+    if 'managerId' not in data:
+        return jsonify({'error': 'managerId is required'}), 400
+    managerId = data.get('managerId')
+    if managerId is not None:
+        try:
+            managerId = int(managerId)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid manager ID format'}), 400
+    if updateManager(id, managerId):
+        return jsonify({'message': 'Manager updated successfully.'}), 200
+    return jsonify({'error': 'Failed to update manager (unknown employee or reporting cycle)'}), 400
  
 @app.route('/api/profile/<int:id>', methods=['GET'])
 def get_profile(id):
     # In a real app, you'd get the user ID from a session or token
-    employee = getEmployeeByID(id)
+    fields = requestedFields(Employee)
+    employee = getCachedEmployeeByID(id)
+    if employee and fields:
+        return jsonify(employee.project(fields))
     if employee:
-        print(f"Employee object before toDict(): {employee.toDict()}") # Add this line
-        return jsonify(employee.toDict())
+        return Response(employee.toJSON(), mimetype='application/json')
     return jsonify({'message': 'User not found'}), 404
  
  
@@ -147,17 +280,47 @@ Ticket Management API
 """
 @app.route('/api/tickets', methods=['GET'])
 def tickets():
+    if streamFormat():
+        return streamList('tickets', ticketListing)
+    if ticketListing.isRequested(request.args):
+        return listPage('tickets', Ticket, getTicketsPage)
     try:
+        # Already newest first from the query
         tickets_list = getTickets()
-        # Sort tickets to show newest first
-        if tickets_list:
-            sorted_tickets = sorted(tickets_list, key=lambda t: t.createdDate, reverse=True)
-            return jsonify({'tickets': [ticket.toDict() for ticket in sorted_tickets]}), 200
-        return jsonify({'tickets': []}), 200
+        return jsonify({'tickets': [ticket.toDict() for ticket in tickets_list]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error in /api/tickets: {e}")
         return jsonify({'error': 'Internal server error fetching tickets', 'details': str(e)}), 500
  
+@app.route('/api/tickets/employee', methods=['GET'])
+@app.route('/api/tickets/employee/<int:employeeId>', methods=['GET'])
+def employee_tickets(employeeId=None):
+    if employeeId is None:
+        employeeId = request.args.get('employeeId', type=int)
+        if employeeId is None:
+            return jsonify({'error': 'employeeId is required'}), 400
+    fields = requestedFields(Ticket)
+    tickets_list = getCachedTicketsByEmployeeId(employeeId)
+    if tickets_list is None:
+        return jsonify({'error': 'Failed to fetch tickets'}), 500
+    if fields:
+        return jsonify({'tickets': [ticket.project(fields) for ticket in tickets_list]}), 200
+    return Response('{"tickets":' + dumpList(tickets_list) + '}', mimetype='application/json')
+ 
+def findSimilarTickets(ticket=None, title=None, body=None, limit=5, minScore=SIMILAR_TICKET_MIN_SCORE):
+    # Duplicate hints are best effort: a failed index load shouldn't fail the request that asked for them
+    try:
+        if ticket is not None:
+            results = ticketSimilarityIndex.similarTo(ticket, limit=limit, minScore=minScore)
+        else:
+            results = ticketSimilarityIndex.similar(title, body, limit=limit, minScore=minScore)
+    except DB_ERRORS as e:
+        print("Error loading similarity index: ", e)
+        return []
+    return [{'score': round(score, 4), 'ticket': match.toDict()} for score, match in results]
+ 
 @app.route('/api/tickets/create', methods=['POST'])
 def create_ticket():
     try:
@@ -176,15 +339,49 @@ def create_ticket():
         new_ticket = createTicket(employeeId, title, body, createdDate, priority, status, category)
         
         if new_ticket:
-            return jsonify({'message': 'Ticket created successfully', 'ticket': new_ticket.toDict()}), 201
+            return jsonify({'message': 'Ticket created successfully', 'ticket': new_ticket.toDict(),
+                            'similarTickets': findSimilarTickets(new_ticket)}), 201
         return jsonify({'error': 'Failed to create ticket'}), 500
  
     except ValueError as e:
         return jsonify({'error': 'Invalid employee ID format'}), 400
+    except PoolTimeout:
+        raise
     except Exception as e:
         print("Error creating ticket:", str(e))
         return jsonify({'error': str(e)}), 500
         
+@app.route('/api/tickets/<int:ticketId>', methods=['GET'])
+def get_ticket(ticketId):
+    fields = requestedFields(Ticket)
+    # Closed tickets move to the archive table after a while; fall back to it
+    ticket, archived = getTicketById(ticketId), False
+    if ticket is None:
+        ticket, archived = getArchivedTicketById(ticketId), True
+    if ticket is None:
+        return jsonify({'error': 'Ticket not found'}), 404
+    item = ticket.project(fields)
+    item['archived'] = archived
+    return jsonify(item), 200
+ 
+@app.route('/api/tickets/archive', methods=['GET', 'POST'])
+def archive_tickets():
+    if request.method == 'GET':
+        return jsonify(ticketArchiver.stats()), 200
+    data = request.get_json(silent=True) or {}
+    try:
+        olderThanDays = int(data.get('olderThanDays', TICKET_ARCHIVE_AFTER_DAYS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'olderThanDays must be an integer'}), 400
+    try:
+        archived = ticketArchiver.runOnce(olderThanDays=olderThanDays)
+    except DB_ERRORS as e:
+        print("Error archiving tickets: ", e)
+        return jsonify({'error': 'Failed to archive tickets'}), 500
+    if archived is None:
+        return jsonify({'error': 'An archival pass is already running'}), 409
+    return jsonify({'archived': archived, 'olderThanDays': olderThanDays}), 200
+ 
 @app.route('/api/tickets/update/<int:ticketId>', methods=['PUT'])
 def update_ticket_route(ticketId):
     data = request.json
@@ -198,13 +395,106 @@ def update_ticket_route(ticketId):
     else:
         return jsonify({'message': 'Failed to update ticket or ticket not found'}), 404
  
+@app.route('/api/tickets/sla', methods=['GET'])
+def ticket_sla():
+    limit = parseLimit(request.args.get('limit'), default=50, maximum=1000)
+    within = request.args.get('within', type=float)
+    try:
+        return jsonify(slaTracker.snapshot(limit=limit, withinHours=within)), 200
+    except DB_ERRORS as e:
+        print("Error loading SLA state: ", e)
+        return jsonify({'error': 'Failed to load SLA state'}), 500
+ 
+@app.route('/api/tickets/metrics', methods=['GET'])
+def ticket_metrics():
+    try:
+        return jsonify(ticketMetrics.snapshot()), 200
+    except DB_ERRORS as e:
+        print("Error loading ticket metrics: ", e)
+        return jsonify({'error': 'Failed to load ticket metrics'}), 500
+ 
+@app.route('/api/tickets/search', methods=['GET'])
+def search_tickets():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    limit = parseLimit(request.args.get('limit'), default=20, maximum=200)
+    started = time.perf_counter()
+    try:
+        terms, results = ticketSearchIndex.search(query, limit=limit,
+                                                  status=request.args.get('status'),
+                                                  priority=request.args.get('priority'),
+                                                  category=request.args.get('category'),
+                                                  employeeId=request.args.get('employeeId', type=int))
+    except DB_ERRORS as e:
+        print("Error loading search index: ", e)
+        return jsonify({'error': 'Failed to load search index'}), 500
+    return jsonify({
+        'query': query,
+        'tookMs': round((time.perf_counter() - started) * 1000, 2),
+        'results': [{
+            'score': round(score, 4),
+            'ticket': ticket.toDict(),
+            'archived': ticketSearchIndex.isArchived(ticket.ticketId),
+            'highlights': {'title': highlight(ticket.title, terms), 'body': highlight(ticket.body, terms, maxLength=200)},
+        } for score, ticket in results],
+    }), 200
+ 
+@app.route('/api/tickets/<int:ticketId>/similar', methods=['GET'])
+def similar_tickets(ticketId):
+    ticket = getTicketById(ticketId)
+    if ticket is None:
+        return jsonify({'error': 'Ticket not found'}), 404
+    limit = parseLimit(request.args.get('limit'), default=5, maximum=100)
+    minScore = request.args.get('minScore', SIMILAR_TICKET_MIN_SCORE, type=float)
+    return jsonify({'ticketId': ticketId, 'similarTickets': findSimilarTickets(ticket, limit=limit, minScore=minScore)}), 200
+ 
+@app.route('/api/tickets/similar', methods=['POST'])
+def similar_tickets_for_text():
+    # Lets the ticket form warn about likely duplicates before anything is filed
+    data = request.json or {}
+    title, body = data.get('title'), data.get('body')
+    if not title and not body:
+        return jsonify({'error': 'title or body is required'}), 400
+    limit = parseLimit(data.get('limit'), default=5, maximum=100)
+    try:
+        minScore = float(data.get('minScore', SIMILAR_TICKET_MIN_SCORE))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'minScore must be a number'}), 400
+    return jsonify({'similarTickets': findSimilarTickets(title=title, body=body, limit=limit, minScore=minScore)}), 200
+ 
+@app.route('/api/tickets/bulk-update', methods=['PUT'])
+def bulk_update_tickets():
+    data = request.json or {}
+    updates = data.get('updates')
+    if updates is None and 'ticketIds' in data:
+        # Same changes for every listed ticket
+        changes = data.get('changes') or {}
+        updates = [dict(changes, ticketId=ticketId) for ticketId in data['ticketIds'] or []]
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': "Provide 'updates' or 'ticketIds' with 'changes'"}), 400
+    if len(updates) > BULK_UPDATE_MAX:
+        return jsonify({'error': f'At most {BULK_UPDATE_MAX} tickets per request'}), 400
+
+    results = bulkUpdateTickets(updates)
+    if results is None:
+        return jsonify({'error': 'Bulk update failed; no tickets were changed'}), 500
+    counts = {outcome: sum(1 for result in results if result['result'] == outcome) for outcome in ('updated', 'not_found', 'invalid')}
+    return jsonify({'results': results, 'updated': counts['updated'], 'notFound': counts['not_found'], 'invalid': counts['invalid']}), 200
+ 
 # Leave Management API Routes
 @app.route('/api/leave-requests', methods=['GET', 'POST'])
 def leave_requests():
     if request.method == 'GET':
+        if streamFormat():
+            return streamList('leaveRequests', leaveRequestListing)
+        if leaveRequestListing.isRequested(request.args):
+            return listPage('leaveRequests', LeaveRequest, getLeaveRequestsPage)
         try:
             leave_requests = getLeaveRequests()
             return jsonify({'leaveRequests': [req.toDict() for req in leave_requests]}), 200
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error fetching leave requests: {e}")
             return jsonify({'error': 'Failed to fetch leave requests'}), 500
@@ -222,41 +512,58 @@ def leave_requests():
             if not all([employeeId, leaveType, startDate, endDate, days, reason]):
                 return jsonify({'error': 'All fields are required'}), 400
             
-            success = createLeaveRequest(employeeId, leaveType, startDate, endDate, days, reason)
-            if success:
-                return jsonify({'message': 'Leave request created successfully'}), 201
+            leave_request, coverage = submitLeaveRequest(employeeId, leaveType, startDate, endDate, days, reason)
+            if leave_request:
+                return jsonify({'message': 'Leave request created successfully', 'leaveRequest': leave_request.toDict(),
+                                'coverage': coverage}), 201
             else:
                 return jsonify({'error': 'Failed to create leave request'}), 500
+        except LeaveRequestError as e:
+            if e.conflicts or e.coverage:
+                return jsonify({'error': str(e), 'conflicts': e.conflicts, 'coverage': e.coverage}), 409
+            return jsonify({'error': str(e)}), 400
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error creating leave request: {e}")
             return jsonify({'error': 'Failed to create leave request'}), 500
  
 @app.route('/api/leave-requests/pending', methods=['GET'])
 def pending_leave_requests():
+    if pendingLeaveRequestListing.isRequested(request.args):
+        return listPage('leaveRequests', LeaveRequest, getPendingLeaveRequestsPage)
     try:
         pending_requests = getPendingLeaveRequests()
         return jsonify({'leaveRequests': [req.toDict() for req in pending_requests]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching pending leave requests: {e}")
         return jsonify({'error': 'Failed to fetch pending leave requests'}), 500
  
 @app.route('/api/leave-requests/employee/<int:employeeId>', methods=['GET'])
 def employee_leave_requests(employeeId):
+    fields = requestedFields(LeaveRequest)
     try:
         employee_requests = getLeaveRequestsByEmployeeId(employeeId)
-        return jsonify({'leaveRequests': [req.toDict() for req in employee_requests]}), 200
+        return jsonify({'leaveRequests': [req.project(fields) for req in employee_requests]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching employee leave requests: {e}")
         return jsonify({'error': 'Failed to fetch employee leave requests'}), 500
  
 @app.route('/api/leave-requests/<int:requestId>', methods=['GET'])
 def get_leave_request(requestId):
+    fields = requestedFields(LeaveRequest)
     try:
         leave_request = getLeaveRequestById(requestId)
         if leave_request:
-            return jsonify(leave_request.toDict()), 200
+            return jsonify(leave_request.project(fields)), 200
         else:
             return jsonify({'error': 'Leave request not found'}), 404
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching leave request: {e}")
         return jsonify({'error': 'Failed to fetch leave request'}), 500
@@ -270,11 +577,13 @@ def approve_leave_request_route(requestId):
         if not approvedBy:
             return jsonify({'error': 'approvedBy is required'}), 400
         
-        success = approveLeaveRequest(requestId, approvedBy)
-        if success:
-            return jsonify({'message': 'Leave request approved successfully'}), 200
+        leave_request = approveLeaveRequest(requestId, approvedBy)
+        if leave_request:
+            return jsonify({'message': 'Leave request approved successfully', 'leaveRequest': leave_request.toDict()}), 200
         else:
             return jsonify({'error': 'Failed to approve leave request'}), 500
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error approving leave request: {e}")
         return jsonify({'error': 'Failed to approve leave request'}), 500
@@ -288,15 +597,48 @@ def reject_leave_request_route(requestId):
         if not approvedBy:
             return jsonify({'error': 'approvedBy is required'}), 400
         
-        success = rejectLeaveRequest(requestId, approvedBy)
-        if success:
-            return jsonify({'message': 'Leave request rejected successfully'}), 200
+        leave_request = rejectLeaveRequest(requestId, approvedBy)
+        if leave_request:
+            return jsonify({'message': 'Leave request rejected successfully', 'leaveRequest': leave_request.toDict()}), 200
         else:
             return jsonify({'error': 'Failed to reject leave request'}), 500
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error rejecting leave request: {e}")
         return jsonify({'error': 'Failed to reject leave request'}), 500
  
+@app.route('/api/leave-requests/bulk-decision', methods=['PUT'])
+def bulk_decide_leave_requests():
+    data = request.json or {}
+    requestIds = data.get('requestIds')
+    # Accept the verb used by the single-request routes as well as the resulting status
+    status = {'approve': 'approved', 'reject': 'rejected'}.get(data.get('decision'), data.get('decision'))
+    approvedBy = data.get('approvedBy')
+    if not isinstance(requestIds, list) or not requestIds:
+        return jsonify({'error': 'requestIds is required'}), 400
+    if status not in DECISION_STATUSES:
+        return jsonify({'error': "decision must be 'approve' or 'reject'"}), 400
+    if not approvedBy:
+        return jsonify({'error': 'approvedBy is required'}), 400
+    if len(requestIds) > BULK_DECISION_MAX:
+        return jsonify({'error': f'At most {BULK_DECISION_MAX} leave requests per request'}), 400
+
+    results = decideLeaveRequests(requestIds, status, approvedBy)
+    if results is None:
+        return jsonify({'error': 'Bulk decision failed; no leave requests were changed'}), 500
+    employeeIds = [result['leaveRequest']['employeeId'] for result in results if result['result'] == 'updated']
+    balances = getLeaveBalances(employeeIds) or {}
+    counts = {outcome: sum(1 for result in results if result['result'] == outcome) for outcome in ('updated', 'not_found', 'conflict', 'invalid')}
+    return jsonify({
+        'results': results,
+        'updated': counts['updated'],
+        'notFound': counts['not_found'],
+        'conflicts': counts['conflict'],
+        'invalid': counts['invalid'],
+        'balances': [balance.toDict() for balance in balances.values()],
+    }), 200
+ 
 @app.route('/api/leave-balance/<int:employeeId>', methods=['GET'])
 def get_leave_balance_route(employeeId):
     try:
@@ -305,27 +647,119 @@ def get_leave_balance_route(employeeId):
             return jsonify(leave_balance.toDict()), 200
         else:
             return jsonify({'error': 'Employee not found or no leave balance available'}), 404
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching leave balance: {e}")
         return jsonify({'error': 'Failed to fetch leave balance'}), 500
     
+LEAVE_BALANCE_BATCH_MAX = int(os.getenv('LEAVE_BALANCE_BATCH_MAX', 5000))
+
+@app.route('/api/leave-balances', methods=['GET', 'POST'])
+def get_leave_balances_route():
+    # GET ?employeeIds=1,2,3 or POST {"employeeIds": [1, 2, 3]} for lists too long for a URL
+    if request.method == 'POST':
+        employeeIds = (request.get_json(silent=True) or {}).get('employeeIds')
+    else:
+        employeeIds = [value for value in request.args.get('employeeIds', '').split(',') if value.strip()]
+    if not isinstance(employeeIds, list) or not employeeIds:
+        return jsonify({'error': 'employeeIds is required'}), 400
+    if len(employeeIds) > LEAVE_BALANCE_BATCH_MAX:
+        return jsonify({'error': f'At most {LEAVE_BALANCE_BATCH_MAX} employees per request'}), 400
+    try:
+        employeeIds = [int(employeeId) for employeeId in employeeIds]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'employeeIds must be integers'}), 400
+
+    balances = getLeaveBalances(employeeIds)
+    if balances is None:
+        return jsonify({'error': 'Failed to fetch leave balances'}), 500
+    return jsonify({
+        'balances': [balances[employeeId].toDict() for employeeId in dict.fromkeys(employeeIds) if employeeId in balances],
+        'notFound': [employeeId for employeeId in dict.fromkeys(employeeIds) if employeeId not in balances],
+    }), 200
+
+@app.route('/api/leave-calendar', methods=['GET'])
+def team_leave_calendar():
+    managerId = request.args.get('managerId', type=int)
+    department = request.args.get('department')
+    if (managerId is None) == (department is None):
+        return jsonify({'error': 'Pass exactly one of managerId or department'}), 400
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else date.today()
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else start + timedelta(days=TEAM_CALENDAR_DEFAULT_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD)'}), 400
+    if end < start:
+        return jsonify({'error': 'to must not be before from'}), 400
+    if (end - start).days + 1 > TEAM_CALENDAR_MAX_DAYS:
+        return jsonify({'error': f'The window can be at most {TEAM_CALENDAR_MAX_DAYS} days'}), 400
+    statuses = tuple(request.args.get('status', ','.join(CALENDAR_STATUSES)).split(','))
+    if not statuses or any(status not in CALENDAR_STATUSES for status in statuses):
+        return jsonify({'error': f"status must be one or more of: {', '.join(CALENDAR_STATUSES)}"}), 400
+
+    try:
+        calendar = getTeamCalendar(start, end, managerId=managerId, department=department,
+                                   maxDepth=request.args.get('depth', type=int), statuses=statuses)
+    except DB_ERRORS:
+        return jsonify({'error': 'Failed to fetch team calendar'}), 500
+    if calendar is None:
+        return jsonify({'message': 'Employee not found'}), 404
+    return jsonify({'from': start.isoformat(), 'to': end.isoformat(), 'managerId': managerId, 'department': department, **calendar}), 200
+
+@app.route('/api/leave-ledger/reconcile', methods=['GET', 'POST'])
+def reconcile_leave_ledger():
+    # GET only reports differences; POST {"repair": true} also fixes them
+    repair = request.method == 'POST' and bool((request.get_json(silent=True) or {}).get('repair'))
+    try:
+        result = reconcileLeaveLedger(repair=repair)
+    except DB_ERRORS as e:
+        print("Error reconciling leave ledger: ", e)
+        return jsonify({'error': 'Failed to reconcile leave ledger'}), 500
+    return jsonify(result), 200
+
+@app.route('/api/leave-balances/team/<int:managerId>', methods=['GET'])
+def get_team_leave_balances_route(managerId):
+    try:
+        team = getTeamLeaveBalances(managerId, maxDepth=request.args.get('depth', type=int))
+    except DB_ERRORS:
+        return jsonify({'error': 'Failed to fetch team leave balances'}), 500
+    if team is None:
+        return jsonify({'message': 'Employee not found'}), 404
+    balances = []
+    for balance, parentId, depth in team:
+        item = balance.toDict()
+        item['managerId'] = parentId
+        item['depth'] = depth
+        balances.append(item)
+    return jsonify({'managerId': managerId, 'balances': balances}), 200
+    
 """
 Timesheet Management API
 """
 @app.route('/api/timesheets', methods=['GET'])
 def get_timesheets():
+    if streamFormat():
+        return streamList('timesheets', timesheetListing)
+    if timesheetListing.isRequested(request.args):
+        return listPage('timesheets', Timesheet, getTimesheetsPage)
     try:
         timesheets = getTimesheets()
         return jsonify({'timesheets': [ts.toDict() for ts in timesheets]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching timesheets: {e}")
         return jsonify({'error': 'Failed to fetch timesheets'}), 500
  
 @app.route('/api/timesheets/<int:employeeId>', methods=['GET'])
 def get_timesheets_by_employee(employeeId):
+    fields = requestedFields(Timesheet)
     try:
         timesheets = getTimesheetsByEmployeeId(employeeId)
-        return jsonify({'timesheets': [ts.toDict() for ts in timesheets]}), 200
+        return jsonify({'timesheets': [ts.project(fields) for ts in timesheets]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching timesheets for employee {employeeId}: {e}")
         return jsonify({'error': 'Failed to fetch timesheets for employee'}), 500
@@ -345,8 +779,12 @@ def create_timesheet():
         totalHours = data.get('totalHours')
         notes = data.get('notes')
  
-        createTimesheet(employeeId, weekOf, monday, tuesday, wednesday, thursday, friday, saturday, totalHours, notes)
-        return jsonify({'message': 'Timesheet created successfully'}), 201
+        timesheet = createTimesheet(employeeId, weekOf, monday, tuesday, wednesday, thursday, friday, saturday, totalHours, notes)
+        if timesheet is None:
+            return jsonify({'error': 'Failed to create timesheet'}), 500
+        return jsonify({'message': 'Timesheet created successfully', 'timesheet': timesheet.toDict()}), 201
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error creating timesheet: {e}")
         return jsonify({'error': 'Failed to create timesheet'}), 500
@@ -356,21 +794,27 @@ Course Management API
 """
 @app.route('/api/courses', methods=['GET'])
 def get_courses():
+    fields = requestedFields(Course)
     try:
-        courses = getCourses()
-        return jsonify({'courses': [course.toDict() for course in courses]}), 200
+        courses = getCourses(fields)
+        return jsonify({'courses': [course.project(fields) for course in courses]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching courses: {e}")
         return jsonify({'error': 'Failed to fetch courses'}), 500
     
 @app.route('/api/courses/<int:courseId>', methods=['GET'])
 def get_course(courseId):
+    fields = requestedFields(Course)
     try:
-        course = getCourseByID(courseId)
+        course = getCourseByID(courseId, fields)
         if course:
-            return jsonify(course.toDict()), 200
+            return jsonify(course.project(fields)), 200
         else:
             return jsonify({'error': 'Course not found'}), 404
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching course {courseId}: {e}")
         return jsonify({'error': 'Failed to fetch course'}), 500
@@ -383,10 +827,12 @@ def enroll():
         employeeId = data.get('EmployeeID')
         level = data.get('level', 0)  # Default to level 0 if not provided
         
-        success = enrollInCourse(employeeId, courseId, level)
-        if success:
-            return jsonify({'message': 'Successfully enrolled in course'}), 201
+        enrollment = enrollInCourse(employeeId, courseId, level)
+        if enrollment:
+            return jsonify({'message': 'Successfully enrolled in course', 'enrollment': enrollment.toDict()}), 201
         return jsonify({'error': 'Failed to enroll in course'}), 500
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error enrolling in course: {e}")
         return jsonify({'error': 'Failed to enroll in course'}), 500
@@ -398,6 +844,8 @@ def get_enrollment(employeeId, courseId):
         if enrollment:
             return jsonify(enrollment.toDict()), 200
         return jsonify({'message': 'No enrollment found'}), 404
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching enrollment: {e}")
         return jsonify({'error': 'Failed to fetch enrollment'}), 500
@@ -427,6 +875,8 @@ def submit_quiz():
                 'message': 'Quiz failed, try again',
                 'currentLevel': result['newLevel']
             }), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error updating quiz progress: {e}")
         return jsonify({'error': 'Failed to update quiz progress'}), 500
@@ -436,6 +886,8 @@ def get_employee_enrollments(employeeId):
     try:
         enrollments = getEnrollmentsByEmployeeId(employeeId)
         return jsonify({'enrollments': [enrollment.toDict() for enrollment in enrollments]}), 200
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching enrollments: {e}")
         return jsonify({'error': 'Failed to fetch enrollments'}), 500
@@ -501,21 +953,42 @@ def index():
             '/api/AIRequestHistory',
             '/api/login',
             '/api/test',
+            '/api/db/pool-stats',
+            '/api/cache/stats',
+            '/api/events',
             '/api/employees',
             '/api/employees/count',
+            '/api/employees/stats',
             '/api/update-bio',
             '/api/get-subordinates/<int:id>',
             '/api/get-manager/<int:id>',
+            '/api/employees/<int:id>/managers',
+            '/api/employees/<int:id>/subtree',
+            '/api/employees/<int:id>/common-manager/<int:otherId>',
+            '/api/employees/<int:id>/manager',
             '/api/profile',
             '/api/tickets',
             '/api/tickets/<int:ticketId>',
+            '/api/tickets/employee/<int:employeeId>',
+            '/api/tickets/<int:ticketId>/similar',
+            '/api/tickets/archive',
+            '/api/tickets/similar',
+            '/api/tickets/metrics',
+            '/api/tickets/search',
+            '/api/tickets/bulk-update',
+            '/api/tickets/sla',
             '/api/leave-requests',
             '/api/leave-requests/<int:requestId>',
             '/api/leave-requests/<int:requestId>/approve',
             '/api/leave-requests/<int:requestId>/reject',
             '/api/leave-requests/employee/<int:employeeId>',
             '/api/leave-requests/pending',
+            '/api/leave-requests/bulk-decision',
             '/api/leave-balance/<int:employeeId>',
+            '/api/leave-balances',
+            '/api/leave-balances/team/<int:managerId>',
+            '/api/leave-ledger/reconcile',
+            '/api/leave-calendar',
             '/api/timesheets',
             '/api/timesheets/<int:employeeId>',
             '/api/timesheets/create',
@@ -523,7 +996,20 @@ def index():
     })
  
  
+@app.cli.command('archive-tickets')
+def archive_tickets_command():
+    """Archive old closed tickets once, or every TICKET_ARCHIVE_INTERVAL seconds if it is set"""
+    if ticketArchiver.interval > 0:
+        ticketArchiver.run()
+    else:
+        archived = ticketArchiver.runOnce()
+        print("Another archival pass is running" if archived is None else f"Archived {archived} closed tickets")
+
+
 if __name__ == '__main__':
+    # The reloader runs this module twice; only the serving child process archives
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        ticketArchiver.start()
     port = int(os.environ.get("PORT", 8000))
     app.run(debug=True, host='0.0.0.0', port=port)
  
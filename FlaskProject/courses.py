@@ -1,8 +1,12 @@
-import os
-import pyodbc
 from dbconnect import *
+from dbpool import getConnection, DB_ERRORS
+from dml import insertReturning
+from model import Model
+from rowmap import RowMapper
 
-class Course:
+class Course(Model):
+    __slots__ = ('CourseID', 'CourseName', 'Quiz1', 'Quiz2', 'Quiz3', 'Description')
+    fieldAttributes = {name: (name,) for name in __slots__}
 
     def __init__(self, CourseID=None, CourseName=None, Quiz1=None, Quiz2=None, Quiz3=None, Description=None):
         self.CourseID = CourseID
@@ -22,7 +26,10 @@ class Course:
             "Description": self.Description
         }
 
-class Quiz:
+class Quiz(Model):
+    __slots__ = ('QuizID', 'QuizName', 'Question1', 'Question2', 'Question3', 'Question4', 'Question5',
+                 'Question6', 'Question7', 'Question8', 'Question9', 'Question10', 'AnswerString')
+    fields = {name: name for name in __slots__}
 
     def __init__(self, QuizID=None, QuizName=None, Question1=None, Question2=None, Question3=None, Question4=None, Question5=None, Question6=None, Question7=None, Question8=None, Question9=None, Question10=None, AnswerString=None):
         self.QuizID = QuizID
@@ -38,25 +45,10 @@ class Quiz:
         self.Question9 = Question9
         self.Question10 = Question10
         self.AnswerString = AnswerString
-
-    def toDict(self):
-        return {
-            "QuizID": self.QuizID,
-            "QuizName": self.QuizName,
-            "Question1": self.Question1,
-            "Question2": self.Question2,
-            "Question3": self.Question3,
-            "Question4": self.Question4,
-            "Question5": self.Question5,
-            "Question6": self.Question6,
-            "Question7": self.Question7,
-            "Question8": self.Question8,
-            "Question9": self.Question9,
-            "Question10": self.Question10,
-            "AnswerString": self.AnswerString
-        }
     
-class Enrollment:
+class Enrollment(Model):
+    __slots__ = ('EnrollmentID', 'CourseID', 'EmployeeID', 'Level')
+    fields = {name: name for name in __slots__}
 
     def __init__(self, EnrollmentID=None, CourseID=None, EmployeeID=None, Level=1):
         self.EnrollmentID = EnrollmentID
@@ -64,134 +56,111 @@ class Enrollment:
         self.EmployeeID = EmployeeID
         self.Level = Level
 
-    def toDict(self):
-        return {
-            "EnrollmentID": self.EnrollmentID,
-            "CourseID": self.CourseID,
-            "EmployeeID": self.EmployeeID,
-            "Level": self.Level
-        }
+courseMapper = RowMapper(Course, {name: name for name in ('CourseID', 'CourseName', 'Description')})
+quizMapper = RowMapper(Quiz, {name: name for name in Quiz.__slots__})
+enrollmentMapper = RowMapper(Enrollment, {name: name for name in Enrollment.__slots__})
+
+QUIZ_COLUMNS = ('Quiz1ID', 'Quiz2ID', 'Quiz3ID')
+QUIZ_ATTRS = ('Quiz1', 'Quiz2', 'Quiz3')
+
+def attachQuizzes(cursor, courseRows, courses):
+    """Fill in Quiz1-3 for a batch of courses with a single QUIZZES query"""
+    quizIds = {getattr(row, column) for row in courseRows for column in QUIZ_COLUMNS if getattr(row, column, None)}
+    quizzes = {}
+    if quizIds:
+        placeholders = ', '.join('?' * len(quizIds))
+        cursor.execute(f"SELECT * FROM QUIZZES WHERE QuizID IN ({placeholders})", tuple(quizIds))
+        quizzes = {quiz.QuizID: quiz for quiz in quizMapper.mapRows(cursor, cursor.fetchall())}
+    for row, course in zip(courseRows, courses):
+        for column, attr in zip(QUIZ_COLUMNS, QUIZ_ATTRS):
+            quizId = getattr(row, column, None)
+            setattr(course, attr, quizzes.get(quizId) if quizId else None)
+    return courses
+
+def courseColumns(fields=None):
+    """COURSES columns needed for a `fields=` projection, and whether quizzes must be loaded"""
+    attrs = Course.attributesFor(fields)
+    columns = [name for name in ('CourseID', 'CourseName', 'Description') if attrs is None or name in attrs]
+    quizColumns = [column for column, attr in zip(QUIZ_COLUMNS, QUIZ_ATTRS) if attrs is None or attr in attrs]
+    return ', '.join(columns + quizColumns), bool(quizColumns)
 
-def getCourses():
+def getCourses(fields=None):
     courses = []
+    columns, withQuizzes = courseColumns(fields)
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM COURSES"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            newCourse = Course(
-                CourseID=row.CourseID,
-                CourseName=row.CourseName,
-                Quiz1=getQuizByID(row.Quiz1ID) if row.Quiz1ID else None,
-                Quiz2=getQuizByID(row.Quiz2ID) if row.Quiz2ID else None,
-                Quiz3=getQuizByID(row.Quiz3ID) if row.Quiz3ID else None,
-                Description=row.Description
-            )
-            print(f"Course fetched: {newCourse.CourseName}")
-            courses.append(newCourse)
-        cursor.close()
-        connection.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"SELECT {columns} FROM COURSES"
+            cursor.execute(query)
+            rows = cursor.fetchall()
+            courses = courseMapper.mapRows(cursor, rows)
+            if withQuizzes:
+                attachQuizzes(cursor, rows, courses)
+            cursor.close()
+        print(f"Fetched {len(courses)} courses.")
+    except DB_ERRORS as e:
         print("Error fetching data: ", e)
     return courses
 
 def getQuizByID(quiz_id):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM QUIZZES WHERE QuizID = ?"
-        cursor.execute(query, (quiz_id,))
-        row = cursor.fetchone()
-
-        if row:
-            quiz = Quiz(
-                QuizID=row.QuizID,
-                QuizName=row.QuizName,
-                Question1=row.Question1,
-                Question2=row.Question2,
-                Question3=row.Question3,
-                Question4=row.Question4,
-                Question5=row.Question5,
-                Question6=row.Question6,
-                Question7=row.Question7,
-                Question8=row.Question8,
-                Question9=row.Question9,
-                Question10=row.Question10,
-                AnswerString=row.AnswerString
-            )
-            cursor.close()
-            connection.close()
-            return quiz
-        else:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM QUIZZES WHERE QuizID = ?"
+            cursor.execute(query, (quiz_id,))
+            quiz = quizMapper.mapRow(cursor, cursor.fetchone())
             cursor.close()
-            connection.close()
-            return None
-    except pyodbc.Error as e:
+        return quiz
+    except DB_ERRORS as e:
         print("Error fetching data: ", e)
         return None
 
-def getCourseByID(course_id):
+def getCourseByID(course_id, fields=None):
+    columns, withQuizzes = courseColumns(fields)
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM COURSES WHERE CourseID = ?"
-        cursor.execute(query, (course_id,))
-        row = cursor.fetchone()
-
-        if row:
-            course = Course(
-                CourseID=row.CourseID,
-                CourseName=row.CourseName,
-                Quiz1=getQuizByID(row.Quiz1ID) if row.Quiz1ID else None,
-                Quiz2=getQuizByID(row.Quiz2ID) if row.Quiz2ID else None,
-                Quiz3=getQuizByID(row.Quiz3ID) if row.Quiz3ID else None,
-                Description=row.Description
-            )
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"SELECT {columns} FROM COURSES WHERE CourseID = ?"
+            cursor.execute(query, (course_id,))
+            row = cursor.fetchone()
+            if not row:
+                cursor.close()
+                return None
+            course = courseMapper.mapRow(cursor, row)
+            if withQuizzes:
+                attachQuizzes(cursor, [row], [course])
             cursor.close()
-            connection.close()
-            return course
-        else:
-            cursor.close()
-            connection.close()
-            return None
-    except pyodbc.Error as e:
+        return course
+    except DB_ERRORS as e:
         print("Error fetching data: ", e)
         return None
     
 def enrollInCourse(employee_id, course_id, level=0):
+    """Enroll an employee and return the new Enrollment (None on failure)"""
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "INSERT INTO COURSE_ENROLLMENT (CourseID, EmployeeID, Level) VALUES (?, ?, ?)"
-        cursor.execute(query, (course_id, employee_id, level))
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = insertReturning('COURSE_ENROLLMENT', ['CourseID', 'EmployeeID', 'Level'], Enrollment.__slots__)
+            cursor.execute(query, (course_id, employee_id, level))
+            enrollment = enrollmentMapper.mapRow(cursor, cursor.fetchone())
+            connection.commit()
+            cursor.close()
         print("Enrollment successful!")
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error enrolling in course: ", e)
-        return False
-    return True
+        return None
+    return enrollment
 
 def updateEnrollmentLevel(enrollment_id, new_level):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "UPDATE COURSE_ENROLLMENT SET Level = ? WHERE EnrollmentID = ?"
-        cursor.execute(query, (new_level, enrollment_id))
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "UPDATE COURSE_ENROLLMENT SET Level = ? WHERE EnrollmentID = ?"
+            cursor.execute(query, (new_level, enrollment_id))
+            connection.commit()
+            cursor.close()
         print("Enrollment level updated successfully!")
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error updating enrollment level: ", e)
         return False
     return True
@@ -199,69 +168,43 @@ def updateEnrollmentLevel(enrollment_id, new_level):
 def getEnrollmentsByEmployeeId(employee_id):
     enrollments = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM COURSE_ENROLLMENT WHERE EmployeeID = ?"
-        cursor.execute(query, (employee_id,))
-        rows = cursor.fetchall()
-
-        for row in rows:
-            newEnrollment = Enrollment(
-                EnrollmentID=row.EnrollmentID,
-                CourseID=row.CourseID,
-                EmployeeID=row.EmployeeID,
-                Level=row.Level
-            )
-            enrollments.append(newEnrollment)
-        cursor.close()
-        connection.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM COURSE_ENROLLMENT WHERE EmployeeID = ?"
+            cursor.execute(query, (employee_id,))
+            enrollments = enrollmentMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching enrollments by Employee ID: ", e)
     return enrollments
 
 def getCourseEnrollment(employee_id, course_id):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM COURSE_ENROLLMENT WHERE EmployeeID = ? AND CourseID = ?"
-        cursor.execute(query, (employee_id, course_id))
-        row = cursor.fetchone()
-
-        if row:
-            enrollment = Enrollment(
-                EnrollmentID=row.EnrollmentID,
-                CourseID=row.CourseID,
-                EmployeeID=row.EmployeeID,
-                Level=row.Level
-            )
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM COURSE_ENROLLMENT WHERE EmployeeID = ? AND CourseID = ?"
+            cursor.execute(query, (employee_id, course_id))
+            enrollment = enrollmentMapper.mapRow(cursor, cursor.fetchone())
             cursor.close()
-            connection.close()
-            return enrollment
-        else:
-            cursor.close()
-            connection.close()
-            return None
-    except pyodbc.Error as e:
+        return enrollment
+    except DB_ERRORS as e:
         print("Error fetching enrollment: ", e)
         return None
 
 def updateQuizProgress(employee_id, course_id, current_level, passed):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-
         if passed:
             new_level = min(current_level + 1, 3)  # Cap at level 3
-            query = """
-                UPDATE COURSE_ENROLLMENT 
-                SET Level = ? 
-                WHERE EmployeeID = ? AND CourseID = ?
-            """
-            cursor.execute(query, (new_level, employee_id, course_id))
-            connection.commit()
+            with getConnection() as connection:
+                cursor = connection.cursor()
+                query = """
+                    UPDATE COURSE_ENROLLMENT 
+                    SET Level = ? 
+                    WHERE EmployeeID = ? AND CourseID = ?
+                """
+                cursor.execute(query, (new_level, employee_id, course_id))
+                connection.commit()
+                cursor.close()
             
             # Return the new level for front-end update
             result = {"success": True, "newLevel": new_level}
@@ -269,10 +212,8 @@ def updateQuizProgress(employee_id, course_id, current_level, passed):
             # If failed, don't update level but return current level
             result = {"success": False, "newLevel": current_level}
 
-        cursor.close()
-        connection.close()
         return result
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error updating quiz progress: ", e)
         return {"success": False, "error": str(e)}
 
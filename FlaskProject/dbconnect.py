@@ -1,18 +1,38 @@
-from dotenv import load_dotenv
+from itertools import islice
 import os
-import pyodbc
 
-load_dotenv(override=False)
+from cache import TTLCache
+from dbpool import getConnection, DB_ERRORS
+from dml import updateReturning
+from model import Model
+from org_hierarchy import orgHierarchy
+from org_stats import invalidateOrgStatistics
+from pagination import decodeCursor, encodeCursor, Filter, Listing, PaginationError, DEFAULT_LIMIT
+from rowmap import RowMapper, toFloat
 
-# Connection Details
-server = os.getenv('DB_SERVER')
-database = os.getenv('DB_DATABASE')
-username = os.getenv('DB_USERNAME')
-password = os.getenv('DB_PASSWORD')
-driver = os.getenv('DB_DRIVER')
 
+class Employee(Model):
+    __slots__ = ('firstName', 'lastName', 'ID', 'department', 'role', 'gender', 'pword', 'email', 'phoneNumber',
+                 'bio', 'ManagerID', 'vacationDays', 'sickDays', 'personalDays', 'otherDays', 'salary')
+    fields = {
+        "FirstName": "firstName",
+        "LastName": "lastName",
+        "EmployeeID": "ID",
+        "Department": "department",
+        "Role": "role",
+        "Gender": "gender",
+        "Pword": "pword",
+        "Email": "email",
+        "PhoneNumber": "phoneNumber",
+        "Bio": "bio",
+        "ManagerID": "ManagerID",
+        "VacationDays": "vacationDays",
+        "SickDays": "sickDays",
+        "PersonalDays": "personalDays",
+        "OtherDays": "otherDays",
+        "Salary": "salary"
+    }
 
-class Employee:
     def __init__(self, firstName="", lastName="", ID=-1, department="", role="", gender='', pword = "", email = "", phoneNumber="", bio="", ManagerID=None, vacationDays=20, sickDays=10, personalDays=5, otherDays=0, salary=0):
         self.firstName = firstName
         self.lastName = lastName
@@ -31,250 +51,336 @@ class Employee:
         self.otherDays = otherDays
         self.salary = salary
 
-    def toDict(self):
-        return {
-            "FirstName": self.firstName,
-            "LastName": self.lastName,
-            "EmployeeID": self.ID,
-            "Department": self.department,
-            "Role": self.role,
-            "Gender": self.gender,
-            "Pword": self.pword,
-            "Email": self.email,
-            "PhoneNumber": self.phoneNumber,
-            "Bio": self.bio,
-            "ManagerID": self.ManagerID,
-            "VacationDays": self.vacationDays,
-            "SickDays": self.sickDays,
-            "PersonalDays": self.personalDays,
-            "OtherDays": self.otherDays,
-            "Salary": self.salary
-        }
-
     def toString(self):
         return f" {self.ID}, {self.firstName}, {self.lastName}, {self.department}, {self.role}, {self.ManagerID}"
 
+EMPLOYEE_COLUMNS = {
+    'EmployeeID': 'ID',
+    'FirstName': 'firstName',
+    'LastName': 'lastName',
+    'Department': 'department',
+    'Role': 'role',
+    'Gender': 'gender',
+    'Pword': 'pword',
+    'Email': 'email',
+    'PhoneNumber': 'phoneNumber',
+    'Bio': 'bio',
+    'ManagerID': 'ManagerID',
+    'VacationDays': 'vacationDays',
+    'SickDays': 'sickDays',
+    'PersonalDays': 'personalDays',
+    'OtherDays': 'otherDays',
+    'Salary': 'salary',
+}
+
+employeeMapper = RowMapper(Employee, EMPLOYEE_COLUMNS, converters={'salary': toFloat})
+
+employeeListing = Listing(
+    employeeMapper,
+    {attr: column for column, attr in EMPLOYEE_COLUMNS.items()},
+    "EMPLOYEES", idColumn="EmployeeID",
+    sorts={
+        'id': 'EmployeeID',
+        'lastName': 'LastName',
+        'firstName': 'FirstName',
+        'department': 'Department',
+        'salary': 'Salary',
+    },
+    filters={
+        'department': Filter('Department'),
+        'role': Filter('Role'),
+        'gender': Filter('Gender'),
+        'managerId': Filter('ManagerID', int),
+        'salary': Filter('Salary', float, ranged=True),
+    },
+    defaultSort='id',
+)
+
 def parseDB():
 
     employees = []
 
-    connection = None  # Initialize connection to None
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-
-        query = "SELECT * FROM EMPLOYEES"
-        cursor = connection.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            idpls = row.EmployeeID
-            print(f"Employee ID: {idpls}")
-            # Create a new Employee object and populate it with the row data
-            print(type(row))
-            newEmployee = Employee()
-            # Handle the case where leave balance columns might not exist yet
-            newEmployee.ID = row.EmployeeID
-            newEmployee.firstName = row.FirstName
-            newEmployee.lastName = row.LastName
-            newEmployee.department = row.Department
-            newEmployee.role = row.Role
-            newEmployee.gender = row.Gender
-            newEmployee.pword = row.Pword
-            newEmployee.email = row.Email
-            newEmployee.phoneNumber = row.PhoneNumber
-            newEmployee.bio = row.Bio
-            newEmployee.ManagerID = row.ManagerID
-            newEmployee.vacationDays = row.VacationDays if hasattr(row, 'VacationDays') else 20
-            newEmployee.sickDays = row.SickDays if hasattr(row, 'SickDays') else 10
-            newEmployee.personalDays = row.PersonalDays if hasattr(row, 'PersonalDays') else 5
-            newEmployee.otherDays = row.OtherDays if hasattr(row, 'OtherDays') else 0
-            # Ensure salary is a number, default to 0 if None or not present
-            newEmployee.salary = float(row.Salary) if hasattr(row, 'Salary') and row.Salary is not None else 0
-            
-            print(row)
-            employees.append(newEmployee)
-
-        # close cursor
-        cursor.close()
-
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            query = "SELECT * FROM EMPLOYEES"
+            cursor = connection.cursor()
+            cursor.execute(query)
+            employees = employeeMapper.mapRows(cursor, cursor.fetchall())
+
+            # close cursor
+            cursor.close()
+
+    except DB_ERRORS as e:
         print("Error connecting to or fetching data from the database: ", e)
-    
-    finally:
-        # Make sure to close the connection if it was successfully opened
-        if connection:
-            connection.close()
-            print("Connection Closed.")
 
-    print("Employees List: ")
-    for employee in employees:
-        print(employee.toString())
+    print(f"Loaded {len(employees)} employees.")
 
     return employees
 
+def getEmployeesPage(args):
+    """Get one page of employees; returns (employees, nextCursor) or None on a database error"""
+    page = employeeListing.parse(args)
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            result = employeeListing.fetchPage(cursor, page)
+            cursor.close()
+        return result
+    except DB_ERRORS as e:
+        print("Error fetching employees page: ", e)
+        return None
+
 def updateBio(email, new_bio):
-    connection = None
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = f"UPDATE EMPLOYEES SET Bio = ? WHERE Email = ?"
-        cursor.execute(query, (new_bio, email))
-        connection.commit()
-        cursor.close()
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = updateReturning('EMPLOYEES', ['Bio = ?'], 'Email = ?', ['EmployeeID'])
+            cursor.execute(query, (new_bio, email))
+            updated = cursor.fetchall()
+            connection.commit()
+            cursor.close()
+        # Knowing the ID lets us drop the cached entries directly instead of scanning for them
+        for row in updated:
+            invalidateEmployee(row[0], email)
         print("Bio updated successfully.")
         return True
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error updating bio: ", e)
         return False
-    finally:
-        if connection:
-            connection.close()
     
 def getSubordinates(id):
-    subordinates = []
-    connection = None
+    """Get an employee's direct reports"""
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM EMPLOYEES WHERE ManagerID = ?"
-        cursor.execute(query, (id,))
-        rows = cursor.fetchall()
-
-        for row in rows:
-            newEmployee = Employee()
-            # Handle the case where leave balance columns might not exist yet
-            if len(row) >= 15:  # With leave balance columns
-                (newEmployee.ID, newEmployee.firstName, newEmployee.lastName, newEmployee.department, 
-                 newEmployee.role, newEmployee.gender, newEmployee.pword, newEmployee.email, 
-                 newEmployee.phoneNumber, newEmployee.bio, newEmployee.ManagerID,
-                 newEmployee.vacationDays, newEmployee.sickDays, newEmployee.personalDays, newEmployee.otherDays, newEmployee.salary) = row
-            else:  # Without leave balance columns (fallback)
-                (newEmployee.ID, newEmployee.firstName, newEmployee.lastName, newEmployee.department, 
-                 newEmployee.role, newEmployee.gender, newEmployee.pword, newEmployee.email, 
-                 newEmployee.phoneNumber, newEmployee.bio, newEmployee.ManagerID) = row
-                # Set default values
-                newEmployee.vacationDays = 20
-                newEmployee.sickDays = 10
-                newEmployee.personalDays = 5
-                newEmployee.otherDays = 0
-            print(row)
-            print(f"New subordinate added: {newEmployee.toString()}")
-            subordinates.append(newEmployee)
-        cursor.close()
-    except pyodbc.Error as e:
+        reportIds = orgHierarchy.getDirectReports(id)
+    except DB_ERRORS as e:
         print("Error fetching subordinates: ", e)
-    finally:
-        if connection:
-            connection.close()
-    return subordinates
+        return []
+    subordinates = getCachedEmployeesByIDs(reportIds)
+    return [employee for employee in subordinates if employee is not None]
+
+SUBTREE_VIEWS = ('ids', 'summary', 'full')
+
+def getSubtreePage(managerId, maxDepth=None, view='full', limit=DEFAULT_LIMIT, after=None):
+    """Get one page of everyone reporting to a manager, directly or indirectly.
+
+    Employees come in breadth-first order (nearest reports first) from the cached
+    hierarchy, and only the page's employee records are loaded. Returns
+    (items, nextCursor), or None if the manager doesn't exist.
+    """
+    if view not in SUBTREE_VIEWS:
+        raise PaginationError(f"view must be one of: {', '.join(SUBTREE_VIEWS)}")
+    position = decodeCursor(after)
+    if position is None:
+        offset = 0
+    else:
+        offset = position.get('offset') if isinstance(position, dict) else None
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise PaginationError("Invalid cursor")
+
+    try:
+        if not orgHierarchy.contains(managerId):
+            return None
+        nodes = list(islice(orgHierarchy.iterSubtree(managerId, maxDepth), offset, offset + limit + 1))
+    except DB_ERRORS as e:
+        print("Error fetching reporting subtree: ", e)
+        raise
+
+    nextCursor = encodeCursor({'offset': offset + limit}) if len(nodes) > limit else None
+    nodes = nodes[:limit]
+
+    if view == 'ids':
+        items = [{'EmployeeID': employeeId, 'ManagerID': parentId, 'depth': depth} for employeeId, parentId, depth in nodes]
+        return items, nextCursor
+
+    employees = getCachedEmployeesByIDs(employeeId for employeeId, _, _ in nodes)
+    items = []
+    for (employeeId, parentId, depth), employee in zip(nodes, employees):
+        if employee is None:
+            continue
+        if view == 'summary':
+            item = {
+                'EmployeeID': employee.ID,
+                'FirstName': employee.firstName,
+                'LastName': employee.lastName,
+                'Department': employee.department,
+                'Role': employee.role,
+                'ManagerID': parentId,
+            }
+        else:
+            item = employee.toDict()
+        item['depth'] = depth
+        items.append(item)
+    return items, nextCursor
 
 def getManager(id):
-    if getEmployeeByID(id) == None:
+    try:
+        managerId = orgHierarchy.getManagerID(id)
+    except DB_ERRORS as e:
+        print("Error fetching manager: ", e)
+        return None
+    if managerId is None:
         return None
-    manager = getEmployeeByID(getEmployeeByID(id).ManagerID)
-    return manager
+    return getCachedEmployeeByID(managerId)
 
 def getManagers(id):
-    managers = []
-    if getManager(id) == None:
+    """Get the reporting chain above an employee, top of the org first"""
+    try:
+        chain = orgHierarchy.getChain(id)
+    except DB_ERRORS as e:
+        print("Error fetching managers: ", e)
         return None
-    
-    managers = getManagersHelper(getManager(id), managers)
-    return managers
+    if not chain:
+        return None
+    managers = getCachedEmployeesByIDs(reversed(chain))
+    return [manager for manager in managers if manager is not None]
 
-def getManagersHelper(manager, managers):
-    if manager == None:
-        return
-    managers.append(getManagersHelper(getManager(manager), managers))
-    managers.append(manager)
-    return managers
+def getCommonManager(firstId, secondId):
+    try:
+        managerId = orgHierarchy.getCommonManager(firstId, secondId)
+    except DB_ERRORS as e:
+        print("Error finding common manager: ", e)
+        return None
+    if managerId is None:
+        return None
+    return getCachedEmployeeByID(managerId)
+
+def updateManager(employeeId, managerId):
+    """Move an employee under a new manager (or to the top of the org with None)"""
+    try:
+        if managerId is not None and (managerId == employeeId or orgHierarchy.isInSubtree(managerId, employeeId)):
+            print(f"Refusing to make {managerId} the manager of {employeeId}: it would create a reporting cycle.")
+            return False
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "UPDATE EMPLOYEES SET ManagerID = ? WHERE EmployeeID = ?"
+            cursor.execute(query, (managerId, employeeId))
+            connection.commit()
+            updated = cursor.rowcount
+            cursor.close()
+    except DB_ERRORS as e:
+        print("Error updating manager: ", e)
+        return False
+    if updated == 0:
+        return False
+    orgHierarchy.setManager(employeeId, managerId)
+    invalidateEmployee(employeeId=employeeId)
+    invalidateOrgStatistics()
+    return True
 
 
 def getEmployeeByID(id):
-    employee = Employee()
-    connection = None
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        # Explicitly select all columns, including Salary, to ensure it's always retrieved
-        query = "SELECT EmployeeID, FirstName, LastName, Department, Role, Gender, Pword, Email, PhoneNumber, Bio, ManagerID, VacationDays, SickDays, PersonalDays, OtherDays, Salary FROM EMPLOYEES WHERE EmployeeID = ?"
-        cursor.execute(query, (id,))
-        row = cursor.fetchone()
-
-        if row:
-            print(f"Raw row data from DB: {row}") # Add this print statement for debugging
-            # Create a new Employee object and populate it with the row data
-            employee.ID = row.EmployeeID
-            employee.firstName = row.FirstName
-            employee.lastName = row.LastName
-            employee.department = row.Department
-            employee.role = row.Role
-            employee.gender = row.Gender
-            employee.pword = row.Pword
-            employee.email = row.Email
-            employee.phoneNumber = row.PhoneNumber
-            employee.bio = row.Bio
-            employee.ManagerID = row.ManagerID
-            employee.vacationDays = row.VacationDays if hasattr(row, 'VacationDays') else 20
-            employee.sickDays = row.SickDays if hasattr(row, 'SickDays') else 10
-            employee.personalDays = row.PersonalDays if hasattr(row, 'PersonalDays') else 5
-            employee.otherDays = row.OtherDays if hasattr(row, 'OtherDays') else 0
-            # Ensure salary is a number, default to 0 if None or not present
-            employee.salary = float(row.Salary) if hasattr(row, 'Salary') and row.Salary is not None else 0
-        else:
-            # If no employee is found, return None
-            return None
-        cursor.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            # Explicitly select all columns, including Salary, to ensure it's always retrieved
+            query = "SELECT EmployeeID, FirstName, LastName, Department, Role, Gender, Pword, Email, PhoneNumber, Bio, ManagerID, VacationDays, SickDays, PersonalDays, OtherDays, Salary FROM EMPLOYEES WHERE EmployeeID = ?"
+            cursor.execute(query, (id,))
+            # If no employee is found, mapRow returns None
+            employee = employeeMapper.mapRow(cursor, cursor.fetchone())
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching employee: ", e)
         return None
-    finally:
-        if connection:
-            connection.close()
     return employee
 
+def getEmployeesByIDs(ids):
+    employees = []
+    ids = list(ids)
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            # Chunk to stay well under SQL Server's 2100-parameter limit
+            for start in range(0, len(ids), 1000):
+                chunk = ids[start:start + 1000]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"SELECT * FROM EMPLOYEES WHERE EmployeeID IN ({placeholders})", tuple(chunk))
+                employees.extend(employeeMapper.mapRows(cursor, cursor.fetchall()))
+            cursor.close()
+    except DB_ERRORS as e:
+        print("Error fetching employees by ID: ", e)
+    return employees
+
+def getEmployeeByEmail(email):
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM EMPLOYEES WHERE Email = ?"
+            cursor.execute(query, (email,))
+            employee = employeeMapper.mapRow(cursor, cursor.fetchone())
+            cursor.close()
+    except DB_ERRORS as e:
+        print("Error fetching employee by email: ", e)
+        return None
+    return employee
+
+"""
+Employee directory cache
+
+Read-through cache of frozen Employee objects by ID, by email and as the full list.
+Callers must not modify what these functions return.
+"""
+directoryCache = TTLCache('directory',
+                          maxSize=int(os.getenv('DIRECTORY_CACHE_SIZE', 5000)),
+                          ttl=float(os.getenv('DIRECTORY_CACHE_TTL', 300)))
+
+def _freezeEmployee(employee):
+    return employee.freeze() if employee is not None else None
+
+def getDirectory():
+    """Get all employees, loading the whole table at most once per TTL"""
+    def load():
+        employees = parseDB()
+        for employee in employees:
+            employee.freeze()
+            directoryCache.set(('id', employee.ID), employee)
+            if employee.email:
+                directoryCache.set(('email', employee.email), employee)
+        return employees
+    return directoryCache.getOrLoad(('all',), load)
+
+def getCachedEmployeeByID(id):
+    return directoryCache.getOrLoad(('id', id), lambda: _freezeEmployee(getEmployeeByID(id)))
+
+def getCachedEmployeesByIDs(ids):
+    """Get several employees in the given order, loading all cache misses with one query"""
+    ids = list(ids)
+    missing = object()
+    found = {id: directoryCache.get(('id', id), missing) for id in ids}
+    toLoad = [id for id, employee in found.items() if employee is missing]
+    if toLoad:
+        for employee in getEmployeesByIDs(toLoad):
+            employee.freeze()
+            directoryCache.set(('id', employee.ID), employee)
+            found[employee.ID] = employee
+    return [found[id] if found[id] is not missing else None for id in ids]
+
+def getCachedEmployeeByEmail(email):
+    return directoryCache.getOrLoad(('email', email), lambda: _freezeEmployee(getEmployeeByEmail(email)))
+
+def invalidateEmployee(employeeId=None, email=None):
+    """Drop cached entries for an employee after a write, plus the full list"""
+    directoryCache.invalidate(('all',), ('id', employeeId), ('email', email))
+    if employeeId is None or email is None:
+        # Only one key is known, so also drop any entry cached under the other one
+        directoryCache.discardWhere(lambda value: isinstance(value, Employee) and
+                                    (value.ID == employeeId or (email is not None and value.email == email)))
+
+def invalidateDirectory():
+    """Drop the cached full list, e.g. after an employee is added"""
+    directoryCache.invalidate(('all',))
+
 def getTeammatesByID(id):
     teammates = []
-    connection = None
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM EMPLOYEES WHERE Department = (SELECT Department FROM EMPLOYEES WHERE EmployeeID = ? ) AND ManagerID = (SELECT ManagerID FROM EMPLOYEES WHERE EmployeeID = ?)"
-        cursor.execute(query, (id, id))
-        rows = cursor.fetchall()
-
-        for row in rows:
-            if row[0] != id:  # Exclude the employee themselves
-                newEmployee = Employee()  # getEmployeeByID(row[0])
-                if len(row) >= 15:  # With leave balance columns
-                    (newEmployee.ID, newEmployee.firstName, newEmployee.lastName, newEmployee.department, 
-                    newEmployee.role, newEmployee.gender, newEmployee.pword, newEmployee.email, 
-                    newEmployee.phoneNumber, newEmployee.bio, newEmployee.ManagerID,
-                    newEmployee.vacationDays, newEmployee.sickDays, newEmployee.personalDays, newEmployee.otherDays, newEmployee.salary) = row
-                else:  # Without leave balance columns (fallback)
-                    (newEmployee.ID, newEmployee.firstName, newEmployee.lastName, newEmployee.department, 
-                    newEmployee.role, newEmployee.gender, newEmployee.pword, newEmployee.email, 
-                    newEmployee.phoneNumber, newEmployee.bio, newEmployee.ManagerID) = row
-                    # Set default values
-                    newEmployee.vacationDays = 20
-                    newEmployee.sickDays = 10
-                    newEmployee.personalDays = 5
-                    newEmployee.otherDays = 0
-                print(row)
-                teammates.append(newEmployee)
-        cursor.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            # Exclude the employee themselves
+            query = "SELECT * FROM EMPLOYEES WHERE Department = (SELECT Department FROM EMPLOYEES WHERE EmployeeID = ? ) AND ManagerID = (SELECT ManagerID FROM EMPLOYEES WHERE EmployeeID = ?) AND EmployeeID <> ?"
+            cursor.execute(query, (id, id, id))
+            teammates = employeeMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching teammates: ", e)
-    finally:
-        if connection:
-            connection.close()
     return teammates
 
 def getSalaryByID(id):
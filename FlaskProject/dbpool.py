@@ -0,0 +1,254 @@
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import pyodbc
+except ImportError:  # allows the SQLite stand-in to run on machines without an ODBC driver manager
+    pyodbc = None
+
+load_dotenv(override=False)
+
+# Connection Details
+server = os.getenv('DB_SERVER')
+database = os.getenv('DB_DATABASE')
+username = os.getenv('DB_USERNAME')
+password = os.getenv('DB_PASSWORD')
+driver = os.getenv('DB_DRIVER')
+
+# 'mssql' talks to Azure SQL through pyodbc, 'sqlite' uses a local file for testing without a server
+DB_BACKEND = os.getenv('DB_BACKEND', 'mssql').lower()
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', 'portal.sqlite3')
+
+# Pool Settings
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+POOL_HEALTHCHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', 30))
+# Seconds clients are told to wait (Retry-After) when the pool is exhausted
+POOL_RETRY_AFTER = int(os.getenv('DB_POOL_RETRY_AFTER', 5))
+
+# Errors raised by either backend, for use in `except DB_ERRORS:` blocks
+DB_ERRORS = (sqlite3.Error,) + ((pyodbc.Error,) if pyodbc else ())
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout"""
+
+
+def usingSqlite():
+    return DB_BACKEND == 'sqlite'
+
+
+_rowTypes = {}
+
+def _sqliteRowFactory(cursor, row):
+    # pyodbc rows allow row.ColumnName access, so mimic that with a namedtuple per result shape
+    names = tuple(column[0] for column in cursor.description)
+    rowType = _rowTypes.get(names)
+    if rowType is None:
+        rowType = _rowTypes[names] = namedtuple('Row', names, rename=True)
+    return rowType(*row)
+
+def _connectSqlite():
+    connection = sqlite3.connect(DB_SQLITE_PATH, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    connection.row_factory = _sqliteRowFactory
+    return connection
+
+def _connectMssql():
+    return pyodbc.connect(
+        f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
+
+
+class _PooledConnection:
+    __slots__ = ('connection', 'createdAt', 'lastUsed')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.createdAt = self.lastUsed = time.monotonic()
+
+
+class ConnectionPool:
+    """Bounded pool of open database connections.
+
+    Idle connections are reused most-recently-used first, checked with a cheap query
+    if they have been idle longer than healthCheckInterval, and closed once they are
+    older than maxLifetime so that server-side failovers and credential rotations
+    are picked up.
+    """
+
+    def __init__(self, connect, maxSize=POOL_SIZE, timeout=POOL_TIMEOUT, maxLifetime=POOL_MAX_LIFETIME,
+                 healthCheckInterval=POOL_HEALTHCHECK_INTERVAL):
+        self._connect = connect
+        self.maxSize = maxSize
+        self.timeout = timeout
+        self.maxLifetime = maxLifetime
+        self.healthCheckInterval = healthCheckInterval
+        self._idle = deque()
+        self._checkedOut = {}
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._counters = {
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'healthCheckFailures': 0,
+        }
+
+    def _isExpired(self, pooled, now):
+        return self.maxLifetime and now - pooled.createdAt >= self.maxLifetime
+
+    def _isHealthy(self, pooled):
+        try:
+            cursor = pooled.connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except DB_ERRORS:
+            return False
+
+    def _discard(self, pooled):
+        try:
+            pooled.connection.close()
+        except DB_ERRORS:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._counters['closed'] += 1
+            self._condition.notify()
+
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            pooled = None
+            with self._condition:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                while not self._idle and self._size >= self.maxSize:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._counters['waits'] += 1
+                    self._condition.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._size += 1
+
+            now = time.monotonic()
+            if pooled is None:
+                try:
+                    pooled = _PooledConnection(self._connect())
+                except BaseException:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._counters['created'] += 1
+            elif self._isExpired(pooled, now):
+                self._discard(pooled)
+                with self._condition:
+                    self._counters['recycled'] += 1
+                continue
+            elif now - pooled.lastUsed >= self.healthCheckInterval and not self._isHealthy(pooled):
+                self._discard(pooled)
+                with self._condition:
+                    self._counters['healthCheckFailures'] += 1
+                continue
+
+            with self._condition:
+                self._checkedOut[id(pooled.connection)] = pooled
+                self._counters['checkouts'] += 1
+            return pooled.connection
+
+    def release(self, connection, discard=False):
+        with self._condition:
+            pooled = self._checkedOut.pop(id(connection), None)
+        if pooled is None:
+            return
+        if not discard:
+            try:
+                # Never hand out a connection with someone else's open transaction
+                connection.rollback()
+            except DB_ERRORS:
+                discard = True
+        if discard or self._closed:
+            self._discard(pooled)
+            return
+        if self._isExpired(pooled, time.monotonic()):
+            self._discard(pooled)
+            with self._condition:
+                self._counters['recycled'] += 1
+            return
+        pooled.lastUsed = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._counters)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'inUse': len(self._checkedOut),
+                'maxSize': self.maxSize,
+            })
+        return stats
+
+
+_pool = None
+_poolPid = None
+_poolLock = threading.Lock()
+
+def getPool():
+    """Return this worker process's pool, creating it on first use (or after a fork)"""
+    global _pool, _poolPid
+    pid = os.getpid()
+    if _pool is None or _poolPid != pid:
+        with _poolLock:
+            if _pool is None or _poolPid != pid:
+                # Sockets inherited from a parent process must not be shared, so start a fresh pool
+                _pool = ConnectionPool(_connectSqlite if usingSqlite() else _connectMssql)
+                _poolPid = pid
+    return _pool
+
+@contextmanager
+def getConnection():
+    """Check a connection out of the pool for the duration of a with-block.
+
+    Callers still commit explicitly; anything left uncommitted (including the work of a
+    block that raised) is rolled back when the connection goes back to the pool.
+    """
+    pool = getPool()
+    connection = pool.checkout()
+    try:
+        yield connection
+    finally:
+        # release() rolls back first and drops the connection if even that fails
+        pool.release(connection)
+
+def getPoolStats():
+    stats = getPool().stats()
+    stats['backend'] = DB_BACKEND
+    stats['pid'] = os.getpid()
+    return stats
@@ -0,0 +1,32 @@
+from dbpool import usingSqlite
+
+
+# Write statements that hand back the affected rows in the same round trip:
+# OUTPUT INSERTED/DELETED on SQL Server, RETURNING on the SQLite stand-in.
+# Read the rows with fetchone()/fetchall() before committing.
+#
+# Note that SQL Server rejects a bare OUTPUT clause on a table with triggers
+# (OUTPUT ... INTO a table variable would be needed there).
+
+def _output(prefix, columns):
+    return ', '.join(f"{prefix}.{column}" for column in columns)
+
+def insertReturning(table, columns, returning):
+    """INSERT of one row (one ? per column) that returns the `returning` columns"""
+    names = ', '.join(columns)
+    placeholders = ', '.join('?' * len(columns))
+    if usingSqlite():
+        return f"INSERT INTO {table} ({names}) VALUES ({placeholders}) RETURNING {', '.join(returning)}"
+    return f"INSERT INTO {table} ({names}) OUTPUT {_output('INSERTED', returning)} VALUES ({placeholders})"
+
+def updateReturning(table, assignments, where, returning):
+    """UPDATE ... SET <assignments> WHERE <where> that returns the updated rows' new values"""
+    if usingSqlite():
+        return f"UPDATE {table} SET {', '.join(assignments)} WHERE {where} RETURNING {', '.join(returning)}"
+    return f"UPDATE {table} SET {', '.join(assignments)} OUTPUT {_output('INSERTED', returning)} WHERE {where}"
+
+def deleteReturning(table, where, returning):
+    """DELETE ... WHERE <where> that returns the deleted rows"""
+    if usingSqlite():
+        return f"DELETE FROM {table} WHERE {where} RETURNING {', '.join(returning)}"
+    return f"DELETE FROM {table} OUTPUT {_output('DELETED', returning)} WHERE {where}"
@@ -0,0 +1,111 @@
+from collections import deque
+import json
+import os
+import threading
+import time
+import uuid
+
+from model import dumps
+from signals import leaveRequestChanged, ticketChanged
+
+EVENT_LOG_SIZE = int(os.getenv('EVENT_LOG_SIZE', 1000))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv('EVENT_HEARTBEAT_SECONDS', 15))
+# Streams end after this long and the browser's EventSource reconnects with Last-Event-ID,
+# so a worker thread is never tied up by one client indefinitely
+EVENT_STREAM_MAX_SECONDS = float(os.getenv('EVENT_STREAM_MAX_SECONDS', 300))
+
+TOPICS = ('tickets', 'leaveRequests')
+
+
+class EventLog:
+    """Bounded in-memory log of change events for the SSE feed.
+
+    Event IDs are '<logId>:<sequence>'. logId is random per process, so a client
+    resuming with an ID from another worker, from before a restart, or from so long
+    ago that the event has been evicted gets a 'reset' event telling it to refetch
+    rather than silently missing changes.
+    """
+
+    def __init__(self, maxSize=EVENT_LOG_SIZE):
+        self.logId = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=maxSize)
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    def append(self, topic, eventType, data):
+        with self._condition:
+            self._sequence += 1
+            self._events.append((self._sequence, topic, eventType, dumps(data)))
+            self._condition.notify_all()
+
+    def parseEventId(self, eventId):
+        """Sequence number to resume after, or None if the ID can't be resumed from this log"""
+        if not eventId:
+            return None
+        logId, _, sequence = eventId.partition(':')
+        if logId != self.logId or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def since(self, sequence):
+        """Events after `sequence`, or None if some of them have already been evicted"""
+        with self._condition:
+            if self._events and sequence < self._events[0][0] - 1:
+                return None
+            return [event for event in self._events if event[0] > sequence]
+
+    @property
+    def lastSequence(self):
+        return self._sequence
+
+    def wait(self, sequence, timeout):
+        """Block until there is an event after `sequence` or the timeout passes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence > sequence, timeout)
+
+    def formatEvent(self, event):
+        sequence, topic, eventType, data = event
+        return f"id: {self.logId}:{sequence}\nevent: {eventType}\ndata: {data}\n\n"
+
+    def formatReset(self, sequence, reason):
+        # Carries the current ID so the client's next reconnect resumes from here
+        return f"id: {self.logId}:{sequence}\nevent: reset\ndata: {json.dumps({'reason': reason})}\n\n"
+
+    def stream(self, lastEventId=None, topics=TOPICS):
+        """Generate the SSE stream: missed events first, then live ones as they arrive"""
+        yield "retry: 3000\n\n"
+        sequence = self.parseEventId(lastEventId)
+        if lastEventId and (sequence is None or self.since(sequence) is None):
+            sequence = self.lastSequence
+            yield self.formatReset(sequence, 'Cannot resume from Last-Event-ID; refetch')
+        elif sequence is None:
+            sequence = self.lastSequence
+
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            events = self.since(sequence)
+            if events is None:
+                sequence = self.lastSequence
+                yield self.formatReset(sequence, 'Fell behind the event log; refetch')
+                continue
+            for event in events:
+                sequence = event[0]
+                if event[1] in topics:
+                    yield self.formatEvent(event)
+            if not events:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+            self.wait(sequence, min(EVENT_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0)))
+
+
+eventLog = EventLog()
+
+def _onTicketChanged(action, ticket, **_):
+    eventLog.append('tickets', f'ticket.{action}', {'action': action, 'ticketId': ticket.ticketId, 'ticket': ticket.toDict()})
+
+def _onLeaveRequestChanged(action, leaveRequest, **_):
+    eventLog.append('leaveRequests', f'leaveRequest.{action}',
+                    {'action': action, 'requestId': leaveRequest.requestId, 'leaveRequest': leaveRequest.toDict()})
+
+ticketChanged.connect(_onTicketChanged)
+leaveRequestChanged.connect(_onLeaveRequestChanged)
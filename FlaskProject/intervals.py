@@ -0,0 +1,55 @@
+class IntervalIndex:
+    """Static index of closed intervals [start, end] answering "what overlaps this window".
+
+    Intervals are sorted by start and viewed as an implicit balanced binary tree over
+    that array (each range's middle element is its root). Every node stores the latest
+    end in its subtree, so a query skips whole subtrees that finish before the window
+    opens and stops going right once starts pass the window's end. A query costs
+    O(log n + matches) instead of a scan. Endpoints only need to be comparable:
+    dates, datetimes or numbers.
+    """
+
+    __slots__ = ('_starts', '_ends', '_values', '_maxEnds')
+
+    def __init__(self, items=()):
+        """items: iterable of (start, end, value)"""
+        ordered = sorted(items, key=lambda item: item[0])
+        self._starts = [item[0] for item in ordered]
+        self._ends = [item[1] for item in ordered]
+        self._values = [item[2] for item in ordered]
+        self._maxEnds = [None] * len(ordered)
+        self._build(0, len(ordered))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        latest = self._ends[mid]
+        for childMax in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if childMax is not None and childMax > latest:
+                latest = childMax
+        self._maxEnds[mid] = latest
+        return latest
+
+    def __len__(self):
+        return len(self._values)
+
+    def overlapping(self, start, end):
+        """Values of intervals with intervalStart <= end and intervalEnd >= start, in start order"""
+        matches = []
+        stack = [(0, len(self._values))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._maxEnds[mid] < start:
+                continue
+            stack.append((lo, mid))
+            if self._starts[mid] <= end:
+                # Everything to the right starts no earlier than mid, so only look there if mid starts in time
+                stack.append((mid + 1, hi))
+                if self._ends[mid] >= start:
+                    matches.append(mid)
+        matches.sort()
+        return [self._values[index] for index in matches]
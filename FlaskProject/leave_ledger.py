@@ -0,0 +1,140 @@
+from datetime import date, datetime
+import threading
+
+from dbpool import getConnection, usingSqlite, DB_ERRORS
+
+# Approved leave days per employee, leave type and calendar year of the start date.
+# _decideLeaveRequest updates it in the same transaction as the request itself, so
+# balance reads are a keyed lookup instead of an aggregate over the request history.
+# LeaveType is stored lower-cased ('' for none) and LeaveYear is 0 for no start date,
+# matching the expressions used when the ledger is rebuilt from LEAVE_REQUESTS.
+LEDGER_TABLE = 'LEAVE_LEDGER'
+# Approved days straight from the requests, for when the ledger table doesn't exist yet
+APPROVED_LEAVE_SOURCE = "(SELECT EmployeeID, LOWER(LeaveType) AS LeaveType, Days AS UsedDays FROM LEAVE_REQUESTS WHERE Status = 'approved')"
+
+_ledgerReady = False
+_ledgerLock = threading.Lock()
+
+
+def ledgerKey(leaveRequest):
+    leaveType = (leaveRequest.leaveType or '').lower()
+    startDate = leaveRequest.startDate
+    if isinstance(startDate, (date, datetime)):
+        year = startDate.year
+    elif isinstance(startDate, str) and startDate[:4].isdigit():
+        year = int(startDate[:4])
+    else:
+        year = 0
+    return leaveRequest.employeeId, leaveType, year
+
+def addToLedger(cursor, employeeId, leaveType, year, days):
+    """Add days (negative to take them back) to a ledger row, creating it if needed. The caller commits."""
+    if not days:
+        return
+    cursor.execute(f"""
+    UPDATE {LEDGER_TABLE} SET UsedDays = UsedDays + ?, UpdatedDate = CURRENT_TIMESTAMP
+    WHERE EmployeeID = ? AND LeaveType = ? AND LeaveYear = ?
+    """, (days, employeeId, leaveType, year))
+    if cursor.rowcount == 0:
+        cursor.execute(f"""
+        INSERT INTO {LEDGER_TABLE} (EmployeeID, LeaveType, LeaveYear, UsedDays, UpdatedDate)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (employeeId, leaveType, year, days))
+
+def applyDecision(cursor, leaveRequest, previousStatus):
+    """Move a request's days into or out of the ledger when its approval changes. The caller commits."""
+    wasApproved = previousStatus == 'approved'
+    isApproved = leaveRequest.status == 'approved'
+    if wasApproved != isApproved and leaveRequest.days:
+        addToLedger(cursor, *ledgerKey(leaveRequest), leaveRequest.days if isApproved else -leaveRequest.days)
+
+
+def _yearOf(column):
+    return f"CAST(strftime('%Y', {column}) AS INTEGER)" if usingSqlite() else f"YEAR({column})"
+
+def _backfillLedger(cursor):
+    """Fill the ledger from the approved requests if it is still empty; returns the rows written"""
+    year = _yearOf('StartDate')
+    # The table lock makes a second process wait and then see the rows, instead of filling it twice
+    lock = '' if usingSqlite() else ' WITH (TABLOCKX, HOLDLOCK)'
+    cursor.execute(f"""
+    INSERT INTO {LEDGER_TABLE} (EmployeeID, LeaveType, LeaveYear, UsedDays, UpdatedDate)
+    SELECT EmployeeID, COALESCE(LOWER(LeaveType), ''), COALESCE({year}, 0), COALESCE(SUM(Days), 0), CURRENT_TIMESTAMP
+    FROM LEAVE_REQUESTS
+    WHERE Status = 'approved' AND EmployeeID IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM {LEDGER_TABLE}{lock})
+    GROUP BY EmployeeID, COALESCE(LOWER(LeaveType), ''), COALESCE({year}, 0)
+    """)
+    return cursor.rowcount
+
+def ensureLedger():
+    """True once the ledger can be read and written, False while its table doesn't exist.
+
+    The first call in a process fills an empty ledger from the approved requests, so
+    balances are right straight after deploy without running sql/leave_ledger.sql or
+    a reconcile. Decisions call this before their own writes, so no approval can land
+    in an empty ledger and make it look filled.
+    """
+    global _ledgerReady
+    if _ledgerReady:
+        return True
+    with _ledgerLock:
+        if _ledgerReady:
+            return True
+        try:
+            with getConnection() as connection:
+                cursor = connection.cursor()
+                if usingSqlite():
+                    cursor.execute("BEGIN IMMEDIATE")
+                filled = _backfillLedger(cursor)
+                connection.commit()
+                cursor.close()
+        except DB_ERRORS as e:
+            print("Leave ledger unavailable, reading approved leave from LEAVE_REQUESTS: ", e)
+            return False
+        if filled > 0:
+            print(f"Filled the empty leave ledger with {filled} rows.")
+        _ledgerReady = True
+        return True
+
+
+def _expectedLedger(cursor):
+    year = _yearOf('StartDate')
+    cursor.execute(f"""
+    SELECT EmployeeID, COALESCE(LOWER(LeaveType), '') AS LeaveType, COALESCE({year}, 0) AS LeaveYear, SUM(Days) AS UsedDays
+    FROM LEAVE_REQUESTS
+    WHERE Status = 'approved' AND EmployeeID IS NOT NULL
+    GROUP BY EmployeeID, COALESCE(LOWER(LeaveType), ''), COALESCE({year}, 0)
+    """)
+    return {(row.EmployeeID, row.LeaveType, row.LeaveYear): row.UsedDays or 0 for row in cursor.fetchall()}
+
+def _actualLedger(cursor):
+    cursor.execute(f"SELECT EmployeeID, LeaveType, LeaveYear, UsedDays FROM {LEDGER_TABLE}")
+    return {(row.EmployeeID, row.LeaveType, row.LeaveYear): row.UsedDays or 0 for row in cursor.fetchall()}
+
+def reconcileLeaveLedger(repair=False):
+    """Compare the whole ledger with the approved requests it summarises, with two aggregate queries.
+
+    Returns {'checked', 'mismatches': [...], 'repaired'}. With repair=True the mismatched rows are
+    set to the recomputed totals in one transaction. This also fills an empty ledger,
+    e.g. on a fresh SQLite database. An approval that commits while this runs can show
+    up as a mismatch, so repair is best run when no one is deciding leave requests.
+    """
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        expected = _expectedLedger(cursor)
+        actual = _actualLedger(cursor)
+        mismatches = []
+        for key in sorted(expected.keys() | actual.keys()):
+            if expected.get(key, 0) != actual.get(key, 0):
+                employeeId, leaveType, year = key
+                mismatches.append({'employeeId': employeeId, 'leaveType': leaveType, 'year': year,
+                                   'ledgerDays': actual.get(key, 0), 'requestDays': expected.get(key, 0)})
+
+        if repair and mismatches:
+            for mismatch in mismatches:
+                addToLedger(cursor, mismatch['employeeId'], mismatch['leaveType'], mismatch['year'],
+                            mismatch['requestDays'] - mismatch['ledgerDays'])
+            connection.commit()
+        cursor.close()
+    return {'checked': len(expected.keys() | actual.keys()), 'mismatches': mismatches, 'repaired': bool(repair and mismatches)}
@@ -1,8 +1,36 @@
 from dbconnect import *
-from datetime import datetime, date
-import pyodbc
+from dbpool import getConnection, usingSqlite, DB_ERRORS
+from dml import insertReturning, updateReturning
+from leave_ledger import APPROVED_LEAVE_SOURCE, LEDGER_TABLE, addToLedger, applyDecision, ensureLedger, ledgerKey
+from model import Model
+from org_hierarchy import orgHierarchy
+from pagination import Filter, Listing
+from rowmap import RowMapper
+from signals import leaveRequestChanged
+from datetime import datetime, date, timedelta
+import os
+
+# SQLite's + is numeric addition, so the stand-in needs || to join the name
+EMPLOYEE_NAME = "e.FirstName || ' ' || e.LastName" if usingSqlite() else "e.FirstName + ' ' + e.LastName"
+
+class LeaveRequest(Model):
+    __slots__ = ('requestId', 'employeeId', 'employeeName', 'leaveType', 'startDate', 'endDate', 'days', 'reason',
+                 'status', 'submittedDate', 'approvedBy', 'approvedDate')
+    fields = {
+        "requestId": "requestId",
+        "employeeId": "employeeId",
+        "employeeName": "employeeName",
+        "leaveType": "leaveType",
+        "startDate": "startDate",
+        "endDate": "endDate",
+        "days": "days",
+        "reason": "reason",
+        "status": "status",
+        "submittedDate": "submittedDate",
+        "approvedBy": "approvedBy",
+        "approvedDate": "approvedDate"
+    }
 
-class LeaveRequest:
     def __init__(self, requestId=None, employeeId=None, employeeName=None, leaveType=None, startDate=None, endDate=None, days=None, reason=None, status=None, submittedDate=None, approvedBy=None, approvedDate=None):
         self.requestId = requestId
         self.employeeId = employeeId
@@ -17,26 +45,72 @@ class LeaveRequest:
         self.approvedBy = approvedBy
         self.approvedDate = approvedDate
 
-    def toDict(self):
-        return {
-            "requestId": self.requestId,
-            "employeeId": self.employeeId,
-            "employeeName": self.employeeName,
-            "leaveType": self.leaveType,
-            "startDate": self.startDate,
-            "endDate": self.endDate,
-            "days": self.days,
-            "reason": self.reason,
-            "status": self.status,
-            "submittedDate": self.submittedDate,
-            "approvedBy": self.approvedBy,
-            "approvedDate": self.approvedDate
-        }
-    
     def toString(self):
         return f"Leave Request ID: {self.requestId}, Employee: {self.employeeName}, Type: {self.leaveType}, Status: {self.status}"
 
-class LeaveBalance:
+leaveRequestMapper = RowMapper(LeaveRequest, {
+    'RequestID': 'requestId',
+    'EmployeeID': 'employeeId',
+    'EmployeeName': 'employeeName',
+    'LeaveType': 'leaveType',
+    'StartDate': 'startDate',
+    'EndDate': 'endDate',
+    'Days': 'days',
+    'Reason': 'reason',
+    'Status': 'status',
+    'SubmittedDate': 'submittedDate',
+    'ApprovedBy': 'approvedBy',
+    'ApprovedDate': 'approvedDate',
+})
+
+leaveRequestListing = Listing(
+    leaveRequestMapper,
+    {
+        'requestId': 'lr.RequestID',
+        'employeeId': 'lr.EmployeeID',
+        'employeeName': f"{EMPLOYEE_NAME} AS EmployeeName",
+        'leaveType': 'lr.LeaveType',
+        'startDate': 'lr.StartDate',
+        'endDate': 'lr.EndDate',
+        'days': 'lr.Days',
+        'reason': 'lr.Reason',
+        'status': 'lr.Status',
+        'submittedDate': 'lr.SubmittedDate',
+        'approvedBy': 'lr.ApprovedBy',
+        'approvedDate': 'lr.ApprovedDate',
+    },
+    "LEAVE_REQUESTS lr JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID",
+    idColumn="lr.RequestID",
+    sorts={
+        'submittedDate': 'lr.SubmittedDate',
+        'startDate': 'lr.StartDate',
+        'requestId': 'lr.RequestID',
+        'days': 'lr.Days',
+    },
+    filters={
+        'employeeId': Filter('lr.EmployeeID', int),
+        'status': Filter('lr.Status'),
+        'leaveType': Filter('lr.LeaveType'),
+        'approvedBy': Filter('lr.ApprovedBy', int),
+        'startDate': Filter('lr.StartDate', date.fromisoformat, ranged=True),
+        'endDate': Filter('lr.EndDate', date.fromisoformat, ranged=True),
+    },
+    defaultSort='-submittedDate',
+)
+
+# Oldest first, so approvers work through the queue in order
+pendingLeaveRequestListing = leaveRequestListing.where("lr.Status = 'pending'", defaultSort='submittedDate')
+
+class LeaveBalance(Model):
+    __slots__ = ('employeeId', 'vacationDays', 'sickDays', 'personalDays', 'otherDays')
+    fields = {
+        "employeeId": "employeeId",
+        "vacationDays": "vacationDays",
+        "sickDays": "sickDays",
+        "personalDays": "personalDays",
+        "otherDays": "otherDays"
+    }
+
     def __init__(self, employeeId=None, vacationDays=None, sickDays=None, personalDays=None, otherDays=None):
         self.employeeId = employeeId
         self.vacationDays = vacationDays or 0
@@ -44,321 +118,490 @@ class LeaveBalance:
         self.personalDays = personalDays or 0
         self.otherDays = otherDays or 0
 
-    def toDict(self):
-        return {
-            "employeeId": self.employeeId,
-            "vacationDays": self.vacationDays,
-            "sickDays": self.sickDays,
-            "personalDays": self.personalDays,
-            "otherDays": self.otherDays
-        }
-
 def getLeaveRequests():
     """Get all leave requests"""
     leaveRequests = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
-        return leaveRequests
-
-    try:
-        query = """
-        SELECT lr.RequestID, lr.EmployeeID, 
-               e.FirstName + ' ' + e.LastName as EmployeeName,
-               lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
-               lr.Reason, lr.Status, lr.SubmittedDate, 
-               lr.ApprovedBy, lr.ApprovedDate
-        FROM LEAVE_REQUESTS lr
-        JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
-        ORDER BY lr.SubmittedDate DESC
-        """
-        cursor = connection.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            leaveRequest = LeaveRequest()
-            (leaveRequest.requestId, leaveRequest.employeeId, leaveRequest.employeeName,
-             leaveRequest.leaveType, leaveRequest.startDate, leaveRequest.endDate,
-             leaveRequest.days, leaveRequest.reason, leaveRequest.status,
-             leaveRequest.submittedDate, leaveRequest.approvedBy, leaveRequest.approvedDate) = row
-            leaveRequests.append(leaveRequest)
+        with getConnection() as connection:
+            query = f"""
+            SELECT lr.RequestID, lr.EmployeeID, 
+                   {EMPLOYEE_NAME} as EmployeeName,
+                   lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
+                   lr.Reason, lr.Status, lr.SubmittedDate, 
+                   lr.ApprovedBy, lr.ApprovedDate
+            FROM LEAVE_REQUESTS lr
+            JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
+            ORDER BY lr.SubmittedDate DESC
+            """
+            cursor = connection.cursor()
+            cursor.execute(query)
+            leaveRequests = leaveRequestMapper.mapRows(cursor, cursor.fetchall())
 
-        cursor.close()
-        connection.close()
-        print("Connection Closed.")
+            cursor.close()
 
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error fetching leave requests: ", e)
 
     return leaveRequests
 
-def getLeaveRequestById(requestId):
-    """Get a specific leave request by ID"""
+def getLeaveRequestsPage(args, listing=leaveRequestListing):
+    """Get one page of leave requests; returns (leaveRequests, nextCursor) or None on a database error"""
+    page = listing.parse(args)
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            result = listing.fetchPage(cursor, page)
+            cursor.close()
+        return result
+    except DB_ERRORS as e:
+        print("Error fetching leave requests page: ", e)
         return None
 
+def getPendingLeaveRequestsPage(args):
+    return getLeaveRequestsPage(args, pendingLeaveRequestListing)
+
+def getLeaveRequestById(requestId):
+    """Get a specific leave request by ID"""
     try:
-        cursor = connection.cursor()
-        query = """
-        SELECT lr.RequestID, lr.EmployeeID, 
-               e.FirstName + ' ' + e.LastName as EmployeeName,
-               lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
-               lr.Reason, lr.Status, lr.SubmittedDate, 
-               lr.ApprovedBy, lr.ApprovedDate
-        FROM LEAVE_REQUESTS lr
-        JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
-        WHERE lr.RequestID = ?
-        """
-        cursor.execute(query, requestId)
-        row = cursor.fetchone()
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"""
+            SELECT lr.RequestID, lr.EmployeeID, 
+                   {EMPLOYEE_NAME} as EmployeeName,
+                   lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
+                   lr.Reason, lr.Status, lr.SubmittedDate, 
+                   lr.ApprovedBy, lr.ApprovedDate
+            FROM LEAVE_REQUESTS lr
+            JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
+            WHERE lr.RequestID = ?
+            """
+            cursor.execute(query, (requestId,))
+            leaveRequest = leaveRequestMapper.mapRow(cursor, cursor.fetchone())
+            cursor.close()
         
-        if row:
-            leaveRequest = LeaveRequest()
-            (leaveRequest.requestId, leaveRequest.employeeId, leaveRequest.employeeName,
-             leaveRequest.leaveType, leaveRequest.startDate, leaveRequest.endDate,
-             leaveRequest.days, leaveRequest.reason, leaveRequest.status,
-             leaveRequest.submittedDate, leaveRequest.approvedBy, leaveRequest.approvedDate) = row
-            return leaveRequest
-        else:
+        if leaveRequest is None:
             print("Leave request not found.")
-            return None
-    except pyodbc.Error as e:
+        return leaveRequest
+    except DB_ERRORS as e:
         print("Error fetching leave request: ", e)
         return None
-    finally:
-        cursor.close()
-        connection.close()
 
 def getLeaveRequestsByEmployeeId(employeeId):
     """Get all leave requests for a specific employee"""
     leaveRequests = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
-        return leaveRequests
-
-    try:
-        cursor = connection.cursor()
-        query = """
-        SELECT lr.RequestID, lr.EmployeeID, 
-               e.FirstName + ' ' + e.LastName as EmployeeName,
-               lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
-               lr.Reason, lr.Status, lr.SubmittedDate, 
-               lr.ApprovedBy, lr.ApprovedDate
-        FROM LEAVE_REQUESTS lr
-        JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
-        WHERE lr.EmployeeID = ?
-        ORDER BY lr.SubmittedDate DESC
-        """
-        cursor.execute(query, employeeId)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            leaveRequest = LeaveRequest()
-            (leaveRequest.requestId, leaveRequest.employeeId, leaveRequest.employeeName,
-             leaveRequest.leaveType, leaveRequest.startDate, leaveRequest.endDate,
-             leaveRequest.days, leaveRequest.reason, leaveRequest.status,
-             leaveRequest.submittedDate, leaveRequest.approvedBy, leaveRequest.approvedDate) = row
-            leaveRequests.append(leaveRequest)
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"""
+            SELECT lr.RequestID, lr.EmployeeID, 
+                   {EMPLOYEE_NAME} as EmployeeName,
+                   lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
+                   lr.Reason, lr.Status, lr.SubmittedDate, 
+                   lr.ApprovedBy, lr.ApprovedDate
+            FROM LEAVE_REQUESTS lr
+            JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
+            WHERE lr.EmployeeID = ?
+            ORDER BY lr.SubmittedDate DESC
+            """
+            cursor.execute(query, (employeeId,))
+            leaveRequests = leaveRequestMapper.mapRows(cursor, cursor.fetchall())
 
-        cursor.close()
-        connection.close()
-        print("Connection Closed.")
-    except pyodbc.Error as e:
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching leave requests: ", e)
 
     return leaveRequests
 
-def createLeaveRequest(employeeId, leaveType, startDate, endDate, days, reason):
-    """Create a new leave request"""
+# LEAVE_REQUESTS columns handed back by writes; EmployeeName comes from the employee cache
+LEAVE_REQUEST_RETURNING = ['RequestID', 'EmployeeID', 'LeaveType', 'StartDate', 'EndDate', 'Days', 'Reason',
+                           'Status', 'SubmittedDate', 'ApprovedBy', 'ApprovedDate']
+
+def _withEmployeeName(leaveRequest):
+    if leaveRequest is not None:
+        employee = getCachedEmployeeByID(leaveRequest.employeeId)
+        if employee is not None:
+            leaveRequest.employeeName = f"{employee.firstName} {employee.lastName}"
+    return leaveRequest
+
+# Requests in these states hold their dates: a new request may not overlap them
+ACTIVE_LEAVE_STATUSES = ('approved', 'pending')
+# Share of a team (the employee and their peers under the same manager) that may be away on the same day
+LEAVE_MAX_TEAM_ABSENCE = float(os.getenv('LEAVE_MAX_TEAM_ABSENCE', 0.5))
+# 'warn' accepts the request and reports the shortfall; 'reject' refuses it
+LEAVE_COVERAGE_POLICY = os.getenv('LEAVE_COVERAGE_POLICY', 'warn')
+# Longest leave range, in calendar days, accepted in one request
+LEAVE_MAX_REQUEST_DAYS = int(os.getenv('LEAVE_MAX_REQUEST_DAYS', 366))
+
+class LeaveRequestError(ValueError):
+    """A leave request that can't be accepted as submitted.
+
+    `conflicts` lists the employee's own requests it overlaps, and `coverage` is set
+    when it was refused for leaving the team short.
+    """
+
+    def __init__(self, message, conflicts=(), coverage=None):
+        super().__init__(message)
+        self.conflicts = list(conflicts)
+        self.coverage = coverage
+
+def _parseLeaveDate(value, name):
+    if isinstance(value, date):
+        return value
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
-        return False
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise LeaveRequestError(f"{name} must be a date (YYYY-MM-DD)")
 
+def _teammates(employeeId):
+    """Peers under the same manager, from the cached hierarchy (no query on the submission path)"""
     try:
-        cursor = connection.cursor()
-        query = """
-        INSERT INTO LEAVE_REQUESTS (EmployeeID, LeaveType, StartDate, EndDate, Days, Reason, Status, SubmittedDate)
-        VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)
-        """
-        submittedDate = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute(query, (employeeId, leaveType, startDate, endDate, days, reason, submittedDate))
-        connection.commit()
+        managerId = orgHierarchy.getManagerID(employeeId)
+        if managerId is None:
+            return []
+        return [peerId for peerId in orgHierarchy.getDirectReports(managerId) if peerId != employeeId]
+    except DB_ERRORS as e:
+        print("Error loading reporting hierarchy for coverage check: ", e)
+        return []
+
+def _teamCoverage(start, end, teammates, leaveRequests):
+    """Most of the team away on any day of [start, end] if this request were added.
+
+    A sweep over the start and end points of the overlapping leave, O(k log k) in
+    the number of overlapping requests and independent of the range's length. Each
+    teammate's leave is merged first, so someone is counted once on a day even if
+    older requests of theirs overlap.
+    """
+    teamSize = len(teammates) + 1
+    limit = max(1, int(teamSize * LEAVE_MAX_TEAM_ABSENCE))
+
+    ranges = {}
+    for lr in leaveRequests:
+        first = max(_parseLeaveDate(lr.startDate, 'startDate'), start)
+        last = min(_parseLeaveDate(lr.endDate, 'endDate'), end)
+        if first <= last:
+            ranges.setdefault(lr.employeeId, []).append((first, last))
+    events = []
+    for employeeRanges in ranges.values():
+        employeeRanges.sort()
+        mergedFirst, mergedLast = employeeRanges[0]
+        for first, last in employeeRanges[1:]:
+            if first <= mergedLast + timedelta(days=1):
+                mergedLast = max(mergedLast, last)
+            else:
+                events += [(mergedFirst, 1), (mergedLast + timedelta(days=1), -1)]
+                mergedFirst, mergedLast = first, last
+        events += [(mergedFirst, 1), (mergedLast + timedelta(days=1), -1)]
+
+    # Ends sort before starts on the same day: leave ending yesterday doesn't overlap leave starting today
+    events.sort()
+    peakOut, peakDate = 1, start
+    out = 1
+    for day, change in events:
+        out += change
+        if out > peakOut:
+            peakOut, peakDate = out, day
+    return {'teamSize': teamSize, 'limit': limit, 'peakOut': peakOut, 'peakDate': peakDate.isoformat(), 'exceeded': peakOut > limit}
+
+def submitLeaveRequest(employeeId, leaveType, startDate, endDate, days, reason):
+    """Check a new leave request against existing ones and store it.
+
+    One query, in the insert's transaction, reads the approved and pending leave of
+    the employee and their teammates that overlaps the requested range. Overlapping
+    one of the employee's own requests raises LeaveRequestError. The teammates' leave
+    gives the team coverage, which is returned, or raises under the 'reject' policy.
+    On SQL Server the read takes range locks (UPDLOCK, HOLDLOCK), and on SQLite the
+    transaction starts as IMMEDIATE, so two overlapping submissions can't both pass.
+    Returns (leaveRequest, coverage), with leaveRequest None if the insert failed and
+    coverage None for an employee without teammates.
+    """
+    start = _parseLeaveDate(startDate, 'startDate')
+    end = _parseLeaveDate(endDate, 'endDate')
+    if end < start:
+        raise LeaveRequestError("endDate must not be before startDate")
+    if (end - start).days + 1 > LEAVE_MAX_REQUEST_DAYS:
+        raise LeaveRequestError(f"A leave request can cover at most {LEAVE_MAX_REQUEST_DAYS} days")
+    teammates = _teammates(employeeId)[:999]
+
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            if usingSqlite():
+                cursor.execute("BEGIN IMMEDIATE")
+            employeeIds = [employeeId] + teammates
+            query = f"""
+            SELECT lr.RequestID, lr.EmployeeID, lr.LeaveType, lr.StartDate, lr.EndDate, lr.Status
+            FROM LEAVE_REQUESTS lr{'' if usingSqlite() else ' WITH (UPDLOCK, HOLDLOCK)'}
+            WHERE lr.EmployeeID IN ({', '.join('?' * len(employeeIds))})
+              AND lr.Status IN ({', '.join('?' * len(ACTIVE_LEAVE_STATUSES))})
+              AND lr.StartDate <= ? AND lr.EndDate >= ?
+            """
+            cursor.execute(query, (*employeeIds, *ACTIVE_LEAVE_STATUSES, end, start))
+            overlapping = leaveRequestMapper.mapRows(cursor, cursor.fetchall())
+
+            conflicts = [lr for lr in overlapping if lr.employeeId == employeeId]
+            if conflicts:
+                raise LeaveRequestError("Overlaps an existing leave request",
+                                        conflicts=[lr.project(('requestId', 'leaveType', 'startDate', 'endDate', 'status')) for lr in conflicts])
+            coverage = _teamCoverage(start, end, teammates, overlapping) if teammates else None
+            if coverage is not None and coverage['exceeded'] and LEAVE_COVERAGE_POLICY == 'reject':
+                raise LeaveRequestError("Too much of the team would be away", coverage=coverage)
+
+            query = insertReturning('LEAVE_REQUESTS',
+                                    ['EmployeeID', 'LeaveType', 'StartDate', 'EndDate', 'Days', 'Reason', 'Status', 'SubmittedDate'],
+                                    LEAVE_REQUEST_RETURNING)
+            submittedDate = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute(query, (employeeId, leaveType, start, end, days, reason, 'pending', submittedDate))
+            leaveRequest = leaveRequestMapper.mapRow(cursor, cursor.fetchone())
+            connection.commit()
+            cursor.close()
         print("Leave request created successfully.")
-        return True
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error creating leave request: ", e)
-        return False
-    finally:
+        return None, None
+    leaveRequest = _withEmployeeName(leaveRequest)
+    if leaveRequest is not None:
+        leaveRequestChanged.send(action='created', leaveRequest=leaveRequest)
+    return leaveRequest, coverage
+
+def createLeaveRequest(employeeId, leaveType, startDate, endDate, days, reason):
+    """Create a new leave request and return it as stored (None on failure).
+
+    Raises LeaveRequestError if it overlaps one of the employee's own requests; see submitLeaveRequest.
+    """
+    return submitLeaveRequest(employeeId, leaveType, startDate, endDate, days, reason)[0]
+
+def _decideLeaveRequest(requestId, status, approvedBy):
+    useLedger = ensureLedger()
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        # The update only applies if the status is still the one read here, so two
+        # decisions racing on the same request can't both move days in the ledger
+        query = updateReturning('LEAVE_REQUESTS', ['Status = ?', 'ApprovedBy = ?', 'ApprovedDate = ?'],
+                                "RequestID = ? AND COALESCE(Status, '') = ?", LEAVE_REQUEST_RETURNING)
+        leaveRequest = None
+        for _ in range(3):
+            cursor.execute("SELECT Status FROM LEAVE_REQUESTS WHERE RequestID = ?", (requestId,))
+            row = cursor.fetchone()
+            if row is None:
+                break
+            previousStatus = row[0]
+            approvedDate = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute(query, (status, approvedBy, approvedDate, requestId, previousStatus or ''))
+            leaveRequest = leaveRequestMapper.mapRow(cursor, cursor.fetchone())
+            if leaveRequest is not None:
+                if useLedger:
+                    applyDecision(cursor, leaveRequest, previousStatus)
+                connection.commit()
+                break
+            connection.rollback()
         cursor.close()
-        connection.close()
+    leaveRequest = _withEmployeeName(leaveRequest)
+    if leaveRequest is not None:
+        leaveRequestChanged.send(action=status, leaveRequest=leaveRequest)
+    return leaveRequest
 
 def approveLeaveRequest(requestId, approvedBy):
-    """Approve a leave request"""
-    try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
-        return False
-
+    """Approve a leave request; returns the updated request, or None if it wasn't found or the update failed"""
     try:
-        cursor = connection.cursor()
-        query = """
-        UPDATE LEAVE_REQUESTS 
-        SET Status = 'approved', ApprovedBy = ?, ApprovedDate = ?
-        WHERE RequestID = ?
-        """
-        approvedDate = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute(query, (approvedBy, approvedDate, requestId))
-        connection.commit()
-        print("Leave request approved successfully.")
-        return True
-    except pyodbc.Error as e:
+        leaveRequest = _decideLeaveRequest(requestId, 'approved', approvedBy)
+        if leaveRequest is None:
+            print("Leave request to approve not found.")
+        else:
+            print("Leave request approved successfully.")
+        return leaveRequest
+    except DB_ERRORS as e:
         print("Error approving leave request: ", e)
-        return False
-    finally:
-        cursor.close()
-        connection.close()
+        return None
 
 def rejectLeaveRequest(requestId, approvedBy):
-    """Reject a leave request"""
+    """Reject a leave request; returns the updated request, or None if it wasn't found or the update failed"""
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
-        return False
+        leaveRequest = _decideLeaveRequest(requestId, 'rejected', approvedBy)
+        if leaveRequest is None:
+            print("Leave request to reject not found.")
+        else:
+            print("Leave request rejected successfully.")
+        return leaveRequest
+    except DB_ERRORS as e:
+        print("Error rejecting leave request: ", e)
+        return None
+
+DECISION_STATUSES = ('approved', 'rejected')
+BULK_DECISION_MAX = int(os.getenv('LEAVE_BULK_DECISION_MAX', 1000))
 
+def decideLeaveRequests(requestIds, status, approvedBy):
+    """Approve or reject many leave requests in one transaction.
+
+    The current statuses are read with one IN query, then each group of requests
+    sharing a current status is updated with one set-based UPDATE that only applies
+    while that status still holds (the same guard as _decideLeaveRequest). Ledger
+    changes are summed per employee, leave type and year before being written.
+    Returns per-request results in input order, each {'requestId', 'result':
+    'updated' | 'not_found' | 'conflict' | 'invalid', ...}, or None if the
+    transaction failed and nothing was applied.
+    """
+    results = [None] * len(requestIds)
+    ids = []
+    for index, requestId in enumerate(requestIds):
+        if not isinstance(requestId, int) or isinstance(requestId, bool):
+            results[index] = {'requestId': requestId, 'result': 'invalid', 'error': 'requestId must be an integer'}
+        elif requestId in ids:
+            results[index] = {'requestId': requestId, 'result': 'invalid', 'error': 'Duplicate requestId'}
+        else:
+            ids.append(requestId)
+
+    updated = {}
+    useLedger = ensureLedger()
     try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            previous = {}
+            for start in range(0, len(ids), 1000):
+                chunk = ids[start:start + 1000]
+                cursor.execute(f"SELECT RequestID, Status FROM LEAVE_REQUESTS WHERE RequestID IN ({', '.join('?' * len(chunk))})",
+                               tuple(chunk))
+                previous.update((row[0], row[1]) for row in cursor.fetchall())
+
+            groups = {}
+            for requestId, previousStatus in previous.items():
+                groups.setdefault(previousStatus or '', []).append(requestId)
+            approvedDate = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for previousStatus, groupIds in groups.items():
+                for start in range(0, len(groupIds), 1000):
+                    chunk = groupIds[start:start + 1000]
+                    query = updateReturning('LEAVE_REQUESTS', ['Status = ?', 'ApprovedBy = ?', 'ApprovedDate = ?'],
+                                            f"RequestID IN ({', '.join('?' * len(chunk))}) AND COALESCE(Status, '') = ?",
+                                            LEAVE_REQUEST_RETURNING)
+                    cursor.execute(query, (status, approvedBy, approvedDate, *chunk, previousStatus))
+                    for leaveRequest in leaveRequestMapper.mapRows(cursor, cursor.fetchall()):
+                        updated[leaveRequest.requestId] = leaveRequest
+
+            deltas = {}
+            for leaveRequest in updated.values():
+                wasApproved = previous[leaveRequest.requestId] == 'approved'
+                if wasApproved != (status == 'approved') and leaveRequest.days:
+                    key = ledgerKey(leaveRequest)
+                    deltas[key] = deltas.get(key, 0) + (leaveRequest.days if status == 'approved' else -leaveRequest.days)
+            if useLedger:
+                for key, days in deltas.items():
+                    addToLedger(cursor, *key, days)
+            connection.commit()
+            cursor.close()
+    except DB_ERRORS as e:
+        print("Error bulk deciding leave requests: ", e)
+        return None
+
+    for index, requestId in enumerate(requestIds):
+        if results[index] is None:
+            leaveRequest = updated.get(requestId)
+            if leaveRequest is not None:
+                leaveRequest = _withEmployeeName(leaveRequest)
+                results[index] = {'requestId': requestId, 'result': 'updated', 'leaveRequest': leaveRequest.toDict()}
+            elif requestId in previous:
+                # Decided by someone else between the read and the update
+                results[index] = {'requestId': requestId, 'result': 'conflict'}
+            else:
+                results[index] = {'requestId': requestId, 'result': 'not_found'}
+    for leaveRequest in updated.values():
+        leaveRequestChanged.send(action=status, leaveRequest=leaveRequest)
+    print(f"Bulk {status} {len(updated)} of {len(requestIds)} leave requests.")
+    return results
+
+LEAVE_TYPES = ('vacation', 'sick', 'personal', 'other')
+
+def _leaveBalanceQuery(count, source=LEDGER_TABLE):
+    # One row per employee: the allowance columns plus the ledger's used days per leave type
+    used = ', '.join(f"SUM(CASE WHEN l.LeaveType = '{leaveType}' THEN l.UsedDays ELSE 0 END) AS Used{leaveType.capitalize()}"
+                     for leaveType in LEAVE_TYPES)
+    return f"""
+    SELECT e.EmployeeID, e.VacationDays, e.SickDays, e.PersonalDays, e.OtherDays, {used}
+    FROM EMPLOYEES e
+    LEFT JOIN {source} l ON l.EmployeeID = e.EmployeeID
+    WHERE e.EmployeeID IN ({', '.join('?' * count)})
+    GROUP BY e.EmployeeID, e.VacationDays, e.SickDays, e.PersonalDays, e.OtherDays
+    """
+
+def _remaining(allowance, used):
+    return max(0, (allowance or 0) - (used or 0))
+
+def _queryLeaveBalances(employeeIds):
+    ids = list(dict.fromkeys(employeeIds))
+    balances = {}
+    source = LEDGER_TABLE if ensureLedger() else APPROVED_LEAVE_SOURCE
+    with getConnection() as connection:
         cursor = connection.cursor()
-        query = """
-        UPDATE LEAVE_REQUESTS 
-        SET Status = 'rejected', ApprovedBy = ?, ApprovedDate = ?
-        WHERE RequestID = ?
-        """
-        approvedDate = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute(query, (approvedBy, approvedDate, requestId))
-        connection.commit()
-        print("Leave request rejected successfully.")
-        return True
-    except pyodbc.Error as e:
-        print("Error rejecting leave request: ", e)
-        return False
-    finally:
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            cursor.execute(_leaveBalanceQuery(len(chunk), source), tuple(chunk))
+            for row in cursor.fetchall():
+                balances[row.EmployeeID] = LeaveBalance(
+                    row.EmployeeID,
+                    vacationDays=_remaining(row.VacationDays, row.UsedVacation),
+                    sickDays=_remaining(row.SickDays, row.UsedSick),
+                    personalDays=_remaining(row.PersonalDays, row.UsedPersonal),
+                    otherDays=_remaining(row.OtherDays, row.UsedOther),
+                )
         cursor.close()
-        connection.close()
+    return balances
+
+def getLeaveBalances(employeeIds):
+    """Get leave balances for many employees as {employeeId: LeaveBalance}, one query per 1000 employees.
+
+    Unknown employees are left out. Returns None if the database can't be read.
+    """
+    try:
+        return _queryLeaveBalances(employeeIds)
+    except DB_ERRORS as e:
+        print("Error fetching leave balances: ", e)
+        return None
 
 def getLeaveBalance(employeeId):
     """Get leave balance for an employee"""
-    try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
+    balances = getLeaveBalances([employeeId])
+    if balances is None:
         return None
+    if employeeId not in balances:
+        print("Employee not found.")
+        return None
+    return balances[employeeId]
+
+def getTeamLeaveBalances(managerId, maxDepth=None):
+    """Get leave balances for everyone reporting to a manager, nearest reports first.
 
+    Returns a list of (LeaveBalance, managerId, depth), or None if the manager doesn't exist.
+    """
     try:
-        cursor = connection.cursor()
-        
-        # Get initial leave balance from employee record
-        query = "SELECT VacationDays, SickDays, PersonalDays, OtherDays FROM EMPLOYEES WHERE EmployeeID = ?"
-        cursor.execute(query, employeeId)
-        row = cursor.fetchone()
-        
-        if not row:
-            print("Employee not found.")
+        if not orgHierarchy.contains(managerId):
             return None
-            
-        vacationDays, sickDays, personalDays, otherDays = row
-        
-        # Get used leave days
-        usedQuery = """
-        SELECT LeaveType, SUM(Days) as UsedDays
-        FROM LEAVE_REQUESTS 
-        WHERE EmployeeID = ? AND Status = 'approved'
-        GROUP BY LeaveType
-        """
-        cursor.execute(usedQuery, employeeId)
-        usedRows = cursor.fetchall()
-        
-        # Calculate remaining balance
-        usedDays = {}
-        for usedRow in usedRows:
-            usedDays[usedRow[0].lower()] = usedRow[1]
-        
-        leaveBalance = LeaveBalance(employeeId)
-        leaveBalance.vacationDays = max(0, vacationDays - usedDays.get('vacation', 0))
-        leaveBalance.sickDays = max(0, sickDays - usedDays.get('sick', 0))
-        leaveBalance.personalDays = max(0, personalDays - usedDays.get('personal', 0))
-        leaveBalance.otherDays = max(0, otherDays - usedDays.get('other', 0))
-        
-        cursor.close()
-        connection.close()
-        return leaveBalance
-        
-    except pyodbc.Error as e:
-        print("Error fetching leave balance: ", e)
-        return None
+        nodes = orgHierarchy.getSubtree(managerId, maxDepth)
+        balances = _queryLeaveBalances(employeeId for employeeId, _, _ in nodes)
+    except DB_ERRORS as e:
+        print("Error fetching team leave balances: ", e)
+        raise
+    return [(balances[employeeId], parentId, depth) for employeeId, parentId, depth in nodes if employeeId in balances]
 
 def getPendingLeaveRequests():
     """Get all pending leave requests"""
     leaveRequests = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        print('Connection successful!')
-    except pyodbc.Error as e:
-        print('Error connecting to the database: ', e)
-        return leaveRequests
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"""
+            SELECT lr.RequestID, lr.EmployeeID, 
+                   {EMPLOYEE_NAME} as EmployeeName,
+                   lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
+                   lr.Reason, lr.Status, lr.SubmittedDate, 
+                   lr.ApprovedBy, lr.ApprovedDate
+            FROM LEAVE_REQUESTS lr
+            JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
+            WHERE lr.Status = 'pending'
+            ORDER BY lr.SubmittedDate ASC
+            """
+            cursor.execute(query)
+            leaveRequests = leaveRequestMapper.mapRows(cursor, cursor.fetchall())
 
-    try:
-        cursor = connection.cursor()
-        query = """
-        SELECT lr.RequestID, lr.EmployeeID, 
-               e.FirstName + ' ' + e.LastName as EmployeeName,
-               lr.LeaveType, lr.StartDate, lr.EndDate, lr.Days, 
-               lr.Reason, lr.Status, lr.SubmittedDate, 
-               lr.ApprovedBy, lr.ApprovedDate
-        FROM LEAVE_REQUESTS lr
-        JOIN EMPLOYEES e ON lr.EmployeeID = e.EmployeeID
-        WHERE lr.Status = 'pending'
-        ORDER BY lr.SubmittedDate ASC
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            leaveRequest = LeaveRequest()
-            (leaveRequest.requestId, leaveRequest.employeeId, leaveRequest.employeeName,
-             leaveRequest.leaveType, leaveRequest.startDate, leaveRequest.endDate,
-             leaveRequest.days, leaveRequest.reason, leaveRequest.status,
-             leaveRequest.submittedDate, leaveRequest.approvedBy, leaveRequest.approvedDate) = row
-            leaveRequests.append(leaveRequest)
-
-        cursor.close()
-        connection.close()
-        print("Connection Closed.")
-    except pyodbc.Error as e:
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching pending leave requests: ", e)
 
     return leaveRequests 
\ No newline at end of file
@@ -0,0 +1,179 @@
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+import json
+
+from werkzeug.http import http_date
+
+
+class FieldSelectionError(ValueError):
+    """Raised for unknown keys in a `fields=` parameter; routes turn it into a 400"""
+
+
+def jsonDefault(value):
+    # Same conversions as Flask's default JSON provider, so fragments match jsonify output
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def formatDate(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+def dumps(value):
+    return json.dumps(value, default=jsonDefault, sort_keys=True, separators=(',', ':'))
+
+
+class Model:
+    """Base class for the slot-based domain models.
+
+    Subclasses list their attributes in __slots__ and describe their JSON shape in
+    `fields` (output key -> attribute), with optional `formatters` (attribute ->
+    function) for values that need converting. A toDict() returning a dict literal is
+    generated once per class from those, unless the class writes its own.
+
+    `fieldAttributes` (output key -> attributes it reads) is derived from `fields`;
+    classes with a hand-written toDict() declare it themselves. It is what lets a
+    `fields=` request parameter narrow both the SELECT list and the output, via
+    parseFields(), attributesFor() and project().
+
+    Instances are mutable until freeze() is called. After that they must be treated
+    as read-only, and toJSON() keeps the serialized fragment so shared instances
+    (e.g. cached directory entries) are only encoded once.
+    """
+
+    __slots__ = ('_json',)
+    fields = {}
+    formatters = {}
+    fieldAttributes = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._generated = 'toDict' not in cls.__dict__ and bool(cls.fields)
+        if cls._generated:
+            cls.toDict = cls._compileToDict(cls.fields)
+        if 'fieldAttributes' not in cls.__dict__ and cls.fields:
+            cls.fieldAttributes = {key: (attr,) for key, attr in cls.fields.items()}
+        cls._projectors = {}
+
+    @classmethod
+    def _compileToDict(cls, fields):
+        namespace = {}
+        items = []
+        for key, attr in fields.items():
+            value = f'self.{attr}'
+            if attr in cls.formatters:
+                namespace[f'_format_{attr}'] = cls.formatters[attr]
+                value = f'_format_{attr}({value})'
+            items.append(f'{key!r}: {value}')
+        source = 'def toDict(self):\n    return {' + ', '.join(items) + '}'
+        exec(source, namespace)
+        return namespace['toDict']
+
+    @classmethod
+    def parseFields(cls, value):
+        """Turn a comma-separated `fields=` parameter into a tuple of output keys (None means all)"""
+        if not value:
+            return None
+        keys = tuple(dict.fromkeys(key.strip() for key in value.split(',') if key.strip()))
+        unknown = [key for key in keys if key not in cls.fieldAttributes]
+        if unknown or not keys:
+            raise FieldSelectionError(f"Unknown field(s) {', '.join(unknown)}; expected any of: {', '.join(cls.fieldAttributes)}")
+        return keys
+
+    @classmethod
+    def attributesFor(cls, keys):
+        """Attributes a projection needs loaded, or None for all of them"""
+        if keys is None:
+            return None
+        return {attr for key in keys for attr in cls.fieldAttributes[key]}
+
+    def project(self, keys):
+        """toDict() restricted to the given output keys"""
+        if keys is None:
+            return self.toDict()
+        cls = type(self)
+        projector = cls._projectors.get(keys)
+        if projector is None:
+            if cls._generated:
+                projector = cls._compileToDict({key: cls.fields[key] for key in keys})
+            else:
+                projector = lambda model: {key: value for key, value in model.toDict().items() if key in keys}
+            projector = cls._projectors[keys] = projector
+        return projector(self)
+
+    def freeze(self):
+        """Mark the instance read-only so toJSON() can memoize its output"""
+        self._json = None
+        return self
+
+    def toJSON(self):
+        try:
+            cached = self._json
+        except AttributeError:
+            return dumps(self.toDict())
+        if cached is None:
+            cached = self._json = dumps(self.toDict())
+        return cached
+
+
+def dumpList(models):
+    """Serialize a list of models as a JSON array, reusing memoized fragments"""
+    return '[' + ','.join([model.toJSON() for model in models]) + ']'
+
+
+if __name__ == "__main__":
+    # Memory/throughput benchmark on 50k synthetic employees: the old dict-backed
+    # class against the slot-based model, and per-request toDict against memoized JSON
+    import gc
+    import time
+    import tracemalloc
+    from dbconnect import Employee
+
+    COUNT = 50000
+
+    class DictEmployee:
+        def __init__(self, **values):
+            for key, value in values.items():
+                setattr(self, key, value)
+
+        def toDict(self):
+            return {"FirstName": self.firstName, "LastName": self.lastName, "EmployeeID": self.ID,
+                    "Department": self.department, "Role": self.role, "Gender": self.gender,
+                    "Pword": self.pword, "Email": self.email, "PhoneNumber": self.phoneNumber,
+                    "Bio": self.bio, "ManagerID": self.ManagerID, "VacationDays": self.vacationDays,
+                    "SickDays": self.sickDays, "PersonalDays": self.personalDays,
+                    "OtherDays": self.otherDays, "Salary": self.salary}
+
+    def synthetic(i):
+        return dict(firstName=f'First{i}', lastName=f'Last{i}', ID=i, department='Engineering', role='employee',
+                    gender='F', pword='x' * 64, email=f'user{i}@example.com', phoneNumber='555-0100',
+                    bio='Bio text', ManagerID=i // 10 or None, vacationDays=20, sickDays=10,
+                    personalDays=5, otherDays=0, salary=85000.0)
+
+    def measure(label, build):
+        gc.collect()
+        tracemalloc.start()
+        objects = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:>22}: {size / COUNT:,.0f} bytes/employee ({size / 2**20:.1f} MiB total)")
+        return objects
+
+    def timeit(label, serialize):
+        gc.collect()
+        start = time.perf_counter()
+        serialize()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>22}: {COUNT / elapsed:,.0f} employees/sec ({elapsed * 1000:.0f} ms)")
+
+    legacy = measure('dict-backed', lambda: [DictEmployee(**synthetic(i)) for i in range(COUNT)])
+    slotted = measure('__slots__', lambda: [Employee(**synthetic(i)) for i in range(COUNT)])
+
+    timeit('dict-backed toDict', lambda: dumps([e.toDict() for e in legacy]))
+    timeit('__slots__ toDict', lambda: dumps([e.toDict() for e in slotted]))
+    for employee in slotted:
+        employee.freeze()
+    timeit('toJSON (first call)', lambda: dumpList(slotted))
+    timeit('toJSON (memoized)', lambda: dumpList(slotted))
@@ -0,0 +1,139 @@
+from collections import deque
+import os
+import threading
+import time
+
+from dbpool import getConnection
+
+
+class OrgHierarchy:
+    """In-memory index of the EmployeeID -> ManagerID edges in EMPLOYEES.
+
+    The whole edge list is loaded with one query and kept for `ttl` seconds, so
+    reporting chains, direct reports, subtrees and common managers are answered
+    from dictionaries instead of one query per level. addEmployee() (new hires)
+    and setManager() (manager changes) keep the index current between full reloads
+    for the writes made through this process; an employee the index hasn't seen
+    yet, e.g. one hired through another worker, is looked up individually.
+    """
+
+    def __init__(self, ttl=float(os.getenv('ORG_HIERARCHY_TTL', 600))):
+        self.ttl = ttl
+        self._managers = {}
+        self._reports = {}
+        self._loadedAt = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT EmployeeID, ManagerID FROM EMPLOYEES")
+            edges = cursor.fetchall()
+            cursor.close()
+
+        managers = {}
+        reports = {}
+        for employeeId, managerId in edges:
+            managers[employeeId] = managerId
+            if managerId is not None:
+                reports.setdefault(managerId, set()).add(employeeId)
+        with self._lock:
+            self._managers = managers
+            self._reports = reports
+            self._loadedAt = time.monotonic()
+
+    def _ensureLoaded(self):
+        if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.ttl:
+            with self._lock:
+                if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.ttl:
+                    self.refresh()
+
+    def _ensureKnown(self, employeeId):
+        if employeeId in self._managers:
+            return True
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT ManagerID FROM EMPLOYEES WHERE EmployeeID = ?", (employeeId,))
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return False
+        self.setManager(employeeId, row[0])
+        return True
+
+    def contains(self, employeeId):
+        self._ensureLoaded()
+        return self._ensureKnown(employeeId)
+
+    def getManagerID(self, employeeId):
+        self._ensureLoaded()
+        if not self._ensureKnown(employeeId):
+            return None
+        return self._managers.get(employeeId)
+
+    def getChain(self, employeeId):
+        """Manager IDs from the direct manager up to the top of the org"""
+        self._ensureLoaded()
+        if not self._ensureKnown(employeeId):
+            return []
+        chain = []
+        seen = {employeeId}
+        with self._lock:
+            managerId = self._managers.get(employeeId)
+            while managerId is not None and managerId not in seen:
+                chain.append(managerId)
+                seen.add(managerId)
+                managerId = self._managers.get(managerId)
+        return chain
+
+    def getDirectReports(self, managerId):
+        self._ensureLoaded()
+        with self._lock:
+            return sorted(self._reports.get(managerId, ()))
+
+    def iterSubtree(self, managerId, maxDepth=None):
+        """Yield (employeeId, managerId, depth) for everyone below managerId, breadth first"""
+        self._ensureLoaded()
+        queue = deque([(managerId, None, 0)])
+        seen = {managerId}
+        while queue:
+            employeeId, parentId, depth = queue.popleft()
+            if depth:
+                yield employeeId, parentId, depth
+            if maxDepth is not None and depth >= maxDepth:
+                continue
+            with self._lock:
+                reportIds = sorted(self._reports.get(employeeId, ()))
+            for reportId in reportIds:
+                if reportId not in seen:
+                    seen.add(reportId)
+                    queue.append((reportId, employeeId, depth + 1))
+
+    def getSubtree(self, managerId, maxDepth=None):
+        return list(self.iterSubtree(managerId, maxDepth))
+
+    def isInSubtree(self, employeeId, managerId):
+        return managerId in self.getChain(employeeId)
+
+    def getCommonManager(self, firstId, secondId):
+        """Lowest manager that both employees report up to, or None"""
+        firstChain = set(self.getChain(firstId))
+        for managerId in self.getChain(secondId):
+            if managerId in firstChain:
+                return managerId
+        return None
+
+    def addEmployee(self, employeeId, managerId=None):
+        self.setManager(employeeId, managerId)
+
+    def setManager(self, employeeId, managerId):
+        with self._lock:
+            previous = self._managers.get(employeeId)
+            if previous is not None and previous in self._reports:
+                self._reports[previous].discard(employeeId)
+            self._managers[employeeId] = managerId
+            if managerId is not None:
+                self._reports.setdefault(managerId, set()).add(employeeId)
+
+
+orgHierarchy = OrgHierarchy()
@@ -0,0 +1,101 @@
+import os
+
+from cache import TTLCache
+from dbpool import getConnection, DB_ERRORS
+
+# Short TTL: dashboards poll these counters, and a new hire showing up a minute late is fine
+statsCache = TTLCache('orgStats', maxSize=32, ttl=float(os.getenv('ORG_STATS_CACHE_TTL', 60)))
+
+# Dimension name -> EMPLOYEES column (whitelisted, since column names can't be parameters)
+DIMENSIONS = {
+    'department': 'Department',
+    'role': 'Role',
+    'gender': 'Gender',
+    'manager': 'ManagerID',
+}
+
+# Lower bounds of the salary bands; the last band is open-ended
+SALARY_BAND_FLOORS = (0, 50000, 75000, 100000, 150000)
+
+
+def _queryHeadcount():
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM EMPLOYEES")
+        count = cursor.fetchone()[0]
+        cursor.close()
+    return count
+
+def _queryHeadcountBy(dimension):
+    column = DIMENSIONS[dimension]
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        query = f"SELECT {column}, COUNT(*) AS Headcount FROM EMPLOYEES GROUP BY {column} ORDER BY Headcount DESC"
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        cursor.close()
+    return [{dimension: row[0], 'count': row[1]} for row in rows]
+
+def _querySalaryBands():
+    # Bucket in a derived table so the CASE isn't repeated in the GROUP BY
+    cases = ' '.join(f"WHEN Salary >= {int(floor)} THEN {index}" for index, floor in reversed(list(enumerate(SALARY_BAND_FLOORS))))
+    query = f"""
+    SELECT Band, COUNT(*) AS Headcount, AVG(Salary) AS AverageSalary
+    FROM (SELECT Salary, CASE WHEN Salary IS NULL THEN NULL {cases} END AS Band FROM EMPLOYEES) banded
+    GROUP BY Band
+    """
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        counts = {row.Band: row for row in cursor.fetchall()}
+        cursor.close()
+
+    bands = []
+    for index, floor in enumerate(SALARY_BAND_FLOORS):
+        row = counts.get(index)
+        bands.append({
+            'min': floor,
+            'max': SALARY_BAND_FLOORS[index + 1] if index + 1 < len(SALARY_BAND_FLOORS) else None,
+            'count': row.Headcount if row else 0,
+            'averageSalary': float(row.AverageSalary) if row and row.AverageSalary is not None else None,
+        })
+    unknown = counts.get(None)
+    if unknown:
+        bands.append({'min': None, 'max': None, 'count': unknown.Headcount, 'averageSalary': None})
+    return bands
+
+def getHeadcount():
+    """Get the total number of employees with a single COUNT(*)"""
+    try:
+        return statsCache.getOrLoad('total', _queryHeadcount)
+    except DB_ERRORS as e:
+        print("Error counting employees: ", e)
+        return None
+
+def getHeadcountBy(dimension):
+    """Get employee counts grouped by department, role, gender or manager"""
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension '{dimension}', expected one of {', '.join(DIMENSIONS)}")
+    try:
+        return statsCache.getOrLoad(('by', dimension), lambda: _queryHeadcountBy(dimension))
+    except DB_ERRORS as e:
+        print(f"Error counting employees by {dimension}: ", e)
+        return None
+
+def getSalaryBands():
+    """Get headcount and average salary per salary band"""
+    try:
+        return statsCache.getOrLoad('salaryBands', _querySalaryBands)
+    except DB_ERRORS as e:
+        print("Error computing salary bands: ", e)
+        return None
+
+def getOrgStatistics():
+    stats = {'total': getHeadcount()}
+    for dimension in DIMENSIONS:
+        stats['by' + dimension.capitalize()] = getHeadcountBy(dimension)
+    stats['salaryBands'] = getSalaryBands()
+    return stats
+
+def invalidateOrgStatistics():
+    statsCache.clear()
@@ -0,0 +1,243 @@
+from datetime import date, datetime
+import base64
+import json
+
+from dbpool import usingSqlite
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 5000
+
+
+class PaginationError(ValueError):
+    """Raised for malformed limit/cursor parameters; routes turn it into a 400"""
+
+
+def _encodeValue(value):
+    # Keep dates typed so they bind as date parameters again when the cursor comes back
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    return str(value)
+
+def _decodeValue(value):
+    if '$datetime' in value:
+        return datetime.fromisoformat(value['$datetime'])
+    if '$date' in value:
+        return date.fromisoformat(value['$date'])
+    return value
+
+def encodeCursor(values):
+    """Opaque cursor for the position after the last returned item"""
+    raw = json.dumps(values, separators=(',', ':'), default=_encodeValue).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decodeCursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()), object_hook=_decodeValue)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+def parseLimit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    return min(limit, maximum)
+
+
+class Filter:
+    """A filterable field: `?field=value` (repeat for IN), plus `fieldFrom`/`fieldTo` when ranged"""
+
+    def __init__(self, column, type=str, ranged=False):
+        self.column = column
+        self.type = type
+        self.ranged = ranged
+
+    def convert(self, name, value):
+        try:
+            return self.type(value)
+        except (TypeError, ValueError):
+            raise PaginationError(f"Invalid value for '{name}': {value!r}")
+
+
+class Page:
+    """A parsed list request: sort column and direction, WHERE conditions and keyset position"""
+
+    def __init__(self, sortKey, sortColumn, descending, conditions, params, limit, after, fields=None):
+        self.sortKey = sortKey
+        self.sortColumn = sortColumn
+        self.descending = descending
+        self.conditions = conditions
+        self.params = params
+        self.limit = limit
+        self.after = after
+        self.fields = fields
+
+
+class Listing:
+    """The paging/filtering contract of one list endpoint, pushed down into SQL.
+
+    Query parameters:
+      limit   page size (default DEFAULT_LIMIT, capped at MAX_LIMIT)
+      after   the nextCursor of the previous page
+      sort    a key from `sorts`, prefixed with '-' for descending
+      <name>, <name>From, <name>To   equality / inclusive range filters from `filters`
+      fields  comma-separated output keys; only the columns they need are selected
+
+    Pages are keyset based: ORDER BY <sort column>, <id column> and continue from the
+    last row's values, so every page is an index seek rather than an OFFSET scan.
+    """
+
+    PARAMS = ('limit', 'after', 'sort', 'fields')
+
+    def __init__(self, mapper, columns, source, idColumn, sorts, filters, defaultSort, where=()):
+        # columns maps model attribute -> SELECT expression
+        self.mapper = mapper
+        self.columns = columns
+        self.source = source
+        self.idColumn = idColumn
+        self.sorts = sorts
+        self.filters = filters
+        self.defaultSort = defaultSort
+        self.baseConditions = tuple(where)
+
+    def where(self, condition, defaultSort=None):
+        """Copy of this listing restricted by a fixed SQL condition"""
+        return Listing(self.mapper, self.columns, self.source, self.idColumn, self.sorts, self.filters,
+                       defaultSort or self.defaultSort, self.baseConditions + (condition,))
+
+    def selectList(self, fields=None):
+        """SELECT expressions needed for the given output keys (all columns for None)"""
+        attrs = self.mapper.model.attributesFor(fields)
+        return [expression for attr, expression in self.columns.items() if attrs is None or attr in attrs]
+
+    def isRequested(self, args):
+        """True if the request uses any paging or filter parameter"""
+        for name in args:
+            if name in self.PARAMS or name in self.filters:
+                return True
+            if name.endswith(('From', 'To')) and name[:-4 if name.endswith('From') else -2] in self.filters:
+                return True
+        return False
+
+    def parse(self, args, defaultLimit=DEFAULT_LIMIT):
+        """Parse request args into a Page; defaultLimit=None leaves the result unbounded unless `limit` is given"""
+        criteria = {}
+        for name, spec in self.filters.items():
+            values = [value for value in args.getlist(name) if value != '']
+            if values:
+                criteria[name] = values
+            if spec.ranged:
+                for suffix in ('From', 'To'):
+                    if args.get(name + suffix):
+                        criteria[name + suffix] = args.get(name + suffix)
+        return self.page(sort=args.get('sort'),
+                         limit=parseLimit(args.get('limit'), defaultLimit),
+                         after=args.get('after'),
+                         fields=self.mapper.model.parseFields(args.get('fields')),
+                         **criteria)
+
+    def _filterFor(self, name):
+        """(Filter, SQL operator) for a criterion name: `<name>` or a ranged `<name>From` / `<name>To`"""
+        if name in self.filters:
+            return self.filters[name], None
+        for suffix, operator in (('From', '>='), ('To', '<=')):
+            spec = self.filters.get(name[:-len(suffix)]) if name.endswith(suffix) else None
+            if spec is not None and spec.ranged:
+                return spec, operator
+        raise PaginationError(f"Unknown filter '{name}'")
+
+    def page(self, sort=None, limit=DEFAULT_LIMIT, after=None, fields=None, **criteria):
+        """Build a Page from keyword criteria.
+
+        Each filter takes a value or a list of values (matched with IN), and ranged
+        filters also take <name>From / <name>To bounds. String values are converted
+        with the filter's type, so request args and typed Python values both work.
+        """
+        sort = sort or self.defaultSort
+        descending = sort.startswith('-')
+        sortKey = sort.lstrip('-')
+        if sortKey not in self.sorts:
+            raise PaginationError(f"sort must be one of: {', '.join(self.sorts)}")
+
+        conditions = list(self.baseConditions)
+        params = []
+        for name, value in criteria.items():
+            if value is None:
+                continue
+            spec, operator = self._filterFor(name)
+            values = [spec.convert(name, item) if isinstance(item, str) else item
+                      for item in (value if isinstance(value, (list, tuple, set)) else [value])]
+            if operator:
+                conditions.append(f"{spec.column} {operator} ?")
+                params.append(values[0])
+            elif len(values) == 1:
+                conditions.append(f"{spec.column} = ?")
+                params.append(values[0])
+            elif values:
+                conditions.append(f"{spec.column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+
+        position = decodeCursor(after)
+        if position is not None and not (isinstance(position, list) and len(position) == 2):
+            raise PaginationError("Invalid cursor")
+        return Page(sortKey, self.sorts[sortKey], descending, conditions, params, limit, position, fields)
+
+    def _keysetCondition(self, page):
+        # NULLs sort first ascending and last descending on both SQL Server and SQLite,
+        # so a NULL sort value is treated as smaller than everything else
+        lastValue, lastId = page.after
+        column, idColumn = page.sortColumn, self.idColumn
+        later = '<' if page.descending else '>'
+        if column == idColumn:
+            return f"{idColumn} {later} ?", [lastId]
+        if lastValue is None:
+            if page.descending:
+                return f"({column} IS NULL AND {idColumn} < ?)", [lastId]
+            return f"({column} IS NULL AND {idColumn} > ?) OR {column} IS NOT NULL", [lastId]
+        # The leading range predicate lets the optimizer seek an index on (column, id)
+        # instead of scanning to evaluate the OR
+        condition = f"{column} {later}= ? AND ({column} {later} ? OR {idColumn} {later} ?)"
+        if page.descending:
+            condition = f"({condition}) OR {column} IS NULL"
+        return condition, [lastValue, lastValue, lastId]
+
+    def buildQuery(self, page):
+        conditions = list(page.conditions)
+        params = list(page.params)
+        if page.after is not None:
+            condition, values = self._keysetCondition(page)
+            conditions.append(condition)
+            params.extend(values)
+
+        direction = ' DESC' if page.descending else ''
+        columns = self.selectList(page.fields) + [f"{page.sortColumn} AS PageSortKey", f"{self.idColumn} AS PageSortID"]
+        query = f"SELECT {', '.join(columns)} FROM {self.source}"
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(f"({condition})" for condition in conditions)
+        query += f" ORDER BY {page.sortColumn}{direction}, {self.idColumn}{direction}"
+        if page.limit is not None:
+            # One extra row tells us whether there is a next page
+            query += " LIMIT ?" if usingSqlite() else " OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+            params.append(page.limit + 1)
+        return query, params
+
+    def fetchPage(self, cursor, page):
+        """Run the page query on cursor and return (models, nextCursor)"""
+        query, params = self.buildQuery(page)
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+        nextCursor = None
+        if len(rows) > page.limit:
+            rows = rows[:page.limit]
+            last = rows[-1]
+            nextCursor = encodeCursor([last.PageSortKey, last.PageSortID])
+        return self.mapper.mapRows(cursor, rows), nextCursor
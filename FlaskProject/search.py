@@ -0,0 +1,213 @@
+from collections import Counter
+import heapq
+import html
+import math
+import os
+import re
+import threading
+import time
+
+from dbpool import getConnection
+from signals import ticketChanged
+from ticket_archive import getArchivedTickets
+from tickets import TICKET_COLUMNS, ticketMapper
+
+SEARCH_RELOAD_INTERVAL = float(os.getenv('SEARCH_RELOAD_INTERVAL', 900))
+# Title matches count this many times over body matches
+SEARCH_TITLE_WEIGHT = float(os.getenv('SEARCH_TITLE_WEIGHT', 2))
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:['.][^\W_]+)*")
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'i', 'if', 'in',
+    'into', 'is', 'it', 'its', 'me', 'my', 'no', 'not', 'of', 'on', 'or', 'so', 'that', 'the', 'their',
+    'then', 'there', 'this', 'to', 'was', 'we', 'were', 'when', 'will', 'with', 'you', 'your',
+))
+
+
+def normalize(token):
+    token = token.lower().replace("'", '')
+    return None if token in STOP_WORDS else token
+
+def tokenize(text):
+    """Indexable terms in text, in order"""
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text or ''):
+        term = normalize(match.group())
+        if term:
+            terms.append(term)
+    return terms
+
+
+def highlight(text, terms, maxLength=None):
+    """HTML-escaped text with matching words wrapped in <mark>, cut to a window around the first match"""
+    text = text or ''
+    matches = [match for match in TOKEN_PATTERN.finditer(text) if normalize(match.group()) in terms]
+    start, end = 0, len(text)
+    if maxLength is not None and len(text) > maxLength:
+        first = matches[0].start() if matches else 0
+        start = max(0, min(first - maxLength // 4, len(text) - maxLength))
+        end = start + maxLength
+        # Don't cut words in half
+        if start > 0:
+            start = text.find(' ', start) + 1 or start
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            end = space if space > start else end
+
+    pieces = ['…' if start > 0 else '']
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        pieces.append(html.escape(text[position:match.start()]))
+        pieces.append('<mark>' + html.escape(match.group()) + '</mark>')
+        position = match.end()
+    pieces.append(html.escape(text[position:end]))
+    pieces.append('…' if end < len(text) else '')
+    return ''.join(pieces)
+
+
+class TicketSearchIndex:
+    """In-memory inverted index over ticket titles and bodies, ranked with BM25.
+
+    Each term maps to {ticketId: weighted term frequency}, with title occurrences
+    counted `titleWeight` times. A query only touches the postings of its own terms,
+    so search cost follows how common the terms are rather than the ticket count.
+    Archived tickets stay searchable and are flagged as such. Ticket writes arrive
+    through the ticketChanged signal and replace that ticket's postings; a full
+    rebuild every `reloadInterval` seconds picks up writes made by other worker
+    processes.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, reloadInterval=SEARCH_RELOAD_INTERVAL, titleWeight=SEARCH_TITLE_WEIGHT):
+        self.reloadInterval = reloadInterval
+        self.titleWeight = titleWeight
+        self._postings = {}
+        self._terms = {}
+        self._lengths = {}
+        self._tickets = {}
+        self._archived = set()
+        self._totalLength = 0
+        self._loadedAt = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {TICKET_COLUMNS} FROM IT_TICKETS")
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+        archived = getArchivedTickets()
+
+        with self._lock:
+            self._postings = {}
+            self._terms = {}
+            self._lengths = {}
+            self._tickets = {}
+            self._archived = {ticket.ticketId for ticket in archived}
+            self._totalLength = 0
+            for ticket in tickets + archived:
+                self._add(ticket)
+            self._loadedAt = time.monotonic()
+
+    def _ensureLoaded(self):
+        if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+            with self._lock:
+                if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+                    self.refresh()
+
+    def _termWeights(self, ticket):
+        weights = Counter()
+        for term in tokenize(ticket.title):
+            weights[term] += self.titleWeight
+        for term in tokenize(ticket.body):
+            weights[term] += 1
+        return weights
+
+    def _add(self, ticket):
+        weights = self._termWeights(ticket)
+        ticketId = ticket.ticketId
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[ticketId] = weight
+        self._terms[ticketId] = tuple(weights)
+        self._lengths[ticketId] = sum(weights.values())
+        self._totalLength += self._lengths[ticketId]
+        self._tickets[ticketId] = ticket
+
+    def _remove(self, ticketId):
+        for term in self._terms.pop(ticketId, ()):
+            postings = self._postings[term]
+            del postings[ticketId]
+            if not postings:
+                del self._postings[term]
+        self._totalLength -= self._lengths.pop(ticketId, 0)
+        self._tickets.pop(ticketId, None)
+        self._archived.discard(ticketId)
+
+    def index(self, ticket):
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            self._remove(ticket.ticketId)
+            self._add(ticket)
+
+    def unindex(self, ticketId):
+        with self._lock:
+            self._remove(ticketId)
+
+    def onTicketChanged(self, action, ticket, **_):
+        if action == 'deleted':
+            self.unindex(ticket.ticketId)
+        else:
+            self.index(ticket)
+            if action == 'archived':
+                with self._lock:
+                    if ticket.ticketId in self._tickets:
+                        self._archived.add(ticket.ticketId)
+
+    def isArchived(self, ticketId):
+        return ticketId in self._archived
+
+    def search(self, query, limit=20, **filters):
+        """The query's terms and its best matching tickets as (score, ticket) pairs, best first.
+
+        Keyword filters (status=..., employeeId=...) keep only tickets whose attribute
+        equals the value, compared case-insensitively for strings.
+        """
+        self._ensureLoaded()
+        terms = set(tokenize(query))
+        filters = {name: value.lower() if isinstance(value, str) else value
+                   for name, value in filters.items() if value is not None}
+
+        def matchesFilters(ticket):
+            for name, value in filters.items():
+                actual = getattr(ticket, name)
+                if (actual.lower() if isinstance(actual, str) else actual) != value:
+                    return False
+            return True
+
+        with self._lock:
+            count = len(self._tickets)
+            if not terms or not count:
+                return terms, []
+            averageLength = self._totalLength / count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for ticketId, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[ticketId] / averageLength)
+                    scores[ticketId] = scores.get(ticketId, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            if filters:
+                scores = {ticketId: score for ticketId, score in scores.items() if matchesFilters(self._tickets[ticketId])}
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return terms, [(score, self._tickets[ticketId]) for ticketId, score in best]
+
+
+ticketSearchIndex = TicketSearchIndex()
+ticketChanged.connect(ticketSearchIndex.onTicketChanged)
@@ -0,0 +1,35 @@
+class Signal:
+    """Minimal in-process publish/subscribe hook for data changes.
+
+    Data-access modules call send() after a write has committed, and components
+    that keep derived state in memory connect() a receiver. Receivers run
+    synchronously in the writer's thread, so they should be quick; an exception in
+    one receiver is logged and doesn't affect the write or the other receivers.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._receivers = []
+
+    def connect(self, receiver):
+        if receiver not in self._receivers:
+            self._receivers.append(receiver)
+        return receiver
+
+    def disconnect(self, receiver):
+        if receiver in self._receivers:
+            self._receivers.remove(receiver)
+
+    def send(self, **payload):
+        for receiver in list(self._receivers):
+            try:
+                receiver(**payload)
+            except Exception as e:
+                print(f"Error in {self.name} receiver {getattr(receiver, '__name__', receiver)}: ", e)
+
+
+# action is 'created', 'updated' or 'deleted'; ticket is the row as written (as it was, for deletes)
+ticketChanged = Signal('ticketChanged')
+
+# action is 'created', 'approved' or 'rejected'; leaveRequest is the row as written
+leaveRequestChanged = Signal('leaveRequestChanged')
@@ -0,0 +1,164 @@
+from collections import Counter
+import heapq
+import math
+import os
+import threading
+import time
+
+from dbpool import getConnection
+from search import SEARCH_TITLE_WEIGHT, tokenize
+from signals import ticketChanged
+from sla import CLOSED_STATUSES, isOpen
+from tickets import TICKET_COLUMNS, ticketMapper
+
+SIMILARITY_RELOAD_INTERVAL = float(os.getenv('SIMILARITY_RELOAD_INTERVAL', 900))
+# Cosine similarity below this is not reported as a likely duplicate
+SIMILAR_TICKET_MIN_SCORE = float(os.getenv('SIMILAR_TICKET_MIN_SCORE', 0.3))
+# Query terms found in more open tickets than this are too common to pick out duplicates and are skipped
+SIMILARITY_MAX_TERM_POSTINGS = int(os.getenv('SIMILARITY_MAX_TERM_POSTINGS', 1000))
+
+
+def termCounts(title, body, titleWeight=SEARCH_TITLE_WEIGHT):
+    counts = Counter()
+    for term in tokenize(title):
+        counts[term] += titleWeight
+    for term in tokenize(body):
+        counts[term] += 1
+    return counts
+
+def smoothedIdf(count, documentFrequency):
+    return math.log((1 + count) / (1 + documentFrequency)) + 1
+
+
+class TicketSimilarityIndex:
+    """TF-IDF vectors of open tickets for finding likely duplicates.
+
+    Weights are (1 + log tf) * idf with smoothed idf. Each term maps to
+    {ticketId: weight / norm of that ticket's vector}, so the postings are the
+    columns of the normalized ticket-term matrix and a query's cosine similarity
+    with every ticket is one sparse dot product over its own terms' postings.
+    Tickets sharing no term with the query are never touched. Idf is fixed when
+    the index is rebuilt (a term first seen afterwards gets its idf then), which
+    lets a ticket's weights and norm be computed once when it is added. Closed
+    tickets are dropped, since duplicates only matter while the original is still
+    being worked. A full rebuild every `reloadInterval` seconds refreshes idf and
+    picks up writes made by other worker processes.
+    """
+
+    def __init__(self, reloadInterval=SIMILARITY_RELOAD_INTERVAL, maxTermPostings=SIMILARITY_MAX_TERM_POSTINGS):
+        self.reloadInterval = reloadInterval
+        self.maxTermPostings = maxTermPostings
+        self._idf = {}
+        self._postings = {}
+        self._terms = {}
+        self._tickets = {}
+        self._loadedAt = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"""
+            SELECT {TICKET_COLUMNS} FROM IT_TICKETS
+            WHERE [Status] IS NULL OR LOWER([Status]) NOT IN ({', '.join('?' * len(CLOSED_STATUSES))})
+            """
+            cursor.execute(query, CLOSED_STATUSES)
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+
+        counted = [(ticket, termCounts(ticket.title, ticket.body)) for ticket in tickets]
+        counted = [(ticket, counts) for ticket, counts in counted if counts]
+        documentFrequencies = Counter(term for _, counts in counted for term in counts)
+        idf = {term: smoothedIdf(len(counted), frequency) for term, frequency in documentFrequencies.items()}
+
+        with self._lock:
+            self._idf = idf
+            self._postings = {}
+            self._terms = {}
+            self._tickets = {}
+            for ticket, counts in counted:
+                self._add(ticket, counts)
+            self._loadedAt = time.monotonic()
+
+    def _ensureLoaded(self):
+        if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+            with self._lock:
+                if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+                    self.refresh()
+
+    def _termIdf(self, term):
+        idf = self._idf.get(term)
+        if idf is None:
+            idf = self._idf[term] = smoothedIdf(len(self._tickets), len(self._postings.get(term, ())))
+        return idf
+
+    def _add(self, ticket, counts=None):
+        counts = counts if counts is not None else termCounts(ticket.title, ticket.body)
+        if not counts:
+            return
+        weights = {term: (1 + math.log(frequency)) * self._termIdf(term) for term, frequency in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[ticket.ticketId] = weight / norm
+        self._terms[ticket.ticketId] = tuple(weights)
+        self._tickets[ticket.ticketId] = ticket
+
+    def _remove(self, ticketId):
+        for term in self._terms.pop(ticketId, ()):
+            postings = self._postings[term]
+            del postings[ticketId]
+            if not postings:
+                del self._postings[term]
+                self._idf.pop(term, None)
+        self._tickets.pop(ticketId, None)
+
+    def onTicketChanged(self, action, ticket, **_):
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            self._remove(ticket.ticketId)
+            if action != 'deleted' and isOpen(ticket):
+                self._add(ticket)
+
+    def similar(self, title, body, limit=5, minScore=SIMILAR_TICKET_MIN_SCORE, exclude=None):
+        """Open tickets most similar to the given text as (score, ticket) pairs, best first"""
+        self._ensureLoaded()
+        query = termCounts(title, body)
+        # Only copy out what the query needs under the lock; scoring runs on that snapshot
+        with self._lock:
+            count = len(self._tickets)
+            queryWeights = {}
+            columns = []
+            for term, frequency in query.items():
+                postings = self._postings.get(term)
+                idf = self._idf[term] if postings else smoothedIdf(count, 0)
+                queryWeights[term] = (1 + math.log(frequency)) * idf
+                if postings and len(postings) <= self.maxTermPostings:
+                    columns.append((term, list(postings.items())))
+
+        # Skipped common terms still count towards the query norm, so scores stay comparable
+        queryNorm = math.sqrt(sum(weight * weight for weight in queryWeights.values()))
+        if not queryNorm:
+            return []
+        scores = {}
+        for term, postings in columns:
+            queryWeight = queryWeights[term] / queryNorm
+            for ticketId, weight in postings:
+                scores[ticketId] = scores.get(ticketId, 0.0) + queryWeight * weight
+        scores.pop(exclude, None)
+
+        best = heapq.nlargest(limit, ((score, ticketId) for ticketId, score in scores.items() if score >= minScore))
+        results = []
+        for score, ticketId in best:
+            ticket = self._tickets.get(ticketId)
+            # Closed or deleted since the snapshot was taken
+            if ticket is not None:
+                results.append((score, ticket))
+        return results
+
+    def similarTo(self, ticket, limit=5, minScore=SIMILAR_TICKET_MIN_SCORE):
+        return self.similar(ticket.title, ticket.body, limit=limit, minScore=minScore, exclude=ticket.ticketId)
+
+
+ticketSimilarityIndex = TicketSimilarityIndex()
+ticketChanged.connect(ticketSimilarityIndex.onTicketChanged)
@@ -0,0 +1,187 @@
+from datetime import date, datetime, time as dtime, timedelta
+import heapq
+import os
+import threading
+import time
+
+from dbpool import getConnection
+from model import formatDate
+from signals import ticketChanged
+from tickets import TICKET_COLUMNS, ticketMapper
+
+
+def parseTargets(value):
+    """'high=4,medium=8,low=24' -> {'high': 4.0, 'medium': 8.0, 'low': 24.0}"""
+    targets = {}
+    for item in value.split(','):
+        if '=' in item:
+            priority, hours = item.split('=', 1)
+            targets[priority.strip().lower()] = float(hours)
+    return targets
+
+# Resolution targets in hours per priority, matching the defaults on the SLA configuration page
+SLA_RESOLUTION_HOURS = parseTargets(os.getenv('SLA_RESOLUTION_HOURS', 'high=4,medium=8,low=24'))
+SLA_DEFAULT_HOURS = float(os.getenv('SLA_DEFAULT_HOURS', 24))
+SLA_RELOAD_INTERVAL = float(os.getenv('SLA_RELOAD_INTERVAL', 900))
+
+CLOSED_STATUSES = ('resolved', 'closed')
+
+
+def isOpen(ticket):
+    return (ticket.status or '').lower() not in CLOSED_STATUSES
+
+def createdAt(ticket):
+    created = ticket.createdDate
+    if isinstance(created, date) and not isinstance(created, datetime):
+        # CreatedDate is a DATE column, so the clock starts at midnight of that day
+        created = datetime.combine(created, dtime.min)
+    return created if created is not None else datetime.now()
+
+def slaDeadline(ticket, targets=SLA_RESOLUTION_HOURS):
+    created = createdAt(ticket)
+    hours = targets.get((ticket.priority or '').lower(), SLA_DEFAULT_HOURS)
+    return created + timedelta(hours=hours)
+
+
+class SLATracker:
+    """Open tickets ordered by SLA deadline, with breaches found as time passes.
+
+    Open tickets sit in a min-heap of (deadline, ticketId, version). Reading the
+    state first pops every entry whose deadline has passed into the breach set, so
+    each ticket crosses over once instead of every ticket being re-checked on every
+    request. Ticket writes arrive through the ticketChanged signal: a new version is
+    pushed and the old heap entry is left to be skipped when it surfaces (the heap
+    is rebuilt when stale entries outnumber live ones). Closed or deleted tickets
+    are dropped. A full reload every `reloadInterval` seconds picks up writes made
+    by other worker processes.
+    """
+
+    def __init__(self, targets=SLA_RESOLUTION_HOURS, reloadInterval=SLA_RELOAD_INTERVAL):
+        self.targets = targets
+        self.reloadInterval = reloadInterval
+        self._heap = []
+        self._open = {}
+        self._breached = {}
+        self._version = 0
+        self._loadedAt = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"""
+            SELECT {TICKET_COLUMNS} FROM IT_TICKETS
+            WHERE [Status] IS NULL OR LOWER([Status]) NOT IN ({', '.join('?' * len(CLOSED_STATUSES))})
+            """
+            cursor.execute(query, CLOSED_STATUSES)
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+
+        with self._lock:
+            self._open = {}
+            self._breached = {}
+            self._heap = []
+            for ticket in tickets:
+                self._version += 1
+                entry = self._entry(ticket)
+                self._open[ticket.ticketId] = entry
+                self._heap.append((entry['deadline'], ticket.ticketId, self._version))
+            heapq.heapify(self._heap)
+            self._loadedAt = time.monotonic()
+
+    def _ensureLoaded(self):
+        if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+            with self._lock:
+                if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+                    self.refresh()
+
+    def _entry(self, ticket):
+        return {
+            'ticketId': ticket.ticketId,
+            'employeeId': ticket.employeeId,
+            'title': ticket.title,
+            'priority': ticket.priority,
+            'status': ticket.status,
+            'category': ticket.category,
+            'createdDate': formatDate(ticket.createdDate),
+            'deadline': slaDeadline(ticket, self.targets),
+            'version': self._version,
+        }
+
+    def track(self, ticket):
+        """Add or re-time a ticket after a write, or drop it once it is closed"""
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            if not isOpen(ticket):
+                self.untrack(ticket.ticketId)
+                return
+            self._version += 1
+            entry = self._entry(ticket)
+            self._breached.pop(ticket.ticketId, None)
+            self._open[ticket.ticketId] = entry
+            heapq.heappush(self._heap, (entry['deadline'], ticket.ticketId, self._version))
+            self._compact()
+
+    def untrack(self, ticketId):
+        with self._lock:
+            self._open.pop(ticketId, None)
+            self._breached.pop(ticketId, None)
+            self._compact()
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._open) + 64:
+            self._heap = [item for item in self._heap if self._isCurrent(item)]
+            heapq.heapify(self._heap)
+
+    def _isCurrent(self, item):
+        entry = self._open.get(item[1])
+        return entry is not None and entry['version'] == item[2]
+
+    def _advance(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            if self._isCurrent(item):
+                self._breached[item[1]] = self._open.pop(item[1])
+
+    def onTicketChanged(self, action, ticket, **_):
+        if action == 'deleted':
+            self.untrack(ticket.ticketId)
+        else:
+            self.track(ticket)
+
+    def snapshot(self, limit=50, withinHours=None):
+        """Current breaches (most overdue first) and the next deadlines still to come"""
+        self._ensureLoaded()
+        now = datetime.now()
+        with self._lock:
+            self._advance(now)
+            breached = sorted(self._breached.values(), key=lambda entry: (entry['deadline'], entry['ticketId']))
+            horizon = now + timedelta(hours=withinHours) if withinHours is not None else None
+            upcoming = []
+            for deadline, ticketId, version in heapq.nsmallest(limit + len(self._heap) - len(self._open), self._heap):
+                if len(upcoming) >= limit or (horizon is not None and deadline > horizon):
+                    break
+                if self._isCurrent((deadline, ticketId, version)):
+                    upcoming.append(self._open[ticketId])
+            openCount = len(self._open) + len(self._breached)
+            breachedCount = len(self._breached)
+
+        def present(entry):
+            item = {key: value for key, value in entry.items() if key != 'version'}
+            item['deadline'] = entry['deadline'].isoformat(timespec='minutes')
+            item['minutesRemaining'] = int((entry['deadline'] - now).total_seconds() // 60)
+            return item
+
+        return {
+            'asOf': now.isoformat(timespec='seconds'),
+            'targets': self.targets,
+            'openCount': openCount,
+            'breachedCount': breachedCount,
+            'breached': [present(entry) for entry in breached[:limit]],
+            'upcoming': [present(entry) for entry in upcoming],
+        }
+
+
+slaTracker = SLATracker()
+ticketChanged.connect(slaTracker.onTicketChanged)
@@ -0,0 +1,10 @@
+-- Index behind the team leave calendar (team_calendar.py).
+-- The overlap test StartDate <= @to AND EndDate >= @from seeks on (EmployeeID, StartDate)
+-- for each team member and checks EndDate and Status from the INCLUDE columns, so the
+-- calendar never touches the base table.
+-- Safe to re-run: the index is only created if it is missing.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LEAVE_REQUESTS_Employee_StartDate' AND object_id = OBJECT_ID('LEAVE_REQUESTS'))
+    CREATE INDEX IX_LEAVE_REQUESTS_Employee_StartDate
+        ON LEAVE_REQUESTS (EmployeeID, StartDate)
+        INCLUDE (EndDate, [Status], LeaveType, Days);
@@ -0,0 +1,22 @@
+-- Approved leave days per employee, leave type and year (leave_ledger.py).
+-- Approving or rejecting a request updates it in the same transaction, and leave
+-- balances are read from it instead of summing LEAVE_REQUESTS.
+-- Safe to re-run: the table is only created if it is missing, and only filled from
+-- the existing approved requests while it is empty.
+
+IF OBJECT_ID('LEAVE_LEDGER') IS NULL
+    CREATE TABLE LEAVE_LEDGER (
+        EmployeeID INT NOT NULL,
+        LeaveType NVARCHAR(50) NOT NULL,
+        LeaveYear INT NOT NULL,
+        UsedDays INT NOT NULL DEFAULT 0,
+        UpdatedDate DATETIME2 NULL,
+        CONSTRAINT PK_LEAVE_LEDGER PRIMARY KEY (EmployeeID, LeaveType, LeaveYear)
+    );
+
+IF NOT EXISTS (SELECT 1 FROM LEAVE_LEDGER)
+    INSERT INTO LEAVE_LEDGER (EmployeeID, LeaveType, LeaveYear, UsedDays, UpdatedDate)
+    SELECT EmployeeID, COALESCE(LOWER(LeaveType), ''), COALESCE(YEAR(StartDate), 0), COALESCE(SUM(Days), 0), SYSDATETIME()
+    FROM LEAVE_REQUESTS
+    WHERE Status = 'approved' AND EmployeeID IS NOT NULL
+    GROUP BY EmployeeID, COALESCE(LOWER(LeaveType), ''), COALESCE(YEAR(StartDate), 0);
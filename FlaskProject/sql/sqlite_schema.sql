@@ -0,0 +1,127 @@
+-- Local SQLite stand-in for the Azure SQL database (DB_BACKEND=sqlite).
+-- Mirrors the columns the data-access modules read and write; load with:
+--   sqlite3 portal.sqlite3 < sql/sqlite_schema.sql
+
+CREATE TABLE IF NOT EXISTS EMPLOYEES (
+    EmployeeID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FirstName TEXT,
+    LastName TEXT,
+    Department TEXT,
+    Role TEXT,
+    Gender TEXT,
+    Pword TEXT,
+    Email TEXT,
+    PhoneNumber TEXT,
+    Bio TEXT,
+    ManagerID INTEGER REFERENCES EMPLOYEES (EmployeeID),
+    VacationDays INTEGER DEFAULT 20,
+    SickDays INTEGER DEFAULT 10,
+    PersonalDays INTEGER DEFAULT 5,
+    OtherDays INTEGER DEFAULT 0,
+    Salary REAL
+);
+
+CREATE TABLE IF NOT EXISTS IT_TICKETS (
+    TicketID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EmployeeID INTEGER REFERENCES EMPLOYEES (EmployeeID),
+    TicketTitle TEXT,
+    TicketBody TEXT,
+    CreatedDate DATE,
+    TicketPriority TEXT,
+    [Status] TEXT,
+    TicketCategory TEXT
+);
+
+-- Same shape as sql/ticket_indexes.sql (SQLite has no INCLUDE)
+CREATE INDEX IF NOT EXISTS IX_IT_TICKETS_CreatedDate ON IT_TICKETS (CreatedDate DESC, TicketID DESC);
+CREATE INDEX IF NOT EXISTS IX_IT_TICKETS_Status_CreatedDate ON IT_TICKETS ([Status], CreatedDate DESC, TicketID DESC);
+CREATE INDEX IF NOT EXISTS IX_IT_TICKETS_Priority_CreatedDate ON IT_TICKETS (TicketPriority, CreatedDate DESC, TicketID DESC);
+CREATE INDEX IF NOT EXISTS IX_IT_TICKETS_Category_CreatedDate ON IT_TICKETS (TicketCategory, CreatedDate DESC, TicketID DESC);
+CREATE INDEX IF NOT EXISTS IX_IT_TICKETS_Employee_CreatedDate ON IT_TICKETS (EmployeeID, CreatedDate DESC, TicketID DESC);
+
+-- Same shape as sql/ticket_archive.sql
+CREATE TABLE IF NOT EXISTS IT_TICKETS_ARCHIVE (
+    TicketID INTEGER PRIMARY KEY,
+    EmployeeID INTEGER,
+    TicketTitle TEXT,
+    TicketBody TEXT,
+    CreatedDate DATE,
+    TicketPriority TEXT,
+    [Status] TEXT,
+    TicketCategory TEXT,
+    ArchivedDate TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS IX_IT_TICKETS_ARCHIVE_Employee_CreatedDate ON IT_TICKETS_ARCHIVE (EmployeeID, CreatedDate DESC, TicketID DESC);
+
+CREATE TABLE IF NOT EXISTS LEAVE_REQUESTS (
+    RequestID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EmployeeID INTEGER REFERENCES EMPLOYEES (EmployeeID),
+    LeaveType TEXT,
+    StartDate DATE,
+    EndDate DATE,
+    Days INTEGER,
+    Reason TEXT,
+    Status TEXT,
+    SubmittedDate TIMESTAMP,
+    ApprovedBy TEXT,
+    ApprovedDate TIMESTAMP
+);
+
+-- Same shape as sql/leave_indexes.sql (SQLite has no INCLUDE)
+CREATE INDEX IF NOT EXISTS IX_LEAVE_REQUESTS_Employee_StartDate ON LEAVE_REQUESTS (EmployeeID, StartDate, EndDate, [Status]);
+
+-- Same shape as sql/leave_ledger.sql; fill it with leave_ledger.reconcileLeaveLedger(repair=True)
+CREATE TABLE IF NOT EXISTS LEAVE_LEDGER (
+    EmployeeID INTEGER NOT NULL,
+    LeaveType TEXT NOT NULL,
+    LeaveYear INTEGER NOT NULL,
+    UsedDays INTEGER NOT NULL DEFAULT 0,
+    UpdatedDate TIMESTAMP,
+    PRIMARY KEY (EmployeeID, LeaveType, LeaveYear)
+);
+
+CREATE TABLE IF NOT EXISTS TIMESHEETS (
+    TimesheetID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EmployeeID INTEGER REFERENCES EMPLOYEES (EmployeeID),
+    WeekOf DATE,
+    HoursWorkedMonday REAL,
+    HoursWorkedTuesday REAL,
+    HoursWorkedWednesday REAL,
+    HoursWorkedThursday REAL,
+    HoursWorkedFriday REAL,
+    HoursWorkedSaturday REAL,
+    HoursWorkedTotal REAL,
+    Notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS QUIZZES (
+    QuizID INTEGER PRIMARY KEY AUTOINCREMENT,
+    QuizName TEXT,
+    Question1 TEXT,
+    Question2 TEXT,
+    Question3 TEXT,
+    Question4 TEXT,
+    Question5 TEXT,
+    Question6 TEXT,
+    Question7 TEXT,
+    Question8 TEXT,
+    Question9 TEXT,
+    Question10 TEXT,
+    AnswerString TEXT
+);
+
+CREATE TABLE IF NOT EXISTS COURSES (
+    CourseID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CourseName TEXT,
+    Quiz1ID INTEGER REFERENCES QUIZZES (QuizID),
+    Quiz2ID INTEGER REFERENCES QUIZZES (QuizID),
+    Quiz3ID INTEGER REFERENCES QUIZZES (QuizID),
+    Description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS COURSE_ENROLLMENT (
+    EnrollmentID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CourseID INTEGER REFERENCES COURSES (CourseID),
+    EmployeeID INTEGER REFERENCES EMPLOYEES (EmployeeID),
+    Level INTEGER DEFAULT 0
+);
@@ -0,0 +1,22 @@
+-- Archive table for closed tickets (ticket_archive.archiveClosedTickets).
+-- Same columns as IT_TICKETS plus ArchivedDate. TicketID keeps the original value,
+-- so it is a plain key rather than an IDENTITY, and there are no foreign keys or
+-- triggers, which OUTPUT ... INTO requires of its target.
+-- Safe to re-run: the table and index are only created if they are missing.
+
+IF OBJECT_ID('IT_TICKETS_ARCHIVE') IS NULL
+    CREATE TABLE IT_TICKETS_ARCHIVE (
+        TicketID INT NOT NULL PRIMARY KEY,
+        EmployeeID INT NULL,
+        TicketTitle NVARCHAR(255) NULL,
+        TicketBody NVARCHAR(MAX) NULL,
+        CreatedDate DATE NULL,
+        TicketPriority NVARCHAR(50) NULL,
+        [Status] NVARCHAR(50) NULL,
+        TicketCategory NVARCHAR(100) NULL,
+        ArchivedDate DATETIME2 NOT NULL
+    );
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_IT_TICKETS_ARCHIVE_Employee_CreatedDate' AND object_id = OBJECT_ID('IT_TICKETS_ARCHIVE'))
+    CREATE INDEX IX_IT_TICKETS_ARCHIVE_Employee_CreatedDate
+        ON IT_TICKETS_ARCHIVE (EmployeeID, CreatedDate DESC, TicketID DESC);
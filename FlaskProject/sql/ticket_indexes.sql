@@ -0,0 +1,30 @@
+-- Indexes behind the ticket listing/query API (tickets.ticketListing).
+-- Each filterable column leads an index that ends in (CreatedDate DESC, TicketID DESC),
+-- so the default newest-first keyset page is a single range seek. TicketBody is left
+-- out of INCLUDE to keep the indexes narrow; it is only read for the rows on the page.
+-- Safe to re-run: each index is only created if it is missing.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_IT_TICKETS_CreatedDate' AND object_id = OBJECT_ID('IT_TICKETS'))
+    CREATE INDEX IX_IT_TICKETS_CreatedDate
+        ON IT_TICKETS (CreatedDate DESC, TicketID DESC)
+        INCLUDE (EmployeeID, TicketTitle, TicketPriority, [Status], TicketCategory);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_IT_TICKETS_Status_CreatedDate' AND object_id = OBJECT_ID('IT_TICKETS'))
+    CREATE INDEX IX_IT_TICKETS_Status_CreatedDate
+        ON IT_TICKETS ([Status], CreatedDate DESC, TicketID DESC)
+        INCLUDE (EmployeeID, TicketTitle, TicketPriority, TicketCategory);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_IT_TICKETS_Priority_CreatedDate' AND object_id = OBJECT_ID('IT_TICKETS'))
+    CREATE INDEX IX_IT_TICKETS_Priority_CreatedDate
+        ON IT_TICKETS (TicketPriority, CreatedDate DESC, TicketID DESC)
+        INCLUDE (EmployeeID, TicketTitle, [Status], TicketCategory);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_IT_TICKETS_Category_CreatedDate' AND object_id = OBJECT_ID('IT_TICKETS'))
+    CREATE INDEX IX_IT_TICKETS_Category_CreatedDate
+        ON IT_TICKETS (TicketCategory, CreatedDate DESC, TicketID DESC)
+        INCLUDE (EmployeeID, TicketTitle, TicketPriority, [Status]);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_IT_TICKETS_Employee_CreatedDate' AND object_id = OBJECT_ID('IT_TICKETS'))
+    CREATE INDEX IX_IT_TICKETS_Employee_CreatedDate
+        ON IT_TICKETS (EmployeeID, CreatedDate DESC, TicketID DESC)
+        INCLUDE (TicketTitle, TicketPriority, [Status], TicketCategory);
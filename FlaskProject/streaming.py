@@ -0,0 +1,97 @@
+import os
+
+from flask import Response, request, stream_with_context
+
+from dbpool import getConnection, DB_ERRORS
+from model import dumps
+
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def streamFormat():
+    """'json' or 'ndjson' if the request asked for a streamed response, else None.
+
+    Streaming is requested with `?stream=json` / `?stream=ndjson` (`?stream=1` means
+    json), or by sending `Accept: application/x-ndjson`.
+    """
+    value = request.args.get('stream', '').lower()
+    if value in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if value in ('1', 'true', 'json'):
+        return 'json'
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    return None
+
+def iterListing(listing, page, batchSize=STREAM_BATCH_SIZE):
+    """Yield the models of a listing query batch by batch with fetchmany.
+
+    Only one batch of rows is held at a time. The pooled connection stays checked
+    out until the generator finishes or is closed (e.g. the client disconnects).
+    """
+    query, params = listing.buildQuery(page)
+    remaining = page.limit
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, tuple(params))
+            build = listing.mapper.builder(cursor.description)
+            while remaining is None or remaining > 0:
+                rows = cursor.fetchmany(batchSize if remaining is None else min(batchSize, remaining))
+                if not rows:
+                    break
+                if remaining is not None:
+                    remaining -= len(rows)
+                for row in rows:
+                    yield build(row)
+        finally:
+            cursor.close()
+
+def _serializer(fields):
+    if fields is None:
+        return lambda model: model.toJSON()
+    return lambda model: dumps(model.project(fields))
+
+def _buffered(pieces, batchSize=STREAM_BATCH_SIZE):
+    # One chunk per batch of rows rather than one per row keeps the write overhead down
+    buffer = []
+    for piece in pieces:
+        buffer.append(piece)
+        if len(buffer) >= batchSize:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+def _jsonPieces(key, models, serialize):
+    yield '{"' + key + '":['
+    separator = ''
+    try:
+        for model in models:
+            yield separator + serialize(model)
+            separator = ','
+    except DB_ERRORS as e:
+        # Headers are already sent, so the only signal left is a truncated (invalid) document
+        print(f"Error streaming {key}: ", e)
+        return
+    yield ']}'
+
+def _ndjsonPieces(key, models, serialize):
+    try:
+        for model in models:
+            yield serialize(model) + '\n'
+    except DB_ERRORS as e:
+        print(f"Error streaming {key}: ", e)
+        yield '{"error":"Failed to stream ' + key + '"}\n'
+
+def streamList(key, listing):
+    """Stream every row matching the request's filters/sort/fields as chunked JSON or NDJSON"""
+    format = streamFormat()
+    page = listing.parse(request.args, defaultLimit=None)
+    serialize = _serializer(page.fields)
+    models = iterListing(listing, page)
+    if format == 'ndjson':
+        return Response(stream_with_context(_buffered(_ndjsonPieces(key, models, serialize))), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(_buffered(_jsonPieces(key, models, serialize))), mimetype='application/json')
@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+import os
+
+from cache import TTLCache
+from dbconnect import getCachedEmployeesByIDs
+from dbpool import getConnection, DB_ERRORS
+from intervals import IntervalIndex
+from leave_management import ACTIVE_LEAVE_STATUSES, leaveRequestMapper
+from org_hierarchy import orgHierarchy
+from signals import leaveRequestChanged
+
+CALENDAR_STATUSES = ACTIVE_LEAVE_STATUSES
+TEAM_CALENDAR_MAX_DAYS = int(os.getenv('TEAM_CALENDAR_MAX_DAYS', 366))
+TEAM_CALENDAR_DEFAULT_DAYS = 28
+
+# (scope, firstMonth, lastMonth) -> IntervalIndex of the scope's leave in those whole months.
+# Windows are widened to calendar months so the "next few weeks" views everyone opens
+# share entries; each request then picks its exact window out of the index.
+calendarCache = TTLCache('teamCalendar', maxSize=256, ttl=float(os.getenv('TEAM_CALENDAR_CACHE_TTL', 300)))
+
+# Reason is left out on purpose: the calendar shows who is away, not why
+CALENDAR_COLUMNS = ['lr.RequestID', 'lr.EmployeeID', 'lr.LeaveType', 'lr.StartDate', 'lr.EndDate', 'lr.Days', 'lr.Status']
+CALENDAR_FIELDS = ('requestId', 'employeeId', 'leaveType', 'startDate', 'endDate', 'days', 'status')
+
+
+def _monthStart(day):
+    return day.replace(day=1)
+
+def _monthEnd(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def _asDate(value):
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+
+def _teamMembers(managerId=None, department=None, maxDepth=None):
+    """Employee IDs in scope, or None if the manager doesn't exist"""
+    if managerId is not None:
+        if not orgHierarchy.contains(managerId):
+            return None
+        return [employeeId for employeeId, _, _ in orgHierarchy.iterSubtree(managerId, maxDepth)]
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT EmployeeID FROM EMPLOYEES WHERE Department = ?", (department,))
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return ids
+
+def _queryOverlapping(employeeIds, start, end):
+    """Approved and pending leave of these employees overlapping [start, end], one query per 1000 employees.
+
+    StartDate <= end is the seek range of IX_LEAVE_REQUESTS_Employee_StartDate; EndDate >= start
+    is checked from the index's INCLUDE columns.
+    """
+    leaveRequests = []
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        for offset in range(0, len(employeeIds), 1000):
+            chunk = employeeIds[offset:offset + 1000]
+            query = f"""
+            SELECT {', '.join(CALENDAR_COLUMNS)}
+            FROM LEAVE_REQUESTS lr
+            WHERE lr.EmployeeID IN ({', '.join('?' * len(chunk))})
+              AND lr.Status IN ({', '.join('?' * len(CALENDAR_STATUSES))})
+              AND lr.StartDate <= ? AND lr.EndDate >= ?
+            """
+            cursor.execute(query, (*chunk, *CALENDAR_STATUSES, end, start))
+            leaveRequests.extend(leaveRequestMapper.mapRows(cursor, cursor.fetchall()))
+        cursor.close()
+    return leaveRequests
+
+def _calendarIndex(scope, employeeIds, start, end):
+    key = (scope, _monthStart(start), _monthEnd(end))
+
+    def load():
+        leaveRequests = _queryOverlapping(employeeIds, key[1], key[2])
+        return IntervalIndex((_asDate(lr.startDate), _asDate(lr.endDate), lr) for lr in leaveRequests
+                             if lr.startDate is not None and lr.endDate is not None)
+
+    return calendarCache.getOrLoad(key, load)
+
+def getTeamCalendar(start, end, managerId=None, department=None, maxDepth=None, statuses=CALENDAR_STATUSES):
+    """Leave overlapping [start, end] for a manager's reports or a department.
+
+    Returns {'teamSize', 'leaveRequests': [...], 'days': [{'date', 'approved', 'pending'}]},
+    or None if the manager doesn't exist. 'days' counts, for each day of the window,
+    the requests covering it, so capacity views don't have to intersect dates themselves.
+    """
+    try:
+        members = _teamMembers(managerId, department, maxDepth)
+        if members is None:
+            return None
+        scope = ('manager', managerId, maxDepth) if managerId is not None else ('department', department)
+        index = _calendarIndex(scope, members, start, end)
+    except DB_ERRORS as e:
+        print("Error fetching team calendar: ", e)
+        raise
+
+    # A cached index can predate a reorg: people who left the team are dropped here,
+    # people who joined show up once the entry expires
+    memberSet = set(members)
+    leaveRequests = [lr for lr in index.overlapping(start, end) if lr.employeeId in memberSet and lr.status in statuses]
+
+    employeeIds = list({leaveRequest.employeeId for leaveRequest in leaveRequests})
+    employees = dict(zip(employeeIds, getCachedEmployeesByIDs(employeeIds)))
+    items = []
+    for leaveRequest in leaveRequests:
+        employee = employees.get(leaveRequest.employeeId)
+        item = leaveRequest.project(CALENDAR_FIELDS)
+        item['employeeName'] = f"{employee.firstName} {employee.lastName}" if employee is not None else None
+        items.append(item)
+
+    length = (end - start).days + 1
+    counts = {status: [0] * (length + 1) for status in statuses}
+    for leaveRequest in leaveRequests:
+        # Difference array: +1 on the first covered day of the window, -1 after the last
+        first = max(_asDate(leaveRequest.startDate), start)
+        last = min(_asDate(leaveRequest.endDate), end)
+        counts[leaveRequest.status][(first - start).days] += 1
+        counts[leaveRequest.status][(last - start).days + 1] -= 1
+    running = {status: 0 for status in statuses}
+    days = []
+    for offset in range(length):
+        day = {'date': (start + timedelta(days=offset)).isoformat()}
+        for status in statuses:
+            running[status] += counts[status][offset]
+            day[status] = running[status]
+        days.append(day)
+
+    return {'teamSize': len(members), 'leaveRequests': items, 'days': days}
+
+
+def _onLeaveRequestChanged(**_):
+    calendarCache.clear()
+
+leaveRequestChanged.connect(_onLeaveRequestChanged)
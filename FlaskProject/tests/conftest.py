@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+# The data-access modules read their settings at import time, so point them at a
+# throwaway SQLite stand-in before any of them is imported
+_dataDir = tempfile.mkdtemp(prefix='portal-tests-')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['DB_SQLITE_PATH'] = os.path.join(_dataDir, 'portal.sqlite3')
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import pytest
+
+import cache
+import dbpool
+import leave_ledger
+from org_hierarchy import orgHierarchy
+
+# (EmployeeID, FirstName, LastName, Department, ManagerID)
+EMPLOYEES = [
+    (1, 'Ada', 'Lovelace', 'IT', None),
+    (2, 'Grace', 'Hopper', 'IT', 1),
+    (3, 'Alan', 'Turing', 'IT', 1),
+    (4, 'Edsger', 'Dijkstra', 'IT', 1),
+    (5, 'Barbara', 'Liskov', 'IT', 2),
+]
+
+# (RequestID, EmployeeID, LeaveType, StartDate, EndDate, Days, Status)
+LEAVE_REQUESTS = [
+    (1, 2, 'vacation', '2026-03-02', '2026-03-06', 5, 'approved'),
+    (2, 3, 'sick', '2026-03-05', '2026-03-05', 1, 'pending'),
+    (3, 4, 'personal', '2026-04-01', '2026-04-02', 2, 'pending'),
+    (4, 5, 'vacation', '2026-05-01', '2026-05-03', 3, 'rejected'),
+]
+
+PRIORITIES = ('low', 'medium', 'high')
+STATUSES = ('open', 'In Progress', 'closed')
+
+
+def _seed(connection):
+    connection.executemany(
+        "INSERT INTO EMPLOYEES (EmployeeID, FirstName, LastName, Department, ManagerID) VALUES (?, ?, ?, ?, ?)",
+        EMPLOYEES)
+    connection.executemany(
+        "INSERT INTO LEAVE_REQUESTS (RequestID, EmployeeID, LeaveType, StartDate, EndDate, Days, Reason, Status, SubmittedDate)"
+        " VALUES (?, ?, ?, ?, ?, ?, 'seed', ?, '2026-01-15 09:00:00')",
+        LEAVE_REQUESTS)
+    # Several tickets share a priority and a created date so keyset paging has ties to break
+    connection.executemany(
+        "INSERT INTO IT_TICKETS (TicketID, EmployeeID, TicketTitle, TicketBody, CreatedDate, TicketPriority, [Status], TicketCategory)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(ticketId, 2 + ticketId % 4, f'Ticket {ticketId}', f'body of ticket {ticketId}', f'2026-02-{1 + ticketId // 3:02d}',
+          PRIORITIES[ticketId % 3], STATUSES[ticketId % 3], 'Hardware' if ticketId % 2 else 'Software')
+         for ticketId in range(1, 14)])
+
+
+@pytest.fixture
+def db():
+    """A freshly created and seeded stand-in database, with every in-process cache emptied"""
+    if dbpool._pool is not None:
+        dbpool._pool.close()
+        dbpool._pool = None
+    path = dbpool.DB_SQLITE_PATH
+    if os.path.exists(path):
+        os.remove(path)
+    with open(os.path.join(PROJECT_DIR, 'sql', 'sqlite_schema.sql')) as schema:
+        connection = sqlite3.connect(path)
+        connection.executescript(schema.read())
+        _seed(connection)
+        connection.commit()
+        connection.close()
+
+    for registered in cache._caches.values():
+        registered.clear()
+    orgHierarchy._loadedAt = None
+    leave_ledger._ledgerReady = False
+    yield path
+    if dbpool._pool is not None:
+        dbpool._pool.close()
+        dbpool._pool = None
@@ -0,0 +1,76 @@
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache('test-expiry', ttl=10)
+    entries.set('a', 1)
+    clock[0] += 9.9
+    assert entries.get('a') == 1
+    clock[0] += 0.2
+    assert entries.get('a') is None
+    assert entries.stats()['expirations'] == 1
+
+
+def test_get_or_load_caches_until_invalidated(clock):
+    entries = TTLCache('test-load', ttl=10)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return len(loads)
+
+    assert entries.getOrLoad('k', load) == 1
+    assert entries.getOrLoad('k', load) == 1
+    entries.invalidate('k')
+    assert entries.getOrLoad('k', load) == 2
+    assert len(loads) == 2
+
+
+def test_load_racing_with_invalidation_is_not_stored(clock):
+    entries = TTLCache('test-race', ttl=10)
+
+    def load():
+        # A write lands while the value is being read
+        entries.invalidate('k')
+        return 'stale'
+
+    assert entries.getOrLoad('k', load) == 'stale'
+    assert entries.get('k') is None
+
+
+def test_none_is_not_cached(clock):
+    entries = TTLCache('test-none', ttl=10)
+    assert entries.getOrLoad('k', lambda: None) is None
+    assert entries.getOrLoad('k', lambda: 'loaded') == 'loaded'
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache('test-lru', maxSize=2, ttl=10)
+    entries.set('a', 1)
+    entries.set('b', 2)
+    entries.get('a')
+    entries.set('c', 3)
+    assert entries.get('b') is None
+    assert entries.get('a') == 1
+    assert entries.stats()['evictions'] == 1
+
+
+def test_discard_where_and_clear(clock):
+    entries = TTLCache('test-discard', ttl=10)
+    entries.set('a', [1, 2])
+    entries.set('b', [3])
+    entries.discardWhere(lambda value: 2 in value)
+    assert entries.get('a') is None
+    assert entries.get('b') == [3]
+    entries.clear()
+    assert entries.get('b') is None
@@ -0,0 +1,62 @@
+import sqlite3
+import time
+
+import pytest
+
+from dbpool import ConnectionPool, PoolTimeout
+
+
+def memoryPool(**options):
+    return ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False), **options)
+
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    pool = memoryPool(maxSize=1, timeout=0.05)
+    connection = pool.checkout()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.checkout()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()['timeouts'] == 1
+
+    pool.release(connection)
+    assert pool.checkout() is connection
+
+
+def test_released_connection_is_reused():
+    pool = memoryPool(maxSize=2)
+    connection = pool.checkout()
+    pool.release(connection)
+    assert pool.checkout() is connection
+    assert pool.stats()['created'] == 1
+
+
+def test_connection_is_recycled_after_max_lifetime():
+    pool = memoryPool(maxSize=1, maxLifetime=0.05)
+    first = pool.checkout()
+    pool.release(first)
+    time.sleep(0.06)
+    second = pool.checkout()
+    assert second is not first
+    stats = pool.stats()
+    assert stats['recycled'] == 1
+    assert stats['size'] == 1
+
+
+def test_release_rolls_back_uncommitted_work():
+    pool = memoryPool(maxSize=1)
+    connection = pool.checkout()
+    connection.execute("CREATE TABLE t (x INTEGER)")
+    connection.commit()
+    connection.execute("INSERT INTO t VALUES (1)")
+    pool.release(connection)
+
+    connection = pool.checkout()
+    assert connection.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_closed_pool_refuses_checkouts():
+    pool = memoryPool()
+    pool.close()
+    with pytest.raises(PoolTimeout):
+        pool.checkout()
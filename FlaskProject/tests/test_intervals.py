@@ -0,0 +1,25 @@
+import random
+
+from intervals import IntervalIndex
+
+
+def test_overlapping_matches_a_scan():
+    generator = random.Random(3)
+    for _ in range(200):
+        items = []
+        for value in range(generator.randrange(40)):
+            start = generator.randrange(100)
+            items.append((start, start + generator.randrange(20), value))
+        index = IntervalIndex(items)
+        assert len(index) == len(items)
+
+        for _ in range(10):
+            start = generator.randrange(-10, 120)
+            end = start + generator.randrange(30)
+            expected = [value for itemStart, itemEnd, value in sorted(items, key=lambda item: item[0])
+                        if itemStart <= end and itemEnd >= start]
+            assert sorted(index.overlapping(start, end)) == sorted(expected)
+
+
+def test_empty_index():
+    assert IntervalIndex().overlapping(0, 10) == []
@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+import random
+
+import pytest
+
+import leave_management
+from dbpool import getConnection
+from leave_ledger import APPROVED_LEAVE_SOURCE, reconcileLeaveLedger
+from leave_management import (LeaveRequestError, _leaveBalanceQuery, _teamCoverage, decideLeaveRequests,
+                              getLeaveBalances, getLeaveRequests, submitLeaveRequest, approveLeaveRequest)
+
+
+def recomputedBalances(employeeIds):
+    """Balances straight from the approved requests, bypassing the ledger"""
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(_leaveBalanceQuery(len(employeeIds), APPROVED_LEAVE_SOURCE), tuple(employeeIds))
+        rows = cursor.fetchall()
+    return {row.EmployeeID: (row.VacationDays - (row.UsedVacation or 0), row.SickDays - (row.UsedSick or 0)) for row in rows}
+
+
+def test_overlap_with_own_request_is_refused(db):
+    with pytest.raises(LeaveRequestError) as raised:
+        submitLeaveRequest(2, 'vacation', '2026-03-04', '2026-03-09', 4, 'again')
+    assert [conflict['requestId'] for conflict in raised.value.conflicts] == [1]
+    assert raised.value.coverage is None
+
+    leaveRequest, _ = submitLeaveRequest(2, 'vacation', '2026-03-07', '2026-03-08', 2, 'weekend')
+    assert leaveRequest is not None
+    assert leaveRequest.status == 'pending'
+
+
+def test_rejected_leave_does_not_conflict(db):
+    leaveRequest, _ = submitLeaveRequest(5, 'vacation', '2026-05-02', '2026-05-02', 1, 'retry')
+    assert leaveRequest is not None
+
+
+def test_coverage_counts_teammates_away(db):
+    # Employees 2 (approved) and 3 (pending) are both out on 2026-03-05
+    leaveRequest, coverage = submitLeaveRequest(4, 'personal', '2026-03-05', '2026-03-05', 1, 'errand')
+    assert leaveRequest is not None
+    assert coverage == {'teamSize': 3, 'limit': 1, 'peakOut': 3, 'peakDate': '2026-03-05', 'exceeded': True}
+
+
+def test_coverage_reject_policy_refuses(db, monkeypatch):
+    monkeypatch.setattr(leave_management, 'LEAVE_COVERAGE_POLICY', 'reject')
+    with pytest.raises(LeaveRequestError) as raised:
+        submitLeaveRequest(4, 'personal', '2026-03-05', '2026-03-05', 1, 'errand')
+    assert raised.value.coverage['exceeded']
+    assert raised.value.conflicts == []
+
+
+def test_over_long_range_is_refused_before_querying(db, monkeypatch):
+    monkeypatch.setattr(leave_management, 'LEAVE_MAX_REQUEST_DAYS', 10)
+    with pytest.raises(LeaveRequestError) as raised:
+        submitLeaveRequest(4, 'vacation', '2026-06-01', '2026-06-11', 11, 'long')
+    assert raised.value.conflicts == [] and raised.value.coverage is None
+    leaveRequest, _ = submitLeaveRequest(4, 'vacation', '2026-06-01', '2026-06-10', 10, 'long')
+    assert leaveRequest is not None
+
+
+class _Leave:
+    def __init__(self, employeeId, startDate, endDate):
+        self.employeeId = employeeId
+        self.startDate = startDate
+        self.endDate = endDate
+
+
+def test_team_coverage_sweep_matches_day_by_day_count():
+    generator = random.Random(7)
+    origin = date(2026, 1, 1)
+    for _ in range(300):
+        start = origin + timedelta(days=generator.randrange(30))
+        end = start + timedelta(days=generator.randrange(15))
+        teammates = list(range(2, 2 + generator.randrange(1, 6)))
+        leave = []
+        for _ in range(generator.randrange(12)):
+            first = origin + timedelta(days=generator.randrange(50))
+            leave.append(_Leave(generator.choice(teammates), first, first + timedelta(days=generator.randrange(10))))
+
+        coverage = _teamCoverage(start, end, teammates, leave)
+        day, peak = start, 0
+        while day <= end:
+            out = 1 + len({lr.employeeId for lr in leave if lr.startDate <= day <= lr.endDate})
+            peak = max(peak, out)
+            day += timedelta(days=1)
+        assert coverage['peakOut'] == peak
+
+
+def test_bulk_decision_reports_each_request(db):
+    results = decideLeaveRequests([2, 3, 999, '4', 2], 'approved', 1)
+    assert [result['result'] for result in results] == ['updated', 'updated', 'not_found', 'invalid', 'invalid']
+    assert results[0]['leaveRequest']['status'] == 'approved'
+    assert results[0]['leaveRequest']['employeeName'] == 'Alan Turing'
+
+
+def test_ledger_balances_match_recompute(db):
+    ids = [1, 2, 3, 4, 5]
+    # The first read fills the empty ledger from the approved requests
+    balances = getLeaveBalances(ids)
+    assert balances[2].vacationDays == 15
+
+    approveLeaveRequest(2, 1)
+    decideLeaveRequests([3, 4], 'approved', 1)
+    leave_management.rejectLeaveRequest(1, 1)
+    submitLeaveRequest(5, 'sick', '2026-07-01', '2026-07-02', 2, 'flu')
+    decideLeaveRequests([5], 'approved', 1)
+
+    balances = getLeaveBalances(ids)
+    expected = recomputedBalances(ids)
+    assert {employeeId: (balance.vacationDays, balance.sickDays) for employeeId, balance in balances.items()} == expected
+    assert balances[2].vacationDays == 20
+    assert balances[5].vacationDays == 17 and balances[5].sickDays == 8
+    assert reconcileLeaveLedger()['mismatches'] == []
+
+
+def test_listing_joins_employee_names(db):
+    names = {leaveRequest.requestId: leaveRequest.employeeName for leaveRequest in getLeaveRequests()}
+    assert names[1] == 'Grace Hopper'
+    assert names[4] == 'Barbara Liskov'
@@ -0,0 +1,76 @@
+from datetime import date, datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from dbconnect import getSubtreePage
+from pagination import PaginationError, decodeCursor, encodeCursor, parseLimit
+import tickets
+
+
+def test_cursor_round_trips_typed_values():
+    values = [date(2026, 3, 2), 42]
+    assert decodeCursor(encodeCursor(values)) == values
+    values = [datetime(2026, 3, 2, 9, 30, 15), 'x']
+    assert decodeCursor(encodeCursor(values)) == values
+    assert decodeCursor(encodeCursor([None, 7])) == [None, 7]
+    assert decodeCursor(encodeCursor({'offset': 100})) == {'offset': 100}
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor!', 'e30', encodeCursor([1, 2, 3]), encodeCursor('x')])
+def test_listing_rejects_malformed_cursors(cursor):
+    with pytest.raises(PaginationError):
+        tickets.ticketListing.page(after=cursor)
+
+
+def test_parse_limit():
+    assert parseLimit(None) == 100
+    assert parseLimit('10') == 10
+    assert parseLimit('999999') == 5000
+    for value in ('0', 'ten'):
+        with pytest.raises(PaginationError):
+            parseLimit(value)
+
+
+@pytest.mark.parametrize('sort', ['priority', '-priority', 'createdDate', '-createdDate', 'ticketId'])
+def test_keyset_pages_cover_every_ticket_once_in_order(db, sort):
+    seen = []
+    after = None
+    while True:
+        args = MultiDict({'sort': sort, 'limit': '4'})
+        if after:
+            args['after'] = after
+        page, after = tickets.getTicketsPage(args)
+        assert len(page) <= 4
+        seen.extend(page)
+        if after is None:
+            break
+
+    assert sorted(ticket.ticketId for ticket in seen) == list(range(1, 14))
+    key = sort.lstrip('-')
+    descending = sort.startswith('-')
+    # Ties on the sort key are broken by TicketID in the same direction
+    expected = sorted(seen, key=lambda t: (getattr(t, key), t.ticketId), reverse=descending)
+    assert [t.ticketId for t in seen] == [t.ticketId for t in expected]
+
+
+def test_ticket_filters_are_applied(db):
+    page, _ = tickets.getTicketsPage(MultiDict([('priority', 'high'), ('status', 'closed'), ('limit', '50')]))
+    assert page
+    assert all(t.priority == 'high' and t.status == 'closed' for t in page)
+
+
+def test_subtree_pages_use_offset_cursors(db):
+    items, after = getSubtreePage(1, view='ids', limit=2)
+    assert [item['EmployeeID'] for item in items] == [2, 3]
+    assert decodeCursor(after) == {'offset': 2}
+    items, after = getSubtreePage(1, view='ids', limit=2, after=after)
+    assert [item['EmployeeID'] for item in items] == [4, 5]
+    assert after is None
+
+
+@pytest.mark.parametrize('cursor', [encodeCursor([1, 2]), encodeCursor('x'), encodeCursor({'offset': -1}),
+                                    encodeCursor({'offset': True}), encodeCursor({})])
+def test_subtree_rejects_cursors_that_are_not_offsets(db, cursor):
+    with pytest.raises(PaginationError):
+        getSubtreePage(1, after=cursor)
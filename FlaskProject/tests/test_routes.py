@@ -0,0 +1,68 @@
+import pytest
+
+# app.py pulls in the Azure OpenAI and Search clients at import time
+pytest.importorskip('openai')
+pytest.importorskip('azure.search.documents')
+
+import dbpool
+from dbpool import PoolTimeout
+
+
+@pytest.fixture
+def client(db):
+    from app import app
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def test_overlapping_leave_request_is_a_conflict(client):
+    response = client.post('/api/leave-requests', json={
+        'employeeId': 2, 'leaveType': 'vacation', 'startDate': '2026-03-04', 'endDate': '2026-03-09',
+        'days': 4, 'reason': 'again'})
+    assert response.status_code == 409
+    assert [conflict['requestId'] for conflict in response.json['conflicts']] == [1]
+
+    response = client.post('/api/leave-requests', json={
+        'employeeId': 4, 'leaveType': 'personal', 'startDate': '2026-03-05', 'endDate': '2026-03-05',
+        'days': 1, 'reason': 'errand'})
+    assert response.status_code == 201
+    assert response.json['coverage']['exceeded']
+
+
+def test_ticket_listing_follows_next_cursor(client):
+    seen = []
+    url = '/api/tickets?sort=priority&limit=5'
+    while url:
+        body = client.get(url).json
+        seen += [ticket['ticketId'] for ticket in body['tickets']]
+        url = f"/api/tickets?sort=priority&limit=5&after={body['nextCursor']}" if body.get('nextCursor') else None
+    assert sorted(seen) == list(range(1, 14))
+    assert client.get('/api/tickets?after=garbage!').status_code == 400
+
+
+def test_bulk_ticket_update(client):
+    response = client.put('/api/tickets/bulk-update', json={'updates': [
+        {'ticketId': 1, 'status': 'closed'}, {'ticketId': 999, 'status': 'closed'}, {'ticketId': 'x'}]})
+    assert response.status_code == 200
+    assert (response.json['updated'], response.json['notFound'], response.json['invalid']) == (1, 1, 1)
+
+
+def test_bulk_leave_decision(client):
+    response = client.put('/api/leave-requests/bulk-decision', json={
+        'requestIds': [2, 3, 999, 'x'], 'decision': 'approve', 'approvedBy': 1})
+    assert response.status_code == 200
+    assert (response.json['updated'], response.json['notFound'], response.json['invalid']) == (2, 1, 1)
+    assert client.put('/api/leave-requests/bulk-decision', json={'requestIds': [2], 'decision': 'maybe',
+                                                                  'approvedBy': 1}).status_code == 400
+
+
+def test_pool_exhaustion_is_service_unavailable(client, monkeypatch):
+    class ExhaustedPool:
+        def checkout(self):
+            raise PoolTimeout("No database connection available")
+
+    monkeypatch.setattr(dbpool, 'getPool', lambda: ExhaustedPool())
+    response = client.get('/api/tickets')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(dbpool.POOL_RETRY_AFTER)
@@ -0,0 +1,35 @@
+import tickets
+
+
+def test_bulk_update_reports_each_ticket(db):
+    before = {ticketId: tickets.getTicketById(ticketId).status for ticketId in (3, 4)}
+    results = tickets.bulkUpdateTickets([
+        {'ticketId': 1, 'status': 'closed'},
+        {'ticketId': 2, 'status': 'closed', 'priority': 'high'},
+        {'ticketId': 999, 'status': 'closed'},
+        {'ticketId': '3', 'status': 'closed'},
+        {'ticketId': 1, 'priority': 'low'},
+        {'ticketId': 4},
+        'not an update',
+    ])
+
+    assert [result['result'] for result in results] == [
+        'updated', 'updated', 'not_found', 'invalid', 'invalid', 'invalid', 'invalid']
+    assert results[0]['ticket']['status'] == 'closed'
+    assert results[1]['ticket']['priority'] == 'high'
+    assert results[4]['error'] == 'Duplicate ticketId'
+
+    assert tickets.getTicketById(1).status == 'closed'
+    assert tickets.getTicketById(2).priority == 'high'
+    # Rejected entries change nothing
+    assert {ticketId: tickets.getTicketById(ticketId).status for ticketId in (3, 4)} == before
+
+
+def test_bulk_update_invalidates_cached_employee_tickets(db):
+    employeeId = tickets.getTicketById(1).employeeId
+    before = tickets.getCachedTicketsByEmployeeId(employeeId)
+    assert any(ticket.ticketId == 1 and ticket.status != 'closed' for ticket in before)
+
+    tickets.bulkUpdateTickets([{'ticketId': 1, 'status': 'closed'}])
+    after = tickets.getCachedTicketsByEmployeeId(employeeId)
+    assert [ticket.status for ticket in after if ticket.ticketId == 1] == ['closed']
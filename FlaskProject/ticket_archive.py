@@ -0,0 +1,175 @@
+from datetime import date, timedelta
+import os
+import threading
+import time
+
+from dbpool import getConnection, usingSqlite, DB_ERRORS
+from signals import ticketChanged
+from sla import CLOSED_STATUSES
+from tickets import TICKET_COLUMNS, TICKET_RETURNING, invalidateEmployeeTickets, ticketMapper
+
+ARCHIVE_TABLE = 'IT_TICKETS_ARCHIVE'
+# Closed tickets created more than this many days ago are moved to the archive
+TICKET_ARCHIVE_AFTER_DAYS = int(os.getenv('TICKET_ARCHIVE_AFTER_DAYS', 180))
+TICKET_ARCHIVE_BATCH_SIZE = int(os.getenv('TICKET_ARCHIVE_BATCH_SIZE', 500))
+# Seconds between background archival passes; 0 (the default) leaves archival to explicit runs
+TICKET_ARCHIVE_INTERVAL = float(os.getenv('TICKET_ARCHIVE_INTERVAL', 0))
+# Application lock that keeps archival passes from different processes from overlapping
+ARCHIVE_LOCK = 'IT_TICKETS_ARCHIVE'
+
+_ARCHIVABLE = f"LOWER([Status]) IN ({', '.join('?' * len(CLOSED_STATUSES))}) AND CreatedDate < ?"
+
+
+def _archiveBatch(cursor, cutoff, batchSize):
+    """Move up to batchSize archivable tickets and return them. The caller commits."""
+    params = (*CLOSED_STATUSES, cutoff)
+    if usingSqlite():
+        # No DELETE TOP / OUTPUT INTO here: pick the IDs, copy, then delete those same rows
+        cursor.execute(f"SELECT TicketID FROM IT_TICKETS WHERE {_ARCHIVABLE} LIMIT ?", (*params, batchSize))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+        inList = ', '.join('?' * len(ids))
+        cursor.execute(f"""
+        INSERT INTO {ARCHIVE_TABLE} ({TICKET_COLUMNS}, ArchivedDate)
+        SELECT {TICKET_COLUMNS}, CURRENT_TIMESTAMP FROM IT_TICKETS WHERE TicketID IN ({inList})
+        """, ids)
+        cursor.execute(f"DELETE FROM IT_TICKETS WHERE TicketID IN ({inList}) RETURNING {TICKET_COLUMNS}", ids)
+        return ticketMapper.mapRows(cursor, cursor.fetchall())
+
+    # One statement: the rows are deleted, written to the archive and returned together
+    deleted = ', '.join(f"DELETED.{column}" for column in TICKET_RETURNING)
+    cursor.execute(f"""
+    DELETE TOP (?) FROM IT_TICKETS
+    OUTPUT {deleted}, SYSDATETIME() INTO {ARCHIVE_TABLE} ({TICKET_COLUMNS}, ArchivedDate)
+    OUTPUT {deleted}
+    WHERE {_ARCHIVABLE}
+    """, (batchSize, *params))
+    return ticketMapper.mapRows(cursor, cursor.fetchall())
+
+def _acquireArchiveLock(cursor):
+    """Take the archival lock for this connection's session; False if another process holds it"""
+    if usingSqlite():
+        # The stand-in is a single local process
+        return True
+    cursor.execute("""
+    SET NOCOUNT ON;
+    DECLARE @result INT;
+    EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Session', @LockTimeout = 0;
+    SELECT @result
+    """, (ARCHIVE_LOCK,))
+    return cursor.fetchone()[0] >= 0
+
+def _releaseArchiveLock(cursor):
+    if not usingSqlite():
+        cursor.execute("EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'", (ARCHIVE_LOCK,))
+
+def archiveClosedTickets(olderThanDays=TICKET_ARCHIVE_AFTER_DAYS, batchSize=TICKET_ARCHIVE_BATCH_SIZE, maxBatches=None):
+    """Move closed tickets created more than olderThanDays ago into the archive table.
+
+    Each batch is its own short transaction, so the hot table is never locked for
+    the whole pass. The pass holds the ARCHIVE_LOCK application lock, so only one
+    process archives at a time. Returns the number of tickets archived, or None if
+    another pass is already running.
+    """
+    cutoff = date.today() - timedelta(days=olderThanDays)
+    archived = 0
+    batches = 0
+    with getConnection() as connection:
+        cursor = connection.cursor()
+        if not _acquireArchiveLock(cursor):
+            cursor.close()
+            return None
+        try:
+            while maxBatches is None or batches < maxBatches:
+                tickets = _archiveBatch(cursor, cutoff, batchSize)
+                connection.commit()
+                batches += 1
+                archived += len(tickets)
+                for employeeId in {ticket.employeeId for ticket in tickets}:
+                    invalidateEmployeeTickets(employeeId)
+                for ticket in tickets:
+                    ticketChanged.send(action='archived', ticket=ticket)
+                if len(tickets) < batchSize:
+                    break
+        finally:
+            _releaseArchiveLock(cursor)
+            cursor.close()
+    return archived
+
+def getArchivedTickets():
+    """All archived tickets, or an empty list if the archive can't be read (e.g. the table isn't created yet)"""
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {TICKET_COLUMNS} FROM {ARCHIVE_TABLE}")
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+        return tickets
+    except DB_ERRORS as e:
+        print("Error fetching archived tickets: ", e)
+        return []
+
+def getArchivedTicketById(ticketId):
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {TICKET_COLUMNS} FROM {ARCHIVE_TABLE} WHERE TicketID = ?", (ticketId,))
+            ticket = ticketMapper.mapRow(cursor, cursor.fetchone())
+            cursor.close()
+        return ticket
+    except DB_ERRORS as e:
+        print("Error fetching archived ticket by ID: ", e)
+        return None
+
+
+class TicketArchiver:
+    """Runs archiveClosedTickets every `interval` seconds.
+
+    Nothing starts it on import: the dev server starts the thread in its serving
+    process, and deployments with several workers run `flask --app app archive-tickets`
+    from exactly one place instead.
+    """
+
+    def __init__(self, interval=TICKET_ARCHIVE_INTERVAL):
+        self.interval = interval
+        self.lastRun = None
+        self.lastArchived = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def runOnce(self, **options):
+        """One archival pass; returns the tickets archived, or None if another process is running one"""
+        archived = archiveClosedTickets(**options)
+        if archived is not None:
+            self.lastRun = time.time()
+            self.lastArchived = archived
+        return archived
+
+    def run(self):
+        """Archive every `interval` seconds until the process exits"""
+        while True:
+            time.sleep(self.interval)
+            try:
+                archived = self.runOnce()
+                if archived:
+                    print(f"Archived {archived} closed tickets")
+            except DB_ERRORS as e:
+                print("Error archiving tickets: ", e)
+
+    def start(self):
+        with self._lock:
+            if self.interval > 0 and self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='ticket-archiver', daemon=True)
+                self._thread.start()
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'running': self._thread is not None,
+            'lastRun': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.lastRun)) if self.lastRun else None,
+            'lastArchived': self.lastArchived,
+        }
+
+
+ticketArchiver = TicketArchiver()
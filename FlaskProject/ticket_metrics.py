@@ -0,0 +1,144 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime
+import math
+import os
+import threading
+import time
+
+from dbpool import getConnection
+from signals import ticketChanged
+from sla import createdAt, isOpen
+from tickets import TICKET_COLUMNS, ticketMapper
+
+TICKET_METRICS_RELOAD_INTERVAL = float(os.getenv('TICKET_METRICS_RELOAD_INTERVAL', 900))
+PERCENTILES = (50, 90, 95, 99)
+DIMENSIONS = ('status', 'priority', 'category')
+PRIORITY = DIMENSIONS.index('priority')
+# JSON object keys can't be null
+UNSET = 'unspecified'
+
+
+class TicketMetrics:
+    """Ticket counts and open-ticket ages for the IT dashboard, kept in memory.
+
+    Counts by status, priority and category are Counters. The creation times of
+    open tickets are kept in sorted lists, overall and per priority, so an age
+    percentile is a single index lookup at read time. Each ticket's last counted
+    state is remembered, so a ticketChanged write subtracts the old state and adds
+    the new one. A full reload every `reloadInterval` seconds picks up writes made
+    by other worker processes.
+    """
+
+    def __init__(self, reloadInterval=TICKET_METRICS_RELOAD_INTERVAL):
+        self.reloadInterval = reloadInterval
+        self._reset()
+        self._loadedAt = None
+        self._lock = threading.RLock()
+
+    def _reset(self):
+        self._tickets = {}
+        self._counts = {dimension: Counter() for dimension in DIMENSIONS}
+        self._openCounts = {dimension: Counter() for dimension in DIMENSIONS}
+        self._openCreated = {}
+
+    def refresh(self):
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {TICKET_COLUMNS} FROM IT_TICKETS")
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+
+        with self._lock:
+            self._reset()
+            for ticket in tickets:
+                self._add(self._state(ticket))
+            self._loadedAt = time.monotonic()
+
+    def _ensureLoaded(self):
+        if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+            with self._lock:
+                if self._loadedAt is None or time.monotonic() - self._loadedAt >= self.reloadInterval:
+                    self.refresh()
+
+    def _state(self, ticket):
+        values = tuple(getattr(ticket, dimension) or UNSET for dimension in DIMENSIONS)
+        return ticket.ticketId, values, isOpen(ticket), createdAt(ticket)
+
+    def _add(self, state):
+        ticketId, values, isOpenTicket, created = state
+        self._tickets[ticketId] = state
+        for dimension, value in zip(DIMENSIONS, values):
+            self._counts[dimension][value] += 1
+            if isOpenTicket:
+                self._openCounts[dimension][value] += 1
+        if isOpenTicket:
+            priority = values[PRIORITY]
+            insort(self._openCreated.setdefault(None, []), created)
+            insort(self._openCreated.setdefault(priority, []), created)
+
+    def _remove(self, ticketId):
+        state = self._tickets.pop(ticketId, None)
+        if state is None:
+            return
+        _, values, isOpenTicket, created = state
+        for dimension, value in zip(DIMENSIONS, values):
+            self._decrement(self._counts[dimension], value)
+            if isOpenTicket:
+                self._decrement(self._openCounts[dimension], value)
+        if isOpenTicket:
+            priority = values[PRIORITY]
+            for key in (None, priority):
+                openCreated = self._openCreated[key]
+                del openCreated[bisect_left(openCreated, created)]
+                if not openCreated:
+                    del self._openCreated[key]
+
+    @staticmethod
+    def _decrement(counter, value):
+        counter[value] -= 1
+        if counter[value] <= 0:
+            del counter[value]
+
+    def onTicketChanged(self, action, ticket, **_):
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            self._remove(ticket.ticketId)
+            # Metrics cover the live table, so archived tickets leave them like deleted ones
+            if action not in ('deleted', 'archived'):
+                self._add(self._state(ticket))
+
+    @staticmethod
+    def _ages(created, now):
+        """Nearest-rank percentiles of open-ticket age in hours, from creation times sorted oldest first"""
+        if not created:
+            return {'count': 0, **{f'p{p}': None for p in PERCENTILES}, 'max': None}
+        count = len(created)
+        hours = lambda value: round((now - value).total_seconds() / 3600, 1)
+        # The p-th percentile age is the ceil(p% * n)-th youngest, i.e. counted back from the newest
+        ages = {f'p{p}': hours(created[count - math.ceil(p / 100 * count)]) for p in PERCENTILES}
+        return {'count': count, **ages, 'max': hours(created[0])}
+
+    def snapshot(self):
+        self._ensureLoaded()
+        now = datetime.now()
+        with self._lock:
+            return {
+                'asOf': now.isoformat(timespec='seconds'),
+                'total': len(self._tickets),
+                'open': len(self._openCreated.get(None, ())),
+                'byStatus': dict(self._counts['status']),
+                'byPriority': dict(self._counts['priority']),
+                'byCategory': dict(self._counts['category']),
+                'openByStatus': dict(self._openCounts['status']),
+                'openByPriority': dict(self._openCounts['priority']),
+                'openByCategory': dict(self._openCounts['category']),
+                'openAgeHours': self._ages(self._openCreated.get(None), now),
+                'openAgeHoursByPriority': {priority: self._ages(created, now)
+                                           for priority, created in self._openCreated.items() if priority is not None},
+            }
+
+
+ticketMetrics = TicketMetrics()
+ticketChanged.connect(ticketMetrics.onTicketChanged)
@@ -1,7 +1,28 @@
 from dbconnect import *
-import pyodbc # Ensure pyodbc is imported
+from datetime import date
+import os
 
-class Ticket:
+from cache import TTLCache
+from dbpool import getConnection, usingSqlite, DB_ERRORS
+from dml import deleteReturning, insertReturning, updateReturning
+from model import Model, formatDate
+from pagination import Filter, Listing
+from rowmap import RowMapper
+from signals import ticketChanged
+
+class Ticket(Model):
+    __slots__ = ('ticketId', 'employeeId', 'title', 'body', 'createdDate', 'priority', 'category', 'status')
+    fields = {
+        "ticketId": "ticketId",
+        "employeeId": "employeeId",
+        "title": "title",
+        "body": "body",
+        "createdDate": "createdDate",
+        "priority": "priority",
+        "category": "category",
+        "status": "status"
+    }
+    formatters = {"createdDate": formatDate}
 
     def __init__(self, ticketId=None, employeeId=None, title=None, body=None, createdDate=None, priority=None, category=None, status=None):
         self.ticketId = ticketId
@@ -13,113 +34,160 @@ class Ticket:
         self.category = category
         self.status = status
 
-    def toDict(self):
-        return {
-            "ticketId": self.ticketId,
-            "employeeId": self.employeeId,
-            "title": self.title,
-            "body": self.body,
-            "createdDate": self.createdDate.strftime('%Y-%m-%d') if self.createdDate else None,
-            "priority": self.priority,
-            "category": self.category,
-            "status": self.status
-        }
-    
     def toString(self):
         return f"Ticket ID: {self.ticketId}, Employee ID: {self.employeeId}, Title: {self.title}, Body: {self.body}, Created Date: {self.createdDate}, Priority: {self.priority}, Category: {self.category}, Status: {self.status}"
 
+ticketMapper = RowMapper(Ticket, {
+    'TicketID': 'ticketId',
+    'EmployeeID': 'employeeId',
+    'TicketTitle': 'title',
+    'TicketBody': 'body',
+    'CreatedDate': 'createdDate',
+    'TicketPriority': 'priority',
+    'Status': 'status',
+    'TicketCategory': 'category',
+})
+
+ticketListing = Listing(
+    ticketMapper,
+    {
+        'ticketId': 'TicketID',
+        'employeeId': 'EmployeeID',
+        'title': 'TicketTitle',
+        'body': 'TicketBody',
+        'createdDate': 'CreatedDate',
+        'priority': 'TicketPriority',
+        'status': '[Status]',
+        'category': 'TicketCategory',
+    },
+    "IT_TICKETS", idColumn="TicketID",
+    sorts={
+        'createdDate': 'CreatedDate',
+        'ticketId': 'TicketID',
+        'priority': 'TicketPriority',
+        'status': '[Status]',
+    },
+    filters={
+        'employeeId': Filter('EmployeeID', int),
+        'status': Filter('[Status]'),
+        'priority': Filter('TicketPriority'),
+        'category': Filter('TicketCategory'),
+        'createdDate': Filter('CreatedDate', date.fromisoformat, ranged=True),
+    },
+    defaultSort='-createdDate',
+)
+
+TICKET_RETURNING = ticketListing.selectList()
+TICKET_COLUMNS = ', '.join(TICKET_RETURNING)
+
 
 def getTickets():
+    """Get all tickets, newest first"""
     tickets = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT TicketID, EmployeeID, TicketTitle, TicketBody, CreatedDate, TicketPriority, [Status], TicketCategory FROM IT_TICKETS"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            newTicket = Ticket(
-                ticketId=row.TicketID,
-                employeeId=row.EmployeeID,
-                title=row.TicketTitle,
-                body=row.TicketBody,
-                createdDate=row.CreatedDate,
-                priority=row.TicketPriority,
-                status=row.Status,
-                category=row.TicketCategory
-            )
-            tickets.append(newTicket)
-
-        cursor.close()
-        connection.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"SELECT {TICKET_COLUMNS} FROM IT_TICKETS ORDER BY CreatedDate DESC, TicketID DESC"
+            cursor.execute(query)
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching data: ", e)
     return tickets
 
+def _fetchTicketsPage(page):
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            result = ticketListing.fetchPage(cursor, page)
+            cursor.close()
+        return result
+    except DB_ERRORS as e:
+        print("Error fetching tickets page: ", e)
+        return None
+
+def getTicketsPage(args):
+    """Get one page of tickets filtered and sorted per the ticketListing contract.
+
+    Returns (tickets, nextCursor), or None on a database error. Raises
+    PaginationError for malformed parameters.
+    """
+    return _fetchTicketsPage(ticketListing.parse(args))
+
+# "My tickets" views are read far more often than an employee files or updates tickets
+employeeTicketsCache = TTLCache('employeeTickets',
+                                maxSize=int(os.getenv('EMPLOYEE_TICKETS_CACHE_SIZE', 2000)),
+                                ttl=float(os.getenv('EMPLOYEE_TICKETS_CACHE_TTL', 120)))
+
+def getTicketsByEmployeeId(employeeId):
+    """Get an employee's tickets, newest first (served by IX_IT_TICKETS_Employee_CreatedDate)"""
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"""
+            SELECT {TICKET_COLUMNS} FROM IT_TICKETS
+            WHERE EmployeeID = ?
+            ORDER BY CreatedDate DESC, TicketID DESC
+            """
+            cursor.execute(query, (employeeId,))
+            tickets = ticketMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+        return tickets
+    except DB_ERRORS as e:
+        print(f"Error fetching tickets for employee {employeeId}: ", e)
+        return None
+
+def getCachedTicketsByEmployeeId(employeeId):
+    """Like getTicketsByEmployeeId, but cached per employee; the tickets are frozen"""
+    def load():
+        tickets = getTicketsByEmployeeId(employeeId)
+        if tickets is not None:
+            for ticket in tickets:
+                ticket.freeze()
+        return tickets
+    return employeeTicketsCache.getOrLoad(employeeId, load)
+
+def invalidateEmployeeTickets(employeeId):
+    employeeTicketsCache.invalidate(employeeId)
+
 def getTicketById(ticketId):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT TicketID, EmployeeID, TicketTitle, TicketBody, CreatedDate, TicketPriority, [Status], TicketCategory FROM IT_TICKETS WHERE TicketID = ?"
-        cursor.execute(query, ticketId)
-        row = cursor.fetchone()
-        if row:
-            ticket = Ticket(
-                ticketId=row.TicketID,
-                employeeId=row.EmployeeID,
-                title=row.TicketTitle,
-                body=row.TicketBody,
-                createdDate=row.CreatedDate,
-                priority=row.TicketPriority,
-                status=row.Status,
-                category=row.TicketCategory
-            )
-            return ticket
-        else:
-            return None
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = f"SELECT {TICKET_COLUMNS} FROM IT_TICKETS WHERE TicketID = ?"
+            cursor.execute(query, (ticketId,))
+            ticket = ticketMapper.mapRow(cursor, cursor.fetchone())
+            cursor.close()
+        return ticket
+    except DB_ERRORS as e:
         print("Error fetching data by ID: ", e)
         return None
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'connection' in locals() and connection:
-            connection.close()
 
 def createTicket(employeeId=None, title=None, body=None, createdDate=None, priority=None, status=None, category=None):
-    new_ticket_id = None
+    """Insert a ticket and return it as stored, in a single statement"""
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = """
-            SET NOCOUNT ON;
-            INSERT INTO IT_TICKETS (EmployeeID, TicketTitle, TicketBody, CreatedDate, TicketPriority, [Status], TicketCategory) 
-            VALUES (?, ?, ?, ?, ?, ?, ?);
-            SELECT SCOPE_IDENTITY();
-        """
-        cursor.execute(query, (employeeId, title, body, createdDate, priority, status, category))
-        new_ticket_id = cursor.fetchone()[0]
-        connection.commit()
-        print(f"Ticket created successfully with ID: {new_ticket_id}")
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = insertReturning('IT_TICKETS',
+                                    ['EmployeeID', 'TicketTitle', 'TicketBody', 'CreatedDate', 'TicketPriority', '[Status]', 'TicketCategory'],
+                                    TICKET_RETURNING)
+            cursor.execute(query, (employeeId, title, body, createdDate, priority, status, category))
+            ticket = ticketMapper.mapRow(cursor, cursor.fetchone())
+            connection.commit()
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error creating ticket: ", e)
         return None
-    finally:
-        # It's good practice to close the cursor and connection in the finally block
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'connection' in locals() and connection:
-            connection.close()
 
-    if new_ticket_id:
-        return getTicketById(new_ticket_id)
-    return None
+    if ticket is None:
+        return None
+    print(f"Ticket created successfully with ID: {ticket.ticketId}")
+    invalidateEmployeeTickets(employeeId)
+    ticketChanged.send(action='created', ticket=ticket)
+    return ticket
 
 def updateTicket(ticketId, data):
+    """Apply the given field changes and return the updated ticket, in a single statement"""
     if not data:
         return None
         
@@ -145,46 +213,118 @@ def updateTicket(ticketId, data):
     params.append(ticketId)
     
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = f"UPDATE IT_TICKETS SET {', '.join(set_clauses)} WHERE TicketID = ?"
-        cursor.execute(query, *params)
-        connection.commit()
-        
-        if cursor.rowcount == 0:
-            print(f"Update failed. No ticket found with ID: {ticketId}")
-            return None
-        print(f"Ticket {ticketId} updated successfully.")
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = updateReturning('IT_TICKETS', set_clauses, 'TicketID = ?', TICKET_RETURNING)
+            cursor.execute(query, tuple(params))
+            ticket = ticketMapper.mapRow(cursor, cursor.fetchone())
+            connection.commit()
+            cursor.close()
+    except DB_ERRORS as e:
         print(f"Error updating ticket {ticketId}: ", e)
         return None
-    finally:
-        cursor.close()
-        connection.close()
-    
-    return getTicketById(ticketId)
+
+    if ticket is None:
+        print(f"Update failed. No ticket found with ID: {ticketId}")
+        return None
+    print(f"Ticket {ticketId} updated successfully.")
+    invalidateEmployeeTickets(ticket.employeeId)
+    ticketChanged.send(action='updated', ticket=ticket)
+    return ticket
+
+# Fields triage may change in bulk
+TRIAGE_COLUMNS = {'status': '[Status]', 'priority': 'TicketPriority', 'category': 'TicketCategory'}
+BULK_UPDATE_MAX = int(os.getenv('TICKET_BULK_UPDATE_MAX', 1000))
+
+def _ticketsByIds(cursor, ids):
+    tickets = {}
+    # Chunk to stay well under SQL Server's 2100-parameter limit
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f"SELECT {TICKET_COLUMNS} FROM IT_TICKETS WHERE TicketID IN ({placeholders})", tuple(chunk))
+        for ticket in ticketMapper.mapRows(cursor, cursor.fetchall()):
+            tickets[ticket.ticketId] = ticket
+    return tickets
+
+def bulkUpdateTickets(updates):
+    """Apply triage changes to many tickets in one transaction.
+
+    `updates` is a list of dicts with a ticketId plus any of status, priority and
+    category. Updates that change the same columns are sent as one executemany
+    batch (with pyodbc's fast_executemany on SQL Server), then the touched tickets
+    are read back with one IN query. Returns per-ticket results in input order,
+    each {'ticketId', 'result': 'updated' | 'not_found' | 'invalid', ...}, or None
+    if the transaction failed and nothing was applied.
+    """
+    results = [None] * len(updates)
+    batches = {}
+    seen = set()
+    for index, update in enumerate(updates):
+        ticketId = update.get('ticketId') if isinstance(update, dict) else None
+        if not isinstance(ticketId, int) or isinstance(ticketId, bool):
+            results[index] = {'ticketId': ticketId, 'result': 'invalid', 'error': 'ticketId must be an integer'}
+            continue
+        if ticketId in seen:
+            results[index] = {'ticketId': ticketId, 'result': 'invalid', 'error': 'Duplicate ticketId'}
+            continue
+        keys = tuple(key for key in TRIAGE_COLUMNS if update.get(key) is not None)
+        if not keys:
+            results[index] = {'ticketId': ticketId, 'result': 'invalid', 'error': 'Nothing to change (status, priority or category)'}
+            continue
+        seen.add(ticketId)
+        batches.setdefault(keys, []).append([update[key] for key in keys] + [ticketId])
+
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            if not usingSqlite():
+                cursor.fast_executemany = True
+            for keys, paramSets in batches.items():
+                assignments = ', '.join(f"{TRIAGE_COLUMNS[key]} = ?" for key in keys)
+                cursor.executemany(f"UPDATE IT_TICKETS SET {assignments} WHERE TicketID = ?", paramSets)
+            # Missing tickets were no-ops above, so whatever comes back is what was updated
+            updated = _ticketsByIds(cursor, list(seen))
+            connection.commit()
+            cursor.close()
+    except DB_ERRORS as e:
+        print("Error bulk updating tickets: ", e)
+        return None
+
+    for index, update in enumerate(updates):
+        if results[index] is None:
+            ticket = updated.get(update['ticketId'])
+            if ticket is None:
+                results[index] = {'ticketId': update['ticketId'], 'result': 'not_found'}
+            else:
+                results[index] = {'ticketId': ticket.ticketId, 'result': 'updated', 'ticket': ticket.toDict()}
+    for employeeId in {ticket.employeeId for ticket in updated.values()}:
+        invalidateEmployeeTickets(employeeId)
+    for ticket in updated.values():
+        ticketChanged.send(action='updated', ticket=ticket)
+    print(f"Bulk updated {len(updated)} of {len(updates)} tickets.")
+    return results
 
 def deleteTicket(ticketId):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "DELETE FROM IT_TICKETS WHERE TicketID = ?"
-        cursor.execute(query, ticketId)
-        connection.commit()
-        if cursor.rowcount > 0:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = deleteReturning('IT_TICKETS', 'TicketID = ?', TICKET_RETURNING)
+            cursor.execute(query, (ticketId,))
+            ticket = ticketMapper.mapRow(cursor, cursor.fetchone())
+            connection.commit()
+            cursor.close()
+        if ticket is not None:
+            invalidateEmployeeTickets(ticket.employeeId)
+            ticketChanged.send(action='deleted', ticket=ticket)
             print("Ticket deleted successfully.")
             return True
         else:
             print("Ticket to delete not found.")
             return False
-    except pyodbc.Error as e:
+    except DB_ERRORS as e:
         print("Error deleting ticket: ", e)
         return False
-    finally:
-        cursor.close()
-        connection.close()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,23 @@
 from dbconnect import *
-from dotenv import load_dotenv
-from datetime import datetime
-import os
-import pyodbc
+from dbpool import getConnection, DB_ERRORS
+from dml import insertReturning
+from model import Model, formatDate
+from pagination import Filter, Listing
+from rowmap import RowMapper
+from datetime import date, datetime
 
-class Timesheet:
+class Timesheet(Model):
+    __slots__ = ('employeeId', 'weekOf', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday',
+                 'totalHours', 'notes')
+    DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday')
+    fieldAttributes = {
+        "employeeId": ("employeeId",),
+        "week": ("weekOf",),
+        "hours": DAYS,
+        "totalHours": ("totalHours",) + DAYS,
+        "status": (),
+        "notes": ("notes",),
+    }
 
     def __init__(self, employeeId=None, weekOf=None, monday=None, tuesday=None, wednesday=None, thursday=None, friday=None, saturday=None, totalHours=None, notes=None):
         self.employeeId = employeeId
@@ -21,7 +34,7 @@ class Timesheet:
     def toDict(self):
         return {
             "employeeId": self.employeeId,
-            "week": self.weekOf.strftime('%Y-%m-%d') if self.weekOf else None,
+            "week": formatDate(self.weekOf),
             "hours": {
                 "monday": self.monday or 0,
                 "tuesday": self.tuesday or 0,
@@ -41,109 +54,115 @@ class Timesheet:
             "status": "Pending",  # Add status field
             "notes": self.notes
         }
+
+timesheetMapper = RowMapper(Timesheet, {
+    'EmployeeID': 'employeeId',
+    'WeekOf': 'weekOf',
+    'HoursWorkedMonday': 'monday',
+    'HoursWorkedTuesday': 'tuesday',
+    'HoursWorkedWednesday': 'wednesday',
+    'HoursWorkedThursday': 'thursday',
+    'HoursWorkedFriday': 'friday',
+    'HoursWorkedSaturday': 'saturday',
+    'HoursWorkedTotal': 'totalHours',
+    'Notes': 'notes',
+})
+
+timesheetListing = Listing(
+    timesheetMapper,
+    {
+        'employeeId': 'EmployeeID',
+        'weekOf': 'WeekOf',
+        'monday': 'HoursWorkedMonday',
+        'tuesday': 'HoursWorkedTuesday',
+        'wednesday': 'HoursWorkedWednesday',
+        'thursday': 'HoursWorkedThursday',
+        'friday': 'HoursWorkedFriday',
+        'saturday': 'HoursWorkedSaturday',
+        'totalHours': 'HoursWorkedTotal',
+        'notes': 'Notes',
+    },
+    "TIMESHEETS", idColumn="TimesheetID",
+    sorts={
+        'weekOf': 'WeekOf',
+        'timesheetId': 'TimesheetID',
+        'employeeId': 'EmployeeID',
+        'totalHours': 'HoursWorkedTotal',
+    },
+    filters={
+        'employeeId': Filter('EmployeeID', int),
+        'weekOf': Filter('WeekOf', date.fromisoformat, ranged=True),
+        'totalHours': Filter('HoursWorkedTotal', float, ranged=True),
+    },
+    defaultSort='-weekOf',
+)
     
 def getTimesheets():
     timesheets = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM TIMESHEETS"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            newTimesheet = Timesheet(
-                employeeId=row.EmployeeID,
-                weekOf=row.WeekOf,
-                monday=row.HoursWorkedMonday,
-                tuesday=row.HoursWorkedTuesday,
-                wednesday=row.HoursWorkedWednesday,
-                thursday=row.HoursWorkedThursday,
-                friday=row.HoursWorkedFriday,
-                saturday=row.HoursWorkedSaturday,
-                totalHours=row.HoursWorkedTotal,
-                notes=row.Notes
-            )
-            timesheets.append(newTimesheet)
-        cursor.close()
-        connection.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM TIMESHEETS"
+            cursor.execute(query)
+            timesheets = timesheetMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching data: ", e)
     return timesheets
 
+def getTimesheetsPage(args):
+    """Get one page of timesheets; returns (timesheets, nextCursor) or None on a database error"""
+    page = timesheetListing.parse(args)
+    try:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            result = timesheetListing.fetchPage(cursor, page)
+            cursor.close()
+        return result
+    except DB_ERRORS as e:
+        print("Error fetching timesheets page: ", e)
+        return None
+
 def getTimesheetsByEmployeeId(employeeId):
     timesheets = []
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM TIMESHEETS WHERE EmployeeID = ?"
-        cursor.execute(query, employeeId)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            newTimesheet = Timesheet(
-                employeeId=row.EmployeeID,
-                weekOf=row.WeekOf,
-                monday=row.HoursWorkedMonday,
-                tuesday=row.HoursWorkedTuesday,
-                wednesday=row.HoursWorkedWednesday,
-                thursday=row.HoursWorkedThursday,
-                friday=row.HoursWorkedFriday,
-                saturday=row.HoursWorkedSaturday,
-                totalHours=row.HoursWorkedTotal,
-                notes=row.Notes
-            )
-            timesheets.append(newTimesheet)
-        cursor.close()
-        connection.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM TIMESHEETS WHERE EmployeeID = ?"
+            cursor.execute(query, (employeeId,))
+            timesheets = timesheetMapper.mapRows(cursor, cursor.fetchall())
+            cursor.close()
+    except DB_ERRORS as e:
         print("Error fetching data by Employee ID: ", e)
     return timesheets 
 
 def createTimesheet(employeeId=None, weekOf=None, monday=None, tuesday=None, wednesday=None, thursday=None, friday=None, saturday=None, totalHours=None, notes=None):
+    """Insert a timesheet and return it as stored (None on failure)"""
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "INSERT INTO TIMESHEETS (EmployeeID, WeekOf, HoursWorkedMonday, HoursWorkedTuesday, HoursWorkedWednesday, HoursWorkedThursday, HoursWorkedFriday, HoursWorkedSaturday, Notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        cursor.execute(query, employeeId, weekOf, monday, tuesday, wednesday, thursday, friday, saturday, notes)
-        connection.commit()
-        cursor.close()
-        connection.close()
-    except pyodbc.Error as e:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = insertReturning('TIMESHEETS',
+                                    ['EmployeeID', 'WeekOf', 'HoursWorkedMonday', 'HoursWorkedTuesday', 'HoursWorkedWednesday',
+                                     'HoursWorkedThursday', 'HoursWorkedFriday', 'HoursWorkedSaturday', 'Notes'],
+                                    timesheetListing.selectList())
+            cursor.execute(query, (employeeId, weekOf, monday, tuesday, wednesday, thursday, friday, saturday, notes))
+            timesheet = timesheetMapper.mapRow(cursor, cursor.fetchone())
+            connection.commit()
+            cursor.close()
+        return timesheet
+    except DB_ERRORS as e:
         print("Error creating timesheet: ", e)
+        return None
 
 def getTimesheetById(timesheetId):
     try:
-        connection = pyodbc.connect(
-            f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}')
-        cursor = connection.cursor()
-        query = "SELECT * FROM TIMESHEETS WHERE TimesheetID = ?"
-        cursor.execute(query, timesheetId)
-        row = cursor.fetchone()
-        if row:
-            timesheet = Timesheet(
-                employeeId=row.EmployeeID,
-                weekOf=row.WeekOf,
-                monday=row.HoursWorkedMonday,
-                tuesday=row.HoursWorkedTuesday,
-                wednesday=row.HoursWorkedWednesday,
-                thursday=row.HoursWorkedThursday,
-                friday=row.HoursWorkedFriday,
-                saturday=row.HoursWorkedSaturday,
-                totalHours=row.HoursWorkedTotal,
-                notes=row.Notes
-            )
-            return timesheet
-        else:
-            return None
-    except pyodbc.Error as e:
-        print("Error fetching timesheet by ID: ", e)
-        return None
-    finally:
-        if 'cursor' in locals() and cursor:
+        with getConnection() as connection:
+            cursor = connection.cursor()
+            query = "SELECT * FROM TIMESHEETS WHERE TimesheetID = ?"
+            cursor.execute(query, (timesheetId,))
+            timesheet = timesheetMapper.mapRow(cursor, cursor.fetchone())
             cursor.close()
-        if 'connection' in locals() and connection:
-            connection.close()
\ No newline at end of file
+        return timesheet
+    except DB_ERRORS as e:
+        print("Error fetching timesheet by ID: ", e)
+        return None
\ No newline at end of file